@@ -0,0 +1 @@
+"""Нагрузочные сценарии с локальными заглушками внешних сервисов."""
@@ -0,0 +1,125 @@
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+import zlib
+
+from homework_index import HomeworkIndex, homework_key
+
+
+HOMEWORKS = 100_000
+# Домашек у подписчика: мало, как у студента, и много, как у ревьюера.
+PER_TENANT = (5, 100)
+STATUSES = ('reviewing', 'approved', 'rejected')
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+# Text messages:
+REPORT = (
+    'Домашек {homeworks}, по {per_tenant} у подписчика: '
+    'словарь {legacy_bytes:.1f} Б на домашку, '
+    'колонки {compact_bytes:.1f} Б на домашку ({ratio:.1f}x)'
+)
+
+
+class LegacyIndex:
+    """Индекс до колонок: словарь ключ домашки -> строка статуса из ответа."""
+
+    def __init__(self):
+        """Пустой индекс."""
+        self.statuses = {}
+
+    def commit(self, homework):
+        """Запомнить статус домашки."""
+        self.statuses[homework_key(homework)] = homework.get('status')
+
+
+def response(tenant, per_tenant):
+    """Тело ответа API с per_tenant домашками подписчика tenant."""
+    homeworks = []
+    for number in range(per_tenant):
+        name = f'tenant{tenant}_hw{number}'
+        homeworks.append({
+            'id': zlib.crc32(name.encode()),
+            'homework_name': name,
+            'status': STATUSES[number % len(STATUSES)],
+            'date_updated': time.strftime(DATE_FORMAT, time.gmtime(number)),
+            'lesson_name': name,
+        })
+    return json.dumps({'homeworks': homeworks, 'current_date': per_tenant})
+
+
+def build(factory, bodies):
+    """Индексы factory() по телам ответов; ответы после разбора забываются."""
+    indexes = []
+    for body in bodies:
+        index = factory()
+        for homework in json.loads(body)['homeworks']:
+            index.commit(homework)
+        indexes.append(index)
+    return indexes
+
+
+def measure(factory, bodies):
+    """Сколько байт занимают индексы, построенные по bodies."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        indexes = build(factory, bodies)
+        gc.collect()
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del indexes
+    return size
+
+
+def run_case(homeworks=HOMEWORKS, per_tenant=PER_TENANT[0]):
+    """Байт на домашку у словаря и у HomeworkIndex."""
+    bodies = [
+        response(tenant, per_tenant)
+        for tenant in range(max(1, homeworks // per_tenant))
+    ]
+    total = len(bodies) * per_tenant
+    legacy = measure(LegacyIndex, bodies) / total
+    compact = measure(HomeworkIndex, bodies) / total
+    return dict(
+        homeworks=total,
+        per_tenant=per_tenant,
+        legacy_bytes=round(legacy, 1),
+        compact_bytes=round(compact, 1),
+        ratio=round(legacy / compact, 1),
+    )
+
+
+def parse_args(args=None):
+    """Аргументы командной строки."""
+    parser = argparse.ArgumentParser(
+        description='Память индекса статусов домашек: байт на домашку.'
+    )
+    parser.add_argument(
+        '--homeworks', type=int, default=HOMEWORKS,
+        help='сколько домашек всего',
+    )
+    parser.add_argument(
+        '--per-tenant', type=int, nargs='+', default=PER_TENANT,
+        help='домашек у подписчика; можно несколько',
+    )
+    parser.add_argument(
+        '--json', action='store_true', help='печатать отчёт в JSON',
+    )
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    """Померить индексы для каждого числа домашек у подписчика."""
+    options = parse_args(args)
+    for per_tenant in options.per_tenant:
+        report = run_case(options.homeworks, per_tenant)
+        if options.json:
+            print(json.dumps(report, ensure_ascii=False))
+        else:
+            print(REPORT.format(**report))
+
+
+if __name__ == '__main__':
+    main()
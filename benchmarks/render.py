@@ -0,0 +1,128 @@
+import argparse
+import json
+import logging
+import random
+import time
+
+import homework
+import messages
+
+
+NOTIFICATIONS = 10_000
+# Разных домашек: уведомления о них повторяются у разных чатов.
+HOMEWORKS = 500
+LOCALES = (messages.DEFAULT_LOCALE, 'en')
+REPEATS = 5
+# Text messages:
+REPORT = (
+    '{mode}: уведомлений {notifications}, {seconds_ms:.2f} мс, '
+    '{per_message_us:.3f} мкс на уведомление'
+)
+
+
+def make_notifications(count=NOTIFICATIONS, homeworks=HOMEWORKS, seed=0):
+    """Пары (домашка, язык) для count уведомлений."""
+    rng = random.Random(seed)
+    statuses = list(homework.HOMEWORK_VERDICTS)
+    return [
+        (
+            {
+                'homework_name': f'hw{rng.randrange(homeworks)}',
+                'status': rng.choice(statuses),
+            },
+            rng.choice(LOCALES),
+        )
+        for _ in range(count)
+    ]
+
+
+def format_each(notifications):
+    """Как parse_status до messages: format на каждое уведомление."""
+    for work, _ in notifications:
+        homework.STATUS_MESSAGE.format(
+            homework_name=work.get('homework_name'),
+            verdict=homework.HOMEWORK_VERDICTS.get(work.get('status')),
+        )
+
+
+def compiled(notifications, catalog):
+    """Скомпилированные шаблоны без кэша текстов."""
+    for work, locale in notifications:
+        catalog._render(
+            work.get('homework_name'), work.get('status'), locale
+        )
+
+
+def cached(notifications, catalog):
+    """Скомпилированные шаблоны и LRU готовых текстов."""
+    for work, locale in notifications:
+        catalog.status(work, locale)
+
+
+def measure(render, repeats=REPEATS):
+    """Лучшее время render() из repeats прогонов, c."""
+    best = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        render()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(count=NOTIFICATIONS, homeworks=HOMEWORKS, repeats=REPEATS):
+    """Отчёты для format, compiled и cached."""
+    notifications = make_notifications(count, homeworks)
+    catalog = messages.Messages(
+        homework.STATUS_MESSAGE, homework.HOMEWORK_VERDICTS
+    )
+    modes = dict(
+        format=lambda: format_each(notifications),
+        compiled=lambda: compiled(notifications, catalog),
+        cached=lambda: cached(notifications, catalog),
+    )
+    reports = []
+    for mode, render in modes.items():
+        seconds = measure(render, repeats)
+        reports.append(dict(
+            mode=mode,
+            notifications=count,
+            seconds_ms=round(seconds * 1000, 3),
+            per_message_us=round(seconds / count * 1_000_000, 3),
+        ))
+    return reports
+
+
+def parse_args(args=None):
+    """Аргументы командной строки."""
+    parser = argparse.ArgumentParser(
+        description='Стоимость текстов уведомлений: format, '
+                    'скомпилированные шаблоны и кэш.'
+    )
+    parser.add_argument(
+        '--notifications', type=int, default=NOTIFICATIONS,
+        help='сколько уведомлений',
+    )
+    parser.add_argument(
+        '--homeworks', type=int, default=HOMEWORKS,
+        help='сколько разных домашек среди них',
+    )
+    parser.add_argument(
+        '--json', action='store_true', help='печатать отчёт в JSON',
+    )
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    """Напечатать время на уведомление для каждого способа."""
+    options = parse_args(args)
+    logging.disable(logging.INFO)
+    for report in run(options.notifications, options.homeworks):
+        if options.json:
+            print(json.dumps(report, ensure_ascii=False))
+        else:
+            print(REPORT.format(**report))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+import argparse
+import json
+import logging
+import threading
+import time
+
+import coalesce
+import homework
+import outbox
+import poller
+import scheduler
+import transport
+from benchmarks.run import max_rss_mb
+from lifecycle import Lifecycle
+from tenants import Tenant
+
+
+PERIOD = 10
+SPEED = 10
+WORKERS = poller.MAX_WORKERS
+# Text messages:
+REPORT = (
+    'Повтор {recording} ({speed}x): подписчиков {tenants}, {seconds:.1f} c; '
+    'API {api_requests} запросов, без записи {api_misses}; '
+    'сообщений {messages} (в записи {recorded_messages}), '
+    'не доставлено {dropped}; пик памяти {max_rss_mb:.1f} МБ'
+)
+SPEED_ERROR = '--speed должна быть больше нуля, а не {speed}'
+
+
+def recorded_span(events):
+    """Сколько секунд длится запись."""
+    moments = [event['at'] for event in events]
+    return max(moments) - min(moments) if moments else 0
+
+
+def run_replay(recording, speed=SPEED, period=PERIOD, duration=None,
+               workers=WORKERS, coalesce_window=0):
+    """Весь цикл опроса против записи recording, без сети.
+
+    Подписчики — псевдонимы токенов из записи, каждый опрашивается раз
+    в period / speed секунд; сообщения идут через outbox.Outbox
+    с лимитами, ускоренными в speed раз, в transport.ReplayBot.
+    duration по умолчанию — длина записи / speed.
+    """
+    events = transport.load(recording)
+    client = transport.ReplayClient(events, speed=speed)
+    bot = transport.ReplayBot(events, speed=speed)
+    # Telegram в повторе нет: его лимиты ускоряются вместе с записью.
+    sender = outbox.Outbox(
+        bot, global_rate=outbox.GLOBAL_RATE * speed,
+        chat_rate=outbox.CHAT_RATE * speed,
+    ).start()
+    deliver = sender
+    if coalesce_window > 0:
+        deliver = coalesce.Coalescer(sender, window=coalesce_window).start()
+    registry = [
+        Tenant(token, token, token) for token in transport.tokens(events)
+    ]
+    engine = poller.Poller(
+        bot, registry,
+        max_workers=workers,
+        client=client,
+        outbox=deliver,
+        schedule=scheduler.FixedScheduler(period / speed),
+        lifecycle=Lifecycle(shutdown_timeout=outbox.STOP_TIMEOUT),
+    )
+    if duration is None:
+        duration = max(period, recorded_span(events)) / speed
+    timer = threading.Timer(duration, engine.lifecycle.stop)
+    started = time.monotonic()
+    timer.start()
+    try:
+        engine.run()
+    finally:
+        timer.cancel()
+        if deliver is not sender:
+            deliver.stop(timeout=engine.lifecycle.remaining())
+        sender.stop(timeout=engine.lifecycle.remaining())
+    return dict(
+        recording=recording,
+        speed=speed,
+        tenants=len(registry),
+        seconds=time.monotonic() - started,
+        api_requests=client.requests,
+        api_misses=client.misses,
+        messages=len(bot.sent),
+        recorded_messages=sum(
+            event['kind'] == transport.SEND_EVENT for event in events
+        ),
+        dropped=sender.dropped,
+        max_rss_mb=max_rss_mb(),
+    )
+
+
+def parse_args(args=None):
+    """Аргументы командной строки."""
+    parser = argparse.ArgumentParser(
+        description='Цикл опроса против записи worker.py --transport record.'
+    )
+    parser.add_argument('recording', help='файл записи')
+    parser.add_argument(
+        '--speed', type=float, default=SPEED,
+        help='во сколько раз быстрее записи',
+    )
+    parser.add_argument(
+        '--period', type=float, default=PERIOD,
+        help='интервал опроса подписчика в шкале записи, c',
+    )
+    parser.add_argument(
+        '--duration', type=float,
+        help='сколько секунд повторять; по умолчанию вся запись',
+    )
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument(
+        '--coalesce-window', type=float, default=0,
+        help='склеивать уведомления чата за столько секунд',
+    )
+    parser.add_argument(
+        '--json', action='store_true', help='печатать отчёт в JSON',
+    )
+    parser.add_argument('--log-level', default='WARNING')
+    options = parser.parse_args(args)
+    if options.speed <= 0:
+        parser.error(SPEED_ERROR.format(speed=options.speed))
+    return options
+
+
+def main(args=None):
+    """Повторить запись и напечатать отчёт."""
+    options = parse_args(args)
+    logging.basicConfig(level=options.log_level, format=homework.LOG_FORMAT)
+    report = run_replay(
+        options.recording, speed=options.speed, period=options.period,
+        duration=options.duration, workers=options.workers,
+        coalesce_window=options.coalesce_window,
+    )
+    if options.json:
+        print(json.dumps(report, ensure_ascii=False))
+    else:
+        print(REPORT.format(**report))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+import argparse
+import json
+import logging
+import math
+import multiprocessing
+import resource
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import telegram
+
+import coalesce
+import commands
+import homework
+import http_client
+import jobs
+import outbox
+import poller
+import scheduler
+from benchmarks.stub_servers import HomeworkModel, PracticumStub, TelegramStub
+from lifecycle import Lifecycle
+from tenants import Tenant
+
+
+# Формат токена бота проверяет telegram.Bot, сам токен не важен.
+BOT_TOKEN = '123456:benchmark'
+# Сценарии нагрузки: параметры run_scenario.
+SCENARIOS = {
+    'single': dict(
+        tenants=1, duration=10, period=1, homeworks=3, change_period=2,
+    ),
+    'hundred': dict(
+        tenants=100, duration=20, period=2, homeworks=1, change_period=10,
+    ),
+    # Ревьюер проверяет пачку: за опрос у подписчика меняется несколько
+    # домашек сразу; сравнить с --coalesce-window.
+    'burst': dict(
+        tenants=50, duration=20, period=5, homeworks=10, change_period=20,
+    ),
+    'large': dict(
+        tenants=5000, duration=30, period=10, homeworks=1,
+        change_period=600, workers=64,
+    ),
+}
+WORKERS = poller.MAX_WORKERS
+# loop — цикл Poller.run; commands — он же и отдельный Updater для команд;
+# job-queue — опрос задачами JobQueue в потоках того же Updater.
+ENGINES = ('loop', 'commands', 'job-queue')
+API_LATENCY = 0.02
+TELEGRAM_LATENCY = 0.02
+# Сколько секунд после окончания сценария доделывать опросы и отправку.
+DRAIN_TIMEOUT = outbox.STOP_TIMEOUT
+# Text messages:
+REPORT = (
+    '{scenario} ({engine}): подписчиков {tenants}, {seconds:.1f} c; '
+    'API {api_requests} запросов ({api_rps:.1f}/c); '
+    'сообщений {messages} ({messages_per_second:.1f}/c), '
+    'в них статусов {notifications}, '
+    'не доставлено {dropped}; '
+    'задержка p50 {latency_p50} c, p99 {latency_p99} c; '
+    'пик памяти {max_rss_mb:.1f} МБ, потоков {threads}'
+)
+UNKNOWN_SCENARIOS = 'Нет таких сценариев: {names}'
+
+
+def percentile(values, fraction):
+    """Перцентиль fraction (0..1) по ближайшему рангу; None — нет данных."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, math.ceil(fraction * len(ordered)) - 1)
+    return round(ordered[index], 3)
+
+
+def max_rss_mb():
+    """Пик потребления памяти процессом, МБ (ru_maxrss в Linux — КБ)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def make_updater(name, bot, engine, workers):
+    """Updater для движка name или None."""
+    if name == 'job-queue':
+        return commands.make_updater(bot, engine, workers=workers)
+    if name == 'commands':
+        return commands.make_updater(bot, engine)
+    return None
+
+
+def run_engine(name, engine, updater, period):
+    """Опрашивать движком name до engine.lifecycle.stop()."""
+    if name == 'job-queue':
+        jobs.run(updater, engine)
+        return
+    if updater is not None:
+        commands.start(updater)
+    engine.run()
+
+
+def run_scenario(tenants=1, duration=10, period=1, workers=WORKERS,
+                 homeworks=1, change_period=10, payload_bytes=0,
+                 api_latency=API_LATENCY, api_error_rate=0,
+                 telegram_latency=TELEGRAM_LATENCY, telegram_error_rate=0,
+                 telegram_rate=outbox.GLOBAL_RATE, engine='loop',
+                 coalesce_window=0):
+    """Прогнать poller.Poller против заглушек duration секунд.
+
+    Каждый подписчик опрашивается раз в period секунд через общий
+    HttpClient, сообщения уходят через outbox.Outbox в Telegram-заглушку;
+    с coalesce_window > 0 — через coalesce.Coalescer перед ним.
+    engine — один из ENGINES. Возвращает словарь с пропускной
+    способностью, задержкой уведомлений от смены статуса, пиком памяти
+    и числом потоков в конце сценария.
+    """
+    model = HomeworkModel(
+        homeworks_per_tenant=homeworks,
+        change_period=change_period,
+        payload_bytes=payload_bytes,
+    )
+    practicum = PracticumStub(
+        model, latency=api_latency, error_rate=api_error_rate
+    ).start()
+    telegram_stub = TelegramStub(
+        model, latency=telegram_latency, error_rate=telegram_error_rate
+    ).start()
+    endpoint = homework.ENDPOINT
+    homework.ENDPOINT = practicum.endpoint
+    client = http_client.HttpClient(pool_size=workers)
+    if engine == 'loop':
+        bot = telegram.Bot(token=BOT_TOKEN, base_url=telegram_stub.base_url)
+    else:
+        bot = commands.make_bot(
+            BOT_TOKEN,
+            workers=workers if engine == 'job-queue' else
+            commands.COMMAND_WORKERS,
+            base_url=telegram_stub.base_url,
+        )
+    sender = outbox.Outbox(bot, global_rate=telegram_rate).start()
+    deliver = sender
+    if coalesce_window > 0:
+        deliver = coalesce.Coalescer(sender, window=coalesce_window).start()
+    updater = None
+    threads = []
+    try:
+        registry = [
+            Tenant(f'tenant{index}', f'token{index}', index)
+            for index in range(tenants)
+        ]
+        poll = poller.Poller(
+            bot, registry,
+            max_workers=workers,
+            client=client,
+            outbox=deliver,
+            schedule=scheduler.FixedScheduler(period),
+            lifecycle=Lifecycle(shutdown_timeout=DRAIN_TIMEOUT),
+        )
+        updater = make_updater(engine, bot, poll, workers)
+
+        def finish():
+            threads.append(threading.active_count())
+            poll.lifecycle.stop()
+
+        timer = threading.Timer(duration, finish)
+        started = time.monotonic()
+        timer.start()
+        run_engine(engine, poll, updater, period)
+        if deliver is not sender:
+            deliver.stop(timeout=poll.lifecycle.remaining())
+        sender.stop(timeout=poll.lifecycle.remaining())
+        seconds = time.monotonic() - started
+    finally:
+        if deliver is not sender:
+            deliver.stop(timeout=0)
+        sender.stop(timeout=0)
+        if updater is not None:
+            updater.stop()
+        client.close()
+        homework.ENDPOINT = endpoint
+        practicum.stop()
+        telegram_stub.stop()
+    return dict(
+        engine=engine,
+        tenants=tenants,
+        seconds=seconds,
+        api_requests=practicum.requests,
+        api_rps=practicum.requests / seconds,
+        messages=telegram_stub.messages,
+        messages_per_second=telegram_stub.messages / seconds,
+        notifications=telegram_stub.notifications,
+        dropped=sender.dropped + (
+            deliver.dropped if deliver is not sender else 0
+        ),
+        latency_p50=percentile(telegram_stub.latencies, 0.5),
+        latency_p99=percentile(telegram_stub.latencies, 0.99),
+        max_rss_mb=max_rss_mb(),
+        threads=threads[0],
+    )
+
+
+def run_isolated(name, overrides, log_level):
+    """Сценарий name в отдельном процессе, чтобы память не смешивалась."""
+    logging.basicConfig(level=log_level, format=homework.LOG_FORMAT)
+    report = run_scenario(**{**SCENARIOS[name], **overrides})
+    report['scenario'] = name
+    return report
+
+
+def parse_args(args=None):
+    """Аргументы командной строки."""
+    parser = argparse.ArgumentParser(
+        description='Нагрузочные сценарии против локальных заглушек '
+                    'API Практикума и Telegram.'
+    )
+    parser.add_argument(
+        'scenarios', nargs='*', metavar='scenario',
+        help=f'сценарии из {", ".join(SCENARIOS)}; по умолчанию все',
+    )
+    for option, kind, help in (
+        ('--tenants', int, 'сколько подписчиков'),
+        ('--duration', float, 'сколько секунд опрашивать'),
+        ('--period', float, 'интервал опроса подписчика, c'),
+        ('--workers', int, 'сколько подписчиков опрашивать одновременно'),
+        ('--homeworks', int, 'домашек у подписчика'),
+        ('--change-period', float, 'как часто меняется статус домашки, c'),
+        ('--payload-bytes', int, 'лишних байт в каждой домашке ответа'),
+        ('--api-latency', float, 'задержка ответа API, c'),
+        ('--api-error-rate', float, 'доля ответов API с ошибкой 503'),
+        ('--telegram-latency', float, 'задержка ответа Telegram, c'),
+        ('--telegram-error-rate', float, 'доля ответов Telegram с 429'),
+        ('--telegram-rate', float, 'лимит отправки, сообщений в секунду'),
+        ('--coalesce-window', float,
+         'сколько секунд копить уведомления чата; 0 — не склеивать'),
+    ):
+        parser.add_argument(option, type=kind, help=help)
+    parser.add_argument(
+        '--engine', choices=ENGINES,
+        help='как опрашивать: цикл, цикл и Updater, задачи JobQueue',
+    )
+    parser.add_argument(
+        '--json', action='store_true',
+        help='печатать отчёт JSON-строкой на сценарий',
+    )
+    parser.add_argument('--log-level', default='ERROR')
+    options = parser.parse_args(args)
+    unknown = set(options.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(UNKNOWN_SCENARIOS.format(names=', '.join(unknown)))
+    return options
+
+
+def main(args=None):
+    """Прогнать сценарии по одному, каждый в свежем процессе."""
+    options = parse_args(args)
+    overrides = {
+        key: value for key, value in vars(options).items()
+        if key not in ('scenarios', 'json', 'log_level') and value is not None
+    }
+    context = multiprocessing.get_context('spawn')
+    for name in options.scenarios or SCENARIOS:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            report = pool.submit(
+                run_isolated, name, overrides, options.log_level
+            ).result()
+        if options.json:
+            print(json.dumps(report, ensure_ascii=False))
+        else:
+            print(REPORT.format(**report))
+
+
+if __name__ == '__main__':
+    main()
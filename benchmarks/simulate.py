@@ -0,0 +1,174 @@
+import argparse
+import json
+import logging
+import random
+import time
+from http import HTTPStatus
+
+import homework
+import poller
+import scheduler
+import transport
+from benchmarks.run import percentile
+from benchmarks.stub_servers import HomeworkModel
+from clock import VirtualClock
+from tenants import Tenant
+
+
+DAYS = 7
+TENANTS = 100
+HOMEWORKS = 1
+# Как часто меняется статус домашки: ревьюер отвечает пару раз в сутки.
+CHANGE_PERIOD = 6 * 60 * 60
+SCHEDULES = ('fixed', 'adaptive')
+# Text messages:
+REPORT = (
+    '{schedule}: {days} сут. за {seconds:.1f} c; подписчиков {tenants}; '
+    'API {api_calls} запросов ({api_calls_per_day:.0f} в сутки); '
+    'уведомлений {notifications}, задержка p50 {latency_p50:.0f} c, '
+    'p95 {latency_p95:.0f} c, max {latency_max:.0f} c'
+)
+
+
+class ModelClient:
+    """API Практикума без сети: домашки HomeworkModel на время clock."""
+
+    def __init__(self, model, clock):
+        """Клиент для model; запросов ещё не было."""
+        self.model = model
+        self.clock = clock
+        self.requests = 0
+
+    def get(self, url, headers=None, params=None, **kwargs):
+        """Ответ API для токена из headers."""
+        self.requests += 1
+        now = self.clock.time()
+        body = dict(
+            homeworks=self.model.homeworks(
+                transport.token_from(headers), params['from_date'], now
+            ),
+            current_date=int(now),
+        )
+        return transport.ReplayResponse(HTTPStatus.OK, json.dumps(body))
+
+    def log_stats(self):
+        """Соединений нет: считать нечего."""
+
+
+class ModelBot:
+    """Telegram без сети: задержка каждого уведомления по clock."""
+
+    def __init__(self, model, clock):
+        """Бот для model; сообщений ещё не было."""
+        self.model = model
+        self.clock = clock
+        self.messages = 0
+        self.latencies = []
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        """Учесть сообщение и задержки статусов в нём."""
+        self.messages += 1
+        self.latencies.extend(self.model.latencies(text, self.clock.time()))
+
+
+def make_schedule(name, period, clock):
+    """Расписание опроса по имени из SCHEDULES."""
+    if name == 'fixed':
+        return scheduler.FixedScheduler(period, clock=clock)
+    return scheduler.AdaptiveScheduler(period, clock=clock)
+
+
+def run_simulation(days=DAYS, tenants=TENANTS, homeworks=HOMEWORKS,
+                   change_period=CHANGE_PERIOD, period=homework.RETRY_PERIOD,
+                   schedule='fixed', seed=0):
+    """Цикл Poller.run на days суток виртуального времени.
+
+    Часы — clock.VirtualClock, опросы идут по очереди в потоке цикла,
+    разброс расписания задаёт seed: при тех же параметрах отчёт тот же,
+    кроме seconds — сколько это заняло на самом деле.
+    """
+    random.seed(seed)
+    clock = VirtualClock()
+    model = HomeworkModel(homeworks, change_period, started=clock.time())
+    client = ModelClient(model, clock)
+    bot = ModelBot(model, clock)
+    registry = [
+        Tenant(f'tenant{number}', f'token{number}', number,
+               timestamp=int(clock.time()))
+        for number in range(tenants)
+    ]
+    engine = poller.Poller(
+        bot, registry,
+        client=client,
+        schedule=make_schedule(schedule, period, clock),
+        clock=clock,
+    )
+    clock.call_later(days * scheduler.SECONDS_PER_DAY, engine.lifecycle.stop)
+    started = time.perf_counter()
+    engine.run()
+    latencies = sorted(bot.latencies)
+    return dict(
+        schedule=schedule,
+        days=days,
+        tenants=tenants,
+        seconds=time.perf_counter() - started,
+        api_calls=client.requests,
+        api_calls_per_day=client.requests / days,
+        messages=bot.messages,
+        notifications=len(latencies),
+        latency_p50=percentile(latencies, 0.5) or 0,
+        latency_p95=percentile(latencies, 0.95) or 0,
+        latency_max=latencies[-1] if latencies else 0,
+    )
+
+
+def parse_args(args=None):
+    """Аргументы командной строки."""
+    parser = argparse.ArgumentParser(
+        description='Суток опроса в виртуальном времени: запросы к API '
+                    'и задержка уведомлений для каждого расписания.'
+    )
+    parser.add_argument('--days', type=float, default=DAYS)
+    parser.add_argument('--tenants', type=int, default=TENANTS)
+    parser.add_argument(
+        '--homeworks', type=int, default=HOMEWORKS,
+        help='домашек у подписчика',
+    )
+    parser.add_argument(
+        '--change-period', type=float, default=CHANGE_PERIOD,
+        help='как часто меняется статус домашки, c',
+    )
+    parser.add_argument(
+        '--period', type=float, default=homework.RETRY_PERIOD,
+        help='интервал опроса, c',
+    )
+    parser.add_argument(
+        '--schedule', choices=SCHEDULES, action='append',
+        help='какие расписания сравнить; по умолчанию все',
+    )
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument(
+        '--json', action='store_true', help='печатать отчёт в JSON',
+    )
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    """Напечатать отчёт для каждого расписания."""
+    options = parse_args(args)
+    logging.disable(logging.INFO)
+    for schedule in options.schedule or SCHEDULES:
+        report = run_simulation(
+            days=options.days, tenants=options.tenants,
+            homeworks=options.homeworks,
+            change_period=options.change_period, period=options.period,
+            schedule=schedule, seed=options.seed,
+        )
+        if options.json:
+            print(json.dumps(report, ensure_ascii=False))
+        else:
+            print(REPORT.format(**report))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,288 @@
+import json
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+HOST = '127.0.0.1'
+PRACTICUM_PATH = '/api/user_api/homework_statuses/'
+# По какому кругу меняется статус каждой домашки.
+STATUS_CYCLE = ('reviewing', 'rejected', 'reviewing', 'approved')
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+HOMEWORKS_PER_TENANT = 3
+CHANGE_PERIOD = 5
+REQUEST_QUEUE_SIZE = 1024
+HOMEWORK_NAME = re.compile(r'"(?P<name>[^"]+)"')
+# Сколько держать пустой getUpdates, c: иначе Updater.stop() ждёт timeout.
+UPDATES_WAIT = 0.2
+BOT_USER = {
+    'id': 123456, 'is_bot': True, 'first_name': 'Stub', 'username': 'stub_bot',
+}
+
+
+class HomeworkModel:
+    """Статусы домашек всех подписчиков как функция времени.
+
+    У домашки index подписчика с токеном token статус меняется раз в
+    change_period секунд со своим постоянным сдвигом. Поэтому обе
+    заглушки без общего журнала знают, когда статус изменился, и
+    Telegram-заглушка считает задержку уведомления. started — начало
+    отсчёта, unix time; по умолчанию сейчас.
+    """
+
+    def __init__(self, homeworks_per_tenant=HOMEWORKS_PER_TENANT,
+                 change_period=CHANGE_PERIOD, payload_bytes=0,
+                 started=None):
+        """Модель с отсчётом от started."""
+        self.homeworks_per_tenant = homeworks_per_tenant
+        self.change_period = change_period
+        self.padding = 'x' * payload_bytes
+        self.started = time.time() if started is None else started
+
+    @staticmethod
+    def name(token, index):
+        """Имя домашки, по которому её находит Telegram-заглушка."""
+        return f'{token}/hw{index}'
+
+    def offset(self, name):
+        """Постоянный сдвиг смены статуса домашки, c."""
+        return zlib.crc32(name.encode()) % 1000 / 1000 * self.change_period
+
+    def state(self, name, now):
+        """Статус домашки и когда он стал таким; None — ещё не сдана."""
+        changes = math.floor(
+            (now - self.started - self.offset(name)) / self.change_period
+        )
+        if changes < 0:
+            return None, None
+        changed_at = (
+            self.started + self.offset(name) + changes * self.change_period
+        )
+        return STATUS_CYCLE[changes % len(STATUS_CYCLE)], changed_at
+
+    def homeworks(self, token, from_date, now):
+        """Домашки, чей статус менялся не раньше from_date."""
+        homeworks = []
+        for index in range(self.homeworks_per_tenant):
+            name = self.name(token, index)
+            status, changed_at = self.state(name, now)
+            if status is None or changed_at < from_date:
+                continue
+            homework = {
+                'id': zlib.crc32(name.encode()),
+                'homework_name': name,
+                'status': status,
+                'date_updated': time.strftime(
+                    DATE_FORMAT, time.gmtime(changed_at)
+                ),
+                'lesson_name': name,
+            }
+            if self.padding:
+                homework['reviewer_comment'] = self.padding
+            homeworks.append(homework)
+        # Как и настоящий API: сначала самые свежие.
+        homeworks.sort(key=lambda homework: homework['date_updated'],
+                       reverse=True)
+        return homeworks
+
+    def latencies(self, text, now):
+        """Задержки уведомлений о статусах в text от смены статуса.
+
+        В одном сообщении их может быть несколько (coalesce.Coalescer).
+        """
+        latencies = []
+        for match in HOMEWORK_NAME.finditer(text):
+            _, changed_at = self.state(match.group('name'), now)
+            if changed_at is not None:
+                latencies.append(now - changed_at)
+        return latencies
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Общее для заглушек: задержка, доля ошибок и JSON-ответ."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        """Не писать каждый запрос в stderr."""
+
+    def delay(self):
+        """Подождать latency секунд и решить, отвечать ли ошибкой."""
+        stub = self.server.stub
+        if stub.latency:
+            time.sleep(stub.latency)
+        return random.random() < stub.error_rate
+
+    def send_json(self, status, data):
+        """Ответ с JSON-телом и Content-Length для keep-alive."""
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class PracticumHandler(StubHandler):
+    """GET homework_statuses с токеном из заголовка Authorization."""
+
+    def do_GET(self):
+        """Домашки подписчика или ошибка."""
+        stub = self.server.stub
+        url = urlsplit(self.path)
+        if url.path != PRACTICUM_PATH:
+            self.send_json(HTTPStatus.NOT_FOUND, {})
+            return
+        failed = self.delay()
+        stub.count()
+        if failed:
+            self.send_json(HTTPStatus.SERVICE_UNAVAILABLE, {})
+            return
+        token = self.headers.get('Authorization', '').split()[-1]
+        from_date = int(parse_qs(url.query).get('from_date', ['0'])[0])
+        now = time.time()
+        self.send_json(HTTPStatus.OK, {
+            'homeworks': stub.model.homeworks(token, from_date, now),
+            'current_date': int(now),
+        })
+
+
+class TelegramHandler(StubHandler):
+    """Методы Bot API, которые нужны Outbox и Updater."""
+
+    def do_POST(self):
+        """Ответить на метод Bot API из конца пути."""
+        length = int(self.headers.get('Content-Length', 0))
+        data = json.loads(self.rfile.read(length) or b'{}')
+        method = self.path.rsplit('/', 1)[-1]
+        if method == 'sendMessage':
+            self.send_message(data)
+        elif method == 'getMe':
+            self.send_result(BOT_USER)
+        elif method == 'getUpdates':
+            # Long polling без обновлений, но не дольше UPDATES_WAIT.
+            time.sleep(min(float(data.get('timeout', 0)), UPDATES_WAIT))
+            self.send_result([])
+        elif method == 'deleteWebhook':
+            self.send_result(True)
+        else:
+            self.send_json(HTTPStatus.NOT_FOUND, {
+                'ok': False, 'error_code': 404, 'description': 'Not Found',
+            })
+
+    def send_result(self, result):
+        """Успешный ответ Bot API."""
+        self.send_json(HTTPStatus.OK, {'ok': True, 'result': result})
+
+    def send_message(self, data):
+        """Запомнить сообщение и ответить как Telegram."""
+        stub = self.server.stub
+        if self.delay():
+            stub.count()
+            self.send_json(HTTPStatus.TOO_MANY_REQUESTS, {
+                'ok': False,
+                'error_code': 429,
+                'description': 'Too Many Requests: retry after 1',
+                'parameters': {'retry_after': 1},
+            })
+            return
+        now = time.time()
+        stub.record(data.get('text', ''), now)
+        self.send_result({
+            'message_id': stub.requests,
+            'date': int(now),
+            'chat': {'id': int(data.get('chat_id', 0)), 'type': 'private'},
+            'text': data.get('text', ''),
+        })
+
+
+class StubServer:
+    """Заглушка в фоновом потоке с общими счётчиками."""
+
+    handler = StubHandler
+
+    def __init__(self, model, latency=0, error_rate=0, host=HOST, port=0):
+        """Сервер на host:port; отвечать начнёт после start()."""
+        self.model = model
+        self.latency = latency
+        self.error_rate = error_rate
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.server = ThreadingHTTPServer((host, port), self.handler,
+                                          bind_and_activate=False)
+        self.server.request_queue_size = REQUEST_QUEUE_SIZE
+        self.server.server_bind()
+        self.server.server_activate()
+        self.server.daemon_threads = True
+        self.server.stub = self
+        self.thread = threading.Thread(
+            target=self.server.serve_forever,
+            name=type(self).__name__,
+            daemon=True,
+        )
+
+    @property
+    def url(self):
+        """Адрес заглушки."""
+        host, port = self.server.server_address
+        return f'http://{host}:{port}'
+
+    def count(self):
+        """Учесть запрос."""
+        with self.lock:
+            self.requests += 1
+
+    def start(self):
+        """Начать отвечать на запросы."""
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Остановить сервер."""
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class PracticumStub(StubServer):
+    """Заглушка эндпоинта homework_statuses."""
+
+    handler = PracticumHandler
+
+    @property
+    def endpoint(self):
+        """Подставить вместо homework.ENDPOINT."""
+        return self.url + PRACTICUM_PATH
+
+
+class TelegramStub(StubServer):
+    """Заглушка Bot API: запоминает сообщения и задержки уведомлений."""
+
+    handler = TelegramHandler
+
+    def __init__(self, model, **kwargs):
+        """Заглушка без сообщений."""
+        super().__init__(model, **kwargs)
+        self.messages = 0
+        # Уведомлений о статусах во всех сообщениях.
+        self.notifications = 0
+        self.latencies = []
+
+    @property
+    def base_url(self):
+        """Подставить в telegram.Bot(base_url=...)."""
+        return self.url + '/bot'
+
+    def record(self, text, now):
+        """Учесть доставленное сообщение."""
+        latencies = self.model.latencies(text, now)
+        with self.lock:
+            self.requests += 1
+            self.messages += 1
+            self.notifications += len(latencies)
+            self.latencies.extend(latencies)
@@ -0,0 +1,84 @@
+import argparse
+import json
+import logging
+import time
+
+import homework
+
+
+SIZES = (1_000, 10_000, 100_000)
+# Доля домашек с неизвестным статусом.
+DEFECT_RATE = 0.01
+REPEATS = 5
+# Text messages:
+REPORT = (
+    'Домашек {homeworks}, дефектов {defects}: '
+    '{seconds_ms:.2f} мс, {per_homework_us:.3f} мкс на домашку'
+)
+
+
+def make_response(size, defect_rate=DEFECT_RATE):
+    """Ответ API с size домашками, доля defect_rate из них с ошибкой."""
+    step = max(1, round(1 / defect_rate)) if defect_rate else 0
+    return {'homeworks': [
+        {
+            'id': number,
+            'homework_name': f'hw{number}',
+            'status': 'unknown' if step and number % step == 0 else 'approved',
+            'date_updated': '2024-01-01T00:00:00Z',
+        }
+        for number in range(size)
+    ], 'current_date': 0}
+
+
+def run_case(size, defect_rate=DEFECT_RATE, repeats=REPEATS):
+    """Лучшее время validate_response из repeats прогонов."""
+    response = make_response(size, defect_rate)
+    best = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        _, defects = homework.validate_response(response)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return dict(
+        homeworks=size,
+        defects=len(defects),
+        seconds_ms=round(best * 1000, 3),
+        per_homework_us=round(best / size * 1_000_000, 3),
+    )
+
+
+def parse_args(args=None):
+    """Аргументы командной строки."""
+    parser = argparse.ArgumentParser(
+        description='Время проверки ответа API в зависимости от его размера.'
+    )
+    parser.add_argument(
+        'sizes', nargs='*', type=int, default=SIZES, metavar='size',
+        help='домашек в ответе; можно несколько',
+    )
+    parser.add_argument(
+        '--defect-rate', type=float, default=DEFECT_RATE,
+        help='доля домашек с ошибкой',
+    )
+    parser.add_argument(
+        '--json', action='store_true', help='печатать отчёт в JSON',
+    )
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    """Проверить ответы каждого размера и напечатать время на домашку."""
+    options = parse_args(args)
+    # Отладочные логи проверки не должны попадать в замер.
+    logging.disable(logging.DEBUG)
+    for size in options.sizes:
+        report = run_case(size, options.defect_rate)
+        if options.json:
+            print(json.dumps(report, ensure_ascii=False))
+        else:
+            print(REPORT.format(**report))
+
+
+if __name__ == '__main__':
+    main()
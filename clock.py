@@ -0,0 +1,173 @@
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+# С какого unix time начинается виртуальное время по умолчанию.
+VIRTUAL_EPOCH = 1_700_000_000
+# Text messages:
+VIRTUAL_DEADLOCK_RAISE = (
+    'Виртуальное время: ждём без срока, а таймеров нет — цикл не проснётся'
+)
+
+
+class Clock:
+    """Настоящее время: модуль time, threading.Event и потоки.
+
+    Цикл опроса, расписание и размыкатели берут время только у своего
+    clock, поэтому в тестах и бенчмарках его заменяет VirtualClock.
+    """
+
+    def time(self):
+        """Unix time, c."""
+        return time.time()
+
+    def monotonic(self):
+        """Монотонное время для интервалов, c."""
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        """Уснуть на seconds секунд."""
+        time.sleep(seconds)
+
+    def wait(self, event, timeout=None):
+        """Ждать event не дольше timeout; True — дождались."""
+        return event.wait(timeout)
+
+    def call_later(self, delay, callback):
+        """Вызвать callback через delay секунд; cancel() — отменить."""
+        timer = threading.Timer(delay, callback)
+        timer.daemon = True
+        timer.start()
+        return timer
+
+    def executor(self, max_workers):
+        """Пул, в котором идут опросы подписчиков."""
+        return ThreadPoolExecutor(max_workers=max_workers)
+
+
+CLOCK = Clock()
+
+
+class InlineExecutor:
+    """Пул без потоков: submit() выполняет задачу сразу.
+
+    В виртуальном времени опросы идут по очереди в потоке цикла:
+    иначе порядок событий зависел бы от планировщика потоков.
+    """
+
+    def submit(self, function, *args, **kwargs):
+        """Выполнить function и вернуть готовый Future."""
+        future = Future()
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(function(*args, **kwargs))
+        except BaseException as error:
+            future.set_exception(error)
+        return future
+
+    def shutdown(self, wait=True):
+        """Потоков нет: останавливать нечего."""
+
+
+class VirtualTimer:
+    """Отложенный вызов VirtualClock.call_later()."""
+
+    __slots__ = ('at', 'callback', 'cancelled')
+
+    def __init__(self, at, callback):
+        """Вызов callback в момент at виртуального времени."""
+        self.at = at
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        """Не вызывать callback."""
+        self.cancelled = True
+
+
+class VirtualClock:
+    """Время, которое идёт только когда его ждут.
+
+    sleep() и wait() не ждут, а переводят часы вперёд, по пути вызывая
+    таймеры call_later() в порядке их срока. Так неделя опроса
+    проходит за секунды, а результат повторяется от запуска к запуску.
+    Часы рассчитаны на один поток: опросы идут в InlineExecutor.
+    monotonic() отсчитывается от нуля, time() — от start.
+    """
+
+    def __init__(self, start=VIRTUAL_EPOCH):
+        """Часы, которые показывают start."""
+        self.start = start
+        self.elapsed = 0.0
+        self.timers = []
+        self.sequence = itertools.count()
+        # Сколько раз и сколько всего секунд ждали.
+        self.sleeps = 0
+        self.slept = 0.0
+
+    def time(self):
+        """Виртуальный unix time, c."""
+        return self.start + self.elapsed
+
+    def monotonic(self):
+        """Сколько виртуальных секунд прошло, c."""
+        return self.elapsed
+
+    def advance(self, seconds, until=None):
+        """Перевести часы на seconds вперёд, вызывая таймеры по пути.
+
+        Если после таймера until() истинно, часы останавливаются на нём.
+        """
+        target = self.elapsed + max(0, seconds)
+        self.sleeps += 1
+        started = self.elapsed
+        while self.timers and self.timers[0][0] <= target:
+            at, _, timer = heapq.heappop(self.timers)
+            if timer.cancelled:
+                continue
+            self.elapsed = max(self.elapsed, at)
+            timer.callback()
+            if until is not None and until():
+                break
+        else:
+            self.elapsed = target
+        self.slept += self.elapsed - started
+
+    def sleep(self, seconds):
+        """Перевести часы на seconds вперёд."""
+        self.advance(seconds)
+
+    def wait(self, event, timeout=None):
+        """Ждать event не дольше timeout виртуальных секунд.
+
+        Разбудить event может только таймер: других потоков нет.
+        """
+        if event.is_set():
+            return True
+        if timeout is None:
+            timeout = self.next_timer()
+            if timeout is None:
+                raise RuntimeError(VIRTUAL_DEADLOCK_RAISE)
+        self.advance(timeout, until=event.is_set)
+        return event.is_set()
+
+    def next_timer(self):
+        """Через сколько секунд ближайший таймер; None — таймеров нет."""
+        while self.timers and self.timers[0][2].cancelled:
+            heapq.heappop(self.timers)
+        if not self.timers:
+            return None
+        return max(0, self.timers[0][0] - self.elapsed)
+
+    def call_later(self, delay, callback):
+        """Вызвать callback, когда часы дойдут до now + delay."""
+        timer = VirtualTimer(self.elapsed + delay, callback)
+        heapq.heappush(self.timers, (timer.at, next(self.sequence), timer))
+        return timer
+
+    def executor(self, max_workers):
+        """Опросы — по очереди в потоке цикла."""
+        return InlineExecutor()
@@ -0,0 +1,270 @@
+import functools
+import logging
+import os
+import threading
+import time
+
+
+# Сколько секунд копить уведомления чата; 0 — отправлять как есть.
+COALESCE_WINDOW = float(os.getenv('COALESCE_WINDOW', 1))
+# Сколько уведомлений склеивать в одно сообщение, не дожидаясь окна.
+COALESCE_MAX = int(os.getenv('COALESCE_MAX', 20))
+# Сколько уведомлений может ждать окна во всех чатах сразу.
+COALESCE_SIZE = int(os.getenv('COALESCE_SIZE', 1000))
+PUT_TIMEOUT = 1
+# Предел длины сообщения в Bot API, символов.
+MESSAGE_LIMIT = 4096
+SEPARATOR = '\n\n'
+# Text messages:
+COALESCE_FULL_LOGS = 'Уведомлений ждёт окна: %d, сообщение в %s ждёт'
+COALESCE_DROPPED_LOGS = 'Не успели передать в отправку сообщение в %s:\n%s'
+COALESCE_LOGS = 'В %s: уведомлений %d, сообщений %d'
+
+
+def split_text(text, limit=MESSAGE_LIMIT):
+    """Текст кусками не длиннее limit, по возможности по строкам."""
+    parts = []
+    while len(text) > limit:
+        cut = text.rfind('\n', 0, limit + 1)
+        if cut <= 0:
+            cut = limit
+        parts.append(text[:cut])
+        text = text[cut:].lstrip('\n')
+    if text:
+        parts.append(text)
+    return parts
+
+
+def pack(texts, limit=MESSAGE_LIMIT, separator=SEPARATOR):
+    """Сообщения render() и номера уведомлений texts в каждом.
+
+    Список пар (сообщение, номера): длинное уведомление, разрезанное
+    split_text, попадает в несколько сообщений.
+    """
+    messages = []
+    current = ''
+    sources = []
+    for index, text in enumerate(texts):
+        for part in split_text(text, limit):
+            if not current:
+                current = part
+            elif len(current) + len(separator) + len(part) <= limit:
+                current += separator + part
+            else:
+                messages.append((current, sources))
+                current = part
+                sources = []
+            if index not in sources:
+                sources.append(index)
+    if current:
+        messages.append((current, sources))
+    return messages
+
+
+def render(texts, limit=MESSAGE_LIMIT, separator=SEPARATOR):
+    """Уведомления texts как можно меньшим числом сообщений до limit.
+
+    Уведомления идут по порядку и не рвутся, если помещаются в одно
+    сообщение; длинное режет split_text.
+    """
+    return [message for message, _ in pack(texts, limit, separator)]
+
+
+class Receipt:
+    """Исход склеенных уведомлений по исходам сообщений из pack().
+
+    done уведомления вызывается, когда решилась судьба всех сообщений
+    с его текстом: True — только если все они отправлены.
+    """
+
+    def __init__(self, dones, messages):
+        """Ждём исходов сообщений messages для уведомлений."""
+        self.dones = dones
+        self.delivered = [True] * len(dones)
+        self.remaining = [0] * len(dones)
+        for _, sources in messages:
+            for index in sources:
+                self.remaining[index] += 1
+        self.lock = threading.Lock()
+
+    def settle(self, sources, delivered):
+        """Учесть исход сообщения с уведомлениями sources."""
+        settled = []
+        with self.lock:
+            for index in sources:
+                self.delivered[index] &= delivered
+                self.remaining[index] -= 1
+                if not self.remaining[index]:
+                    settled.append(index)
+        for index in settled:
+            if self.dones[index] is not None:
+                self.dones[index](self.delivered[index])
+
+
+class Batch:
+    """Уведомления одного чата, которые ждут окна."""
+
+    __slots__ = (
+        'chat_id', 'tenant', 'texts', 'dones', 'length', 'ready_at'
+    )
+
+    def __init__(self, chat_id, tenant, ready_at):
+        """Пустое окно чата chat_id до ready_at."""
+        self.chat_id = chat_id
+        self.tenant = tenant
+        self.texts = []
+        self.dones = []
+        self.length = 0
+        self.ready_at = ready_at
+
+    def add(self, text, done=None):
+        """Добавить уведомление."""
+        self.texts.append(text)
+        self.dones.append(done)
+        self.length += len(text) + len(SEPARATOR)
+
+
+class Coalescer:
+    """Уведомления одного чата за window секунд — одним сообщением.
+
+    Стоит перед outbox.Outbox (или topology.QueueOutbox) и принимает
+    те же put(). Окно чата открывает первое уведомление; когда оно
+    закончится, набралось max_messages уведомлений или текст дорос до
+    предела Bot API, поток склеивает их (render) и передаёт в target.
+    Во время пачки проверок ревьюером это сокращает число запросов
+    к Bot API и упирается в лимит чата реже. Всего ждать окна может
+    не больше maxsize уведомлений: дальше put() ждёт, как у Outbox.
+    done(delivered) уведомления вызывается по исходу отправки в target
+    всех сообщений с его текстом (Receipt).
+    """
+
+    def __init__(self, target, window=COALESCE_WINDOW,
+                 max_messages=COALESCE_MAX, limit=MESSAGE_LIMIT,
+                 maxsize=COALESCE_SIZE):
+        """Окна перед target; поток запускает start()."""
+        self.target = target
+        self.window = window
+        self.max_messages = max_messages
+        self.limit = limit
+        self.maxsize = maxsize
+        self.batches = {}
+        self.buffered = 0
+        self.condition = threading.Condition()
+        self.stopping = threading.Event()
+        self.deadline = None
+        self.thread = threading.Thread(
+            target=self._run, name='coalescer', daemon=True
+        )
+        self.received = self.forwarded = self.dropped = 0
+
+    @property
+    def breaker(self):
+        """Размыкатель Telegram у target."""
+        return self.target.breaker
+
+    def start(self):
+        """Запустить поток, который закрывает окна."""
+        self.thread.start()
+        return self
+
+    def put(self, chat_id, text, timeout=PUT_TIMEOUT, tenant=None,
+            done=None):
+        """Добавить уведомление в окно чата; False, если места нет."""
+        if self.stopping.is_set():
+            return False
+        with self.condition:
+            if not self.condition.wait_for(
+                lambda: self.buffered < self.maxsize, timeout
+            ):
+                logging.warning(COALESCE_FULL_LOGS, self.buffered, chat_id)
+                return False
+            batch = self.batches.get(chat_id)
+            if batch is None:
+                batch = self.batches[chat_id] = Batch(
+                    chat_id, tenant, time.monotonic() + self.window
+                )
+            batch.add(text, done)
+            self.buffered += 1
+            self.received += 1
+            if (len(batch.texts) >= self.max_messages
+               or batch.length >= self.limit):
+                batch.ready_at = 0
+            self.condition.notify_all()
+        return True
+
+    def pending(self):
+        """Сколько уведомлений ждёт окна или отправки."""
+        return self.buffered + self.target.pending()
+
+    def stop(self, timeout=None):
+        """Закрыть все окна, передать их не дольше timeout и остановиться."""
+        if timeout is not None:
+            self.deadline = time.monotonic() + timeout
+        with self.condition:
+            self.stopping.set()
+            self.condition.notify_all()
+        if self.thread.is_alive():
+            self.thread.join(timeout)
+
+    def _next(self):
+        """Чат, чьё окно закончилось; при остановке — любой; None — всё."""
+        with self.condition:
+            while True:
+                if self.batches and self.stopping.is_set():
+                    return self._pop(next(iter(self.batches)))
+                if not self.batches:
+                    if self.stopping.is_set():
+                        return None
+                    self.condition.wait()
+                    continue
+                batch = min(
+                    self.batches.values(), key=lambda batch: batch.ready_at
+                )
+                wait = batch.ready_at - time.monotonic()
+                if wait <= 0:
+                    return self._pop(batch.chat_id)
+                self.condition.wait(wait)
+
+    def _pop(self, chat_id):
+        batch = self.batches.pop(chat_id)
+        self.buffered -= len(batch.texts)
+        self.condition.notify_all()
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next()
+            if batch is None:
+                break
+            self._forward(batch)
+
+    def _forward(self, batch):
+        messages = pack(batch.texts, self.limit)
+        logging.debug(
+            COALESCE_LOGS, batch.chat_id, len(batch.texts), len(messages)
+        )
+        receipt = None
+        if any(done is not None for done in batch.dones):
+            receipt = Receipt(batch.dones, messages)
+        for text, sources in messages:
+            done = None
+            if receipt is not None:
+                done = functools.partial(receipt.settle, sources)
+            if self._put(batch, text, done):
+                self.forwarded += 1
+            else:
+                self.dropped += 1
+                logging.error(COALESCE_DROPPED_LOGS, batch.chat_id, text)
+                if done is not None:
+                    done(False)
+
+    def _put(self, batch, text, done=None):
+        """Передать сообщение в target; при остановке — до срока."""
+        while not self.target.put(
+            batch.chat_id, text, tenant=batch.tenant, done=done
+        ):
+            if self.stopping.is_set() and (
+                self.deadline is None or time.monotonic() >= self.deadline
+            ):
+                return False
+        return True
@@ -0,0 +1,188 @@
+import logging
+import time
+
+import metrics
+
+
+# Потоки Dispatcher, которые отвечают на команды.
+COMMAND_WORKERS = 4
+COMMANDS = ('status', 'history', 'pause', 'resume')
+STATUS_NAMES = {
+    'reviewing': 'на проверке',
+    'approved': 'принято',
+    'rejected': 'с замечаниями',
+}
+SECONDS_PER_MINUTE = 60
+# Text messages:
+NOT_SUBSCRIBED_MESSAGE = 'Этот чат не подписан на статусы домашек.'
+STATUS_MESSAGE = (
+    '{name}: {state}\n'
+    'Домашек: {total}{statuses}\n'
+    'Последнее уведомление: {last_message}'
+)
+POLLED_STATE = 'API отвечал {minutes} мин назад'
+NEVER_POLLED_STATE = 'API ещё не отвечал'
+PAUSED_STATE = 'опрос на паузе, /resume — продолжить'
+STATUS_COUNT = ', {status}: {count}'
+NO_MESSAGE = 'не было'
+HISTORY_MESSAGE = '{name}:\n{lines}'
+HISTORY_LINE = '{minutes} мин назад: {message}'
+EMPTY_HISTORY_MESSAGE = '{name}: уведомлений пока не было'
+PAUSED_MESSAGE = '{name}: опрос приостановлен, /resume — продолжить'
+RESUMED_MESSAGE = '{name}: опрос возобновлён'
+COMMAND_LOGS = 'Команда /%s из чата %s: ответ за %.2f мс'
+COMMANDS_LOGS_START = 'Слушаем команды чатов: %s'
+
+
+def minutes_ago(moment, now):
+    """Сколько целых минут прошло с moment (unix time)."""
+    return max(0, round((now - moment) / SECONDS_PER_MINUTE))
+
+
+def status_text(tenant, now=None):
+    """Ответ на /status: пауза, свежесть данных и статусы домашек."""
+    now = time.time() if now is None else now
+    if tenant.paused:
+        state = PAUSED_STATE
+    elif tenant.polled_at is None:
+        state = NEVER_POLLED_STATE
+    else:
+        state = POLLED_STATE.format(
+            minutes=minutes_ago(tenant.polled_at, now)
+        )
+    counts = tenant.homeworks.status_counts()
+    return STATUS_MESSAGE.format(
+        name=tenant.name,
+        state=state,
+        total=len(tenant.homeworks),
+        statuses=''.join(
+            STATUS_COUNT.format(
+                status=STATUS_NAMES.get(status, status), count=count
+            )
+            for status, count in sorted(
+                counts.items(), key=lambda item: str(item[0])
+            )
+        ),
+        last_message=tenant.last_message or NO_MESSAGE,
+    )
+
+
+def history_text(tenant, now=None):
+    """Ответ на /history: последние уведомления, новые сверху."""
+    now = time.time() if now is None else now
+    history = list(tenant.history)
+    if not history:
+        if tenant.last_message is None:
+            return EMPTY_HISTORY_MESSAGE.format(name=tenant.name)
+        # После перезапуска из истории известно только последнее.
+        return HISTORY_MESSAGE.format(
+            name=tenant.name, lines=tenant.last_message
+        )
+    return HISTORY_MESSAGE.format(
+        name=tenant.name,
+        lines='\n'.join(
+            HISTORY_LINE.format(
+                minutes=minutes_ago(sent_at, now), message=message
+            )
+            for sent_at, message in reversed(history)
+        ),
+    )
+
+
+class Commands:
+    """Ответы на команды чата только из состояния в памяти.
+
+    К API Практикума команды не ходят, поэтому отвечают за
+    миллисекунды, как бы ни тормозил API. engine — poller.Poller:
+    подписчики чата ищутся в его текущем списке, так что после SIGHUP
+    команды видят новый конфиг.
+    """
+
+    def __init__(self, engine):
+        """Команды о подписчиках engine."""
+        self.engine = engine
+
+    def tenants(self, chat_id):
+        """Подписчики, чьи уведомления приходят в чат chat_id."""
+        return [
+            tenant for tenant in self.engine.tenants
+            if str(tenant.chat_id) == str(chat_id)
+        ]
+
+    def reply(self, chat_id, render):
+        """Ответ для всех подписчиков чата через render(tenant)."""
+        found = self.tenants(chat_id)
+        if not found:
+            return NOT_SUBSCRIBED_MESSAGE
+        return '\n\n'.join(render(tenant) for tenant in found)
+
+    def status(self, chat_id):
+        """Ответ на /status."""
+        return self.reply(chat_id, status_text)
+
+    def history(self, chat_id):
+        """Ответ на /history."""
+        return self.reply(chat_id, history_text)
+
+    def pause(self, chat_id):
+        """Ответ на /pause: опрос подписчиков чата приостановлен."""
+        def pause(tenant):
+            self.engine.pause(tenant)
+            return PAUSED_MESSAGE.format(name=tenant.name)
+        return self.reply(chat_id, pause)
+
+    def resume(self, chat_id):
+        """Ответ на /resume: опрос подписчиков чата возобновлён."""
+        def resume(tenant):
+            self.engine.pause(tenant, paused=False)
+            return RESUMED_MESSAGE.format(name=tenant.name)
+        return self.reply(chat_id, resume)
+
+    def handler(self, name):
+        """Колбэк telegram.ext.CommandHandler для команды name."""
+        answer = getattr(self, name)
+
+        def callback(update, context):
+            started = time.perf_counter()
+            chat_id = update.effective_chat.id
+            text = answer(chat_id)
+            elapsed = time.perf_counter() - started
+            metrics.COMMAND_SECONDS.labels(name).observe(elapsed)
+            logging.debug(COMMAND_LOGS, name, chat_id, elapsed * 1000)
+            update.effective_message.reply_text(text)
+        return callback
+
+    def register(self, dispatcher):
+        """Добавить обработчики COMMANDS в dispatcher."""
+        from telegram.ext import CommandHandler
+        for name in COMMANDS:
+            dispatcher.add_handler(CommandHandler(name, self.handler(name)))
+
+
+def make_bot(token, workers=COMMAND_WORKERS, **kwargs):
+    """telegram.Bot с пулом соединений, которого хватит Updater.
+
+    Updater просит не меньше workers + 4 соединений: через один пул идут
+    long polling, ответы на команды и уведомления. kwargs — остальные
+    аргументы telegram.Bot.
+    """
+    import telegram
+    from telegram.utils.request import Request
+    return telegram.Bot(
+        token=token, request=Request(con_pool_size=workers + 4), **kwargs
+    )
+
+
+def make_updater(bot, engine, workers=COMMAND_WORKERS):
+    """Updater с обработчиками команд и workers потоками Dispatcher."""
+    from telegram.ext import Updater
+    updater = Updater(bot=bot, workers=workers)
+    Commands(engine).register(updater.dispatcher)
+    return updater
+
+
+def start(updater):
+    """Слушать команды long polling'ом."""
+    updater.start_polling(drop_pending_updates=True)
+    logging.info(COMMANDS_LOGS_START, ', '.join(COMMANDS))
+    return updater
@@ -0,0 +1,30 @@
+import os
+
+from homework_index import updated_at
+
+
+# Насколько from_date отстаёт от current_date, c: изменения, которые API
+# показал с опозданием, всё равно попадут в следующий ответ. Повторы
+# в перекрытии отсеивает HomeworkIndex по id домашки.
+OVERLAP = int(os.getenv('CURSOR_OVERLAP', 5 * 60))
+
+
+def advance(from_date, response, undelivered=(), overlap=OVERLAP):
+    """Новый from_date после ответа API.
+
+    Двигается к current_date - overlap после каждого успешного ответа,
+    в том числе пустого, и никогда не назад. Домашки undelivered, о
+    которых не удалось уведомить, должны попасть в следующий ответ:
+    from_date останется не позже их date_updated - overlap.
+    """
+    current_date = response.get('current_date')
+    if not isinstance(current_date, int):
+        return from_date
+    watermark = current_date - overlap
+    for homework in undelivered:
+        updated = updated_at(homework)
+        if updated is None:
+            # Без даты нельзя сказать, где безопасно: не двигаемся.
+            return from_date
+        watermark = min(watermark, int(updated) - overlap)
+    return max(from_date, watermark)
@@ -0,0 +1,95 @@
+import itertools
+import threading
+
+from homework_index import homework_key
+
+
+class Pending:
+    """Уведомление о домашке, отданное в outbox и ещё не подтверждённое."""
+
+    __slots__ = ('homework', 'previous', 'message', 'latest')
+
+    def __init__(self, homework, previous, message):
+        """Уведомление message о homework; previous — статус до него."""
+        self.homework = homework
+        # Статус домашки в индексе до уведомления: к нему вернёмся,
+        # если outbox сообщение не отправит.
+        self.previous = previous
+        self.message = message
+        # Самое свежее уведомление об этой домашке: только его статус
+        # можно сохранять, иначе опоздавшее подтверждение затрёт новый.
+        self.latest = True
+
+
+class Deliveries:
+    """Уведомления подписчика, которые outbox ещё не подтвердил.
+
+    Poller запоминает домашку в индексе сразу, чтобы не уведомлять
+    о ней дважды, но сохраняет её статус только после подтверждения,
+    а курсор from_date не пускает дальше неподтверждённых (unconfirmed).
+    Потерянные outbox уведомления ждут следующего опроса в dropped:
+    тогда индекс вернётся к прежнему статусу и уведомление уйдёт снова.
+    Подтверждения приходят из потока outbox, поэтому всё под lock.
+    """
+
+    def __init__(self):
+        """Ничего не ждём."""
+        self.lock = threading.Lock()
+        self.tickets = itertools.count()
+        self.pending = {}
+        self.latest = {}
+        self.dropped = []
+
+    def __len__(self):
+        """Сколько уведомлений ждёт подтверждения."""
+        return len(self.pending)
+
+    def track(self, homework, previous, message):
+        """Начать ждать подтверждения; номер уведомления."""
+        key = homework_key(homework)
+        with self.lock:
+            ticket = next(self.tickets)
+            self.pending[ticket] = Pending(homework, previous, message)
+            self.latest[key] = ticket
+            return ticket
+
+    def settle(self, ticket, delivered):
+        """Учесть исход уведомления ticket; Pending, если оно отправлено.
+
+        Неотправленное уходит в dropped, и возвращается None.
+        """
+        with self.lock:
+            pending = self.pending.pop(ticket, None)
+            if pending is None:
+                return None
+            key = homework_key(pending.homework)
+            pending.latest = self.latest.get(key) == ticket
+            if pending.latest:
+                del self.latest[key]
+            if not delivered:
+                self.dropped.append(pending)
+                return None
+            return pending
+
+    def cancel(self, ticket):
+        """Outbox не принял уведомление: перестать его ждать; Pending."""
+        with self.lock:
+            pending = self.pending.pop(ticket)
+            key = homework_key(pending.homework)
+            if self.latest.get(key) == ticket:
+                del self.latest[key]
+            return pending
+
+    def take_dropped(self):
+        """Потерянные уведомления с прошлого опроса."""
+        with self.lock:
+            dropped, self.dropped = self.dropped, []
+            return dropped
+
+    def unconfirmed(self):
+        """Домашки, дальше которых курсору from_date нельзя."""
+        with self.lock:
+            return [
+                pending.homework
+                for pending in (*self.pending.values(), *self.dropped)
+            ]
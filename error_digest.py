@@ -0,0 +1,133 @@
+import os
+import threading
+from collections import Counter
+
+from clock import CLOCK
+
+
+# Окно, за которое подписчик получает не больше одной сводки ошибок, c.
+DIGEST_WINDOW = int(os.getenv('ERROR_DIGEST_WINDOW', 60 * 60))
+# Сколько символов текста ошибки показывать в сводке.
+EXAMPLE_LENGTH = 200
+SECONDS_PER_MINUTE = 60
+# Text messages:
+DIGEST_MESSAGE = (
+    'Ошибки продолжаются: за {minutes} мин ещё {total}.\n{lines}'
+)
+DIGEST_LINE = '{where}{type} × {count}: {example}'
+
+
+def fingerprint(error):
+    """Отпечаток ошибки: стадия, где она случилась, и тип исключения.
+
+    Стадию проставляет metrics.stage(); текст ошибки в отпечаток не
+    входит, потому что в нём бывают заголовки и параметры запроса.
+    """
+    return getattr(error, 'stage', None), type(error).__name__
+
+
+def example(error):
+    """Первая строка текста ошибки, не длиннее EXAMPLE_LENGTH."""
+    lines = str(error).splitlines()
+    return lines[0][:EXAMPLE_LENGTH] if lines else ''
+
+
+class ErrorWindow:
+    """Ошибки подписчика, о которых ещё не рассказали."""
+
+    __slots__ = ('opened_at', 'counts', 'examples')
+
+    def __init__(self, opened_at):
+        """Пустое окно, открытое в opened_at."""
+        self.opened_at = opened_at
+        self.counts = Counter()
+        self.examples = {}
+
+
+class ErrorDigest:
+    """Не больше одного сообщения об ошибках на подписчика за window.
+
+    Первая ошибка сообщается сразу (по шаблону template с {error})
+    и открывает окно. Следующие только считаются по отпечаткам, а когда
+    окно закончится, уходят одной сводкой; если ошибки были, сразу
+    открывается следующее окно. Успешный опрос окно не сбрасывает.
+    Время — unix time от clock, чтобы окна переживали перезапуск
+    (storage.StateStore.save_errors).
+    """
+
+    def __init__(self, window=DIGEST_WINDOW, template='{error}',
+                 clock=CLOCK):
+        """Сводки раз в window секунд по шаблону template."""
+        self.window = window
+        self.template = template
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.windows = {}
+
+    def record(self, key, error, now=None):
+        """Учесть ошибку подписчика key; текст сообщения или None."""
+        now = self.clock.time() if now is None else now
+        with self.lock:
+            message = self._close_expired(key, now)
+            window = self.windows.get(key)
+            if window is None:
+                self.windows[key] = ErrorWindow(now)
+                return self.template.format(error=error)
+            mark = fingerprint(error)
+            window.counts[mark] += 1
+            window.examples.setdefault(mark, example(error))
+            return message
+
+    def check(self, key, now=None):
+        """Сводка, если окно подписчика key закончилось; иначе None."""
+        now = self.clock.time() if now is None else now
+        with self.lock:
+            return self._close_expired(key, now)
+
+    def snapshot(self):
+        """Открытые окна: (key, opened_at, [(stage, type, count, example)])."""
+        with self.lock:
+            return [
+                (key, window.opened_at, [
+                    (stage, type_name, count,
+                     window.examples[stage, type_name])
+                    for (stage, type_name), count in window.counts.items()
+                ])
+                for key, window in self.windows.items()
+            ]
+
+    def restore(self, key, opened_at, counts):
+        """Восстановить окно из snapshot()."""
+        window = ErrorWindow(opened_at)
+        for stage, type_name, count, text in counts:
+            window.counts[stage, type_name] = count
+            window.examples[stage, type_name] = text
+        with self.lock:
+            self.windows[key] = window
+
+    def _close_expired(self, key, now):
+        window = self.windows.get(key)
+        if window is None or now - window.opened_at < self.window:
+            return None
+        if not window.counts:
+            del self.windows[key]
+            return None
+        self.windows[key] = ErrorWindow(now)
+        return self.digest(window, now)
+
+    def digest(self, window, now):
+        """Текст сводки по окну."""
+        lines = [
+            DIGEST_LINE.format(
+                where=f'{stage}: ' if stage else '',
+                type=type_name,
+                count=count,
+                example=window.examples[stage, type_name],
+            )
+            for (stage, type_name), count in window.counts.most_common()
+        ]
+        return DIGEST_MESSAGE.format(
+            minutes=round((now - window.opened_at) / SECONDS_PER_MINUTE),
+            total=sum(window.counts.values()),
+            lines='\n'.join(lines),
+        )
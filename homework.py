@@ -1,14 +1,21 @@
 import logging
+import logging.handlers
 import os
+import queue
 import sys
 import time
 from http import HTTPStatus
 
 import requests
-import telegram
 from dotenv import load_dotenv
 
+import cursor
+import http_client
+import lifecycle
 import local_exceptions
+import messages
+from error_digest import ErrorDigest
+from homework_index import HomeworkIndex, homework_key
 
 
 load_dotenv()
@@ -28,17 +35,29 @@ HOMEWORK_VERDICTS = {
     'rejected': 'Работа проверена: у ревьюера есть замечания.'
 }
 RETRY_PERIOD = 10 * 60
+LOG_FORMAT = (
+    '%(asctime)s - '
+    '%(levelname)s - '
+    '%(name)s - '
+    '%(funcName)s - '
+    '%(lineno)d - '
+    '%(message)s'
+)
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 3
+# SIGTERM прерывает сон main(), но не отправку сообщения.
+SIGNAL_EXIT = lifecycle.SignalExit()
 # Text messages:
 LOGS_OK = 'OK'
 LOGS_END = '--- end of file ---'
 # func check_tokens
 TOKENS_LOGS_START = 'Проверка токенов'
-NO_TOKENS_LOGS = 'Потеряли токен(ы) в {missing_tokens}'
+NO_TOKENS_LOGS = 'Потеряли токен(ы) в %s'
 NO_TOKENS_RAISE = 'Потеряли токен(ы): {missing_tokens}'
 # func send_message
 MESSAGE_LOGS_START = 'Отправляем сообщение в ТГ...'
-MESSAGE_SENT_LOGS = 'Сообщение успешно отправлено. {message}'
-MESSAGE_NOT_SENT_LOGS = 'Ошибка {error} при отправке сообщения:\n{message}'
+MESSAGE_SENT_LOGS = 'Сообщение успешно отправлено. %s'
+MESSAGE_NOT_SENT_LOGS = 'Ошибка %s при отправке сообщения:\n%s'
 # func get_api_answer
 API_LOGS_START = 'Проверка запроса к API'
 API_BAD_REQUEST_RAISE = (
@@ -72,26 +91,38 @@ STATUS_LOGS_START = 'Проверка статуса домашней работ
 STATUS_UNKNOWN_NAME_RAISE = 'Нет ключа homework_name в домашке'
 STATUS_UNKNOWN_RAISE = 'Нет ключа status в домашке'
 STATUS_NOT_IN_VERDICTS_RAISE = 'Статуса {status} нет в HOMEWORK_VERDICTS'
+HOMEWORK_NOT_DICT_RAISE = 'Домашка не словарь, а {type}'
 STATUS_MESSAGE = (
     'Изменился статус проверки работы '
     '"{homework_name}". {verdict}'
 )
+# func validate_response
+# Сколько дефектов перечислять в тексте ошибки: остальные только считаются.
+MAX_DEFECT_LINES = 5
+DEFECT_LINE = '№{position} ({key}): {problem}'
+DEFECTS_RAISE = 'Домашек с ошибками в ответе API: {count}\n{lines}'
+DEFECTS_MORE = '\n… и ещё {count}'
 # func main LOGS
 MAIN_LOGS_START = '--- beginning of file ---'
 MAIN_NO_UPDATES = 'Статус домашки не менялся'
 MAIN_ERROR_MESSAGE = 'Хьюстон, у нас проблемы: {error}'
+# Шаблоны на других языках — в messages.LOCALES_DIR.
+MESSAGES = messages.Messages(STATUS_MESSAGE, HOMEWORK_VERDICTS)
 
 
 def check_tokens():
     """Переменные окружения доступны."""
+    check_token_names(TOKENS)
+
+
+def check_token_names(token_names):
+    """Переменные окружения из списка доступны."""
     logging.debug(TOKENS_LOGS_START)
     missing_tokens = [token_name
-                      for token_name in TOKENS
+                      for token_name in token_names
                       if globals()[token_name] is None]
     if missing_tokens:
-        logging.critical(NO_TOKENS_LOGS.format(
-            missing_tokens=missing_tokens)
-        )
+        logging.critical(NO_TOKENS_LOGS, missing_tokens)
         raise ValueError(NO_TOKENS_RAISE.format(
             missing_tokens=missing_tokens)
         )
@@ -99,42 +130,59 @@ def check_tokens():
 
 def send_message(bot, message):
     """Отправка сообщений в Telegram."""
+    return send_chat_message(bot, TELEGRAM_CHAT_ID, message)
+
+
+def send_chat_message(bot, chat_id, message):
+    """Отправка сообщения в указанный чат Telegram."""
+    # telegram импортируется долго: только когда есть что отправить.
+    import telegram
     logging.debug(MESSAGE_LOGS_START)
     try:
         bot.send_message(
-            chat_id=TELEGRAM_CHAT_ID,
+            chat_id=chat_id,
             text=message)
-        logging.debug(MESSAGE_SENT_LOGS.format(
-            message=message)
-        )
+        logging.debug(MESSAGE_SENT_LOGS, message)
         return True
     except telegram.TelegramError as error:
-        logging.exception(MESSAGE_NOT_SENT_LOGS.format(
-            error=error,
-            message=message)
-        )
+        logging.exception(MESSAGE_NOT_SENT_LOGS, error, message)
         return False
 
 
 def get_api_answer(timestamp):
     """Запрос к эндпоинту API-сервиса."""
+    return get_tenant_api_answer(PRACTICUM_TOKEN, timestamp)
+
+
+def get_tenant_api_answer(token, timestamp, client=None):
+    """Запрос к эндпоинту API-сервиса с токеном подписчика.
+
+    Если передан client (http_client.HttpClient), запрос идёт через его
+    пул keep-alive соединений.
+    """
     logging.debug(API_LOGS_START)
     data_for_api = dict(
         url=ENDPOINT,
-        headers=HEADERS,
+        headers={'Authorization': f'OAuth {token}'},
         params={'from_date': timestamp},
     )
     try:
-        response = requests.get(**data_for_api)
+        if client is None:
+            response = requests.get(timeout=http_client.TIMEOUT,
+                                    **data_for_api)
+        else:
+            response = client.get(**data_for_api)
     except requests.RequestException as error:
         raise ConnectionError(API_BAD_REQUEST_RAISE.format(
             error=error,
             **data_for_api)
         )
     if response.status_code != HTTPStatus.OK:
-        raise local_exceptions.Not200Error(API_NOT200_RAISE.format(
+        raise local_exceptions.Not200Error(
+            API_NOT200_RAISE.format(
+                status_code=response.status_code,
+                **data_for_api),
             status_code=response.status_code,
-            **data_for_api)
         )
     response = response.json()
     for key in ['code', 'error']:
@@ -166,22 +214,83 @@ def check_response(response):
     return homeworks
 
 
-def parse_status(homework):
-    """Статус домашней работы."""
-    logging.debug(STATUS_LOGS_START)
+def homework_defect(homework):
+    """Первая ошибка в домашке: (класс исключения, текст) или None."""
+    if not isinstance(homework, dict):
+        return TypeError, HOMEWORK_NOT_DICT_RAISE.format(type=type(homework))
     if 'homework_name' not in homework:
-        raise KeyError(STATUS_UNKNOWN_NAME_RAISE)
+        return KeyError, STATUS_UNKNOWN_NAME_RAISE
     if 'status' not in homework:
-        raise KeyError(STATUS_UNKNOWN_RAISE)
+        return KeyError, STATUS_UNKNOWN_RAISE
     status = homework.get('status')
-    if status not in HOMEWORK_VERDICTS:
-        raise ValueError(STATUS_NOT_IN_VERDICTS_RAISE.format(
-            status=status)
-        )
+    if not isinstance(status, str) or status not in HOMEWORK_VERDICTS:
+        return ValueError, STATUS_NOT_IN_VERDICTS_RAISE.format(status=status)
+    return None
+
+
+def parse_status(homework):
+    """Статус домашней работы."""
+    logging.debug(STATUS_LOGS_START)
+    defect = homework_defect(homework)
+    if defect is not None:
+        error, message = defect
+        raise error(message)
     logging.debug(LOGS_OK)
-    return STATUS_MESSAGE.format(
-        homework_name=homework.get('homework_name'),
-        verdict=HOMEWORK_VERDICTS.get(status)
+    return MESSAGES.status(homework)
+
+
+class Defect:
+    """Домашка, которую не получилось разобрать.
+
+    position — номер в списке homeworks ответа, key — id или название
+    домашки (None, если домашка не словарь), problem — текст ошибки.
+    """
+
+    __slots__ = ('position', 'key', 'problem')
+
+    def __init__(self, position, key, problem):
+        """Проблема problem с ключом key домашки номер position."""
+        self.position = position
+        self.key = key
+        self.problem = problem
+
+    def __repr__(self):
+        """Строка для сообщения об ошибке: DEFECT_LINE."""
+        return DEFECT_LINE.format(
+            position=self.position, key=self.key, problem=self.problem
+        )
+
+
+def validate_response(response):
+    """Проверка ответа API целиком: годные домашки и список Defect.
+
+    Конверт ответа проверяет check_response: без списка домашек
+    обрабатывать нечего, и ошибка по-прежнему прерывает опрос. Домашки
+    проверяются все за один проход, плохие не мешают остальным.
+    """
+    homeworks = check_response(response)
+    valid = []
+    defects = []
+    for position, homework in enumerate(homeworks):
+        defect = homework_defect(homework)
+        if defect is None:
+            valid.append(homework)
+            continue
+        defects.append(Defect(
+            position,
+            homework_key(homework) if isinstance(homework, dict) else None,
+            defect[1],
+        ))
+    return valid, defects
+
+
+def defects_error(defects):
+    """Исключение со всеми дефектами ответа; текст — первые из них."""
+    lines = '\n'.join(map(repr, defects[:MAX_DEFECT_LINES]))
+    if len(defects) > MAX_DEFECT_LINES:
+        lines += DEFECTS_MORE.format(count=len(defects) - MAX_DEFECT_LINES)
+    return local_exceptions.HomeworkDefectsError(
+        DEFECTS_RAISE.format(count=len(defects), lines=lines), defects
     )
 
 
@@ -189,47 +298,91 @@ def main():
     """Основная логика работы бота."""
     logging.debug(MAIN_LOGS_START)
     check_tokens()
+    import telegram
     bot = telegram.Bot(token=TELEGRAM_TOKEN)
     timestamp = int(time.time())
-    last_message = None
+    index = HomeworkIndex()
+    errors = ErrorDigest(template=MAIN_ERROR_MESSAGE)
     while True:
         try:
             response = get_api_answer(timestamp)
-            homeworks = check_response(response)
-            if not homeworks:
+            homeworks, defects = validate_response(response)
+            changes = index.changes(homeworks)
+            if not changes:
                 logging.debug(MAIN_NO_UPDATES)
-                continue
-            message = parse_status(homeworks[0])
-            if last_message != message and send_message(bot, message):
-                last_message = message
-                timestamp = response.get('current_date', timestamp)
+            undelivered = []
+            for homework in changes:
+                message = parse_status(homework)
+                with SIGNAL_EXIT.deferred():
+                    sent = send_message(bot, message)
+                if sent:
+                    index.commit(homework)
+                else:
+                    undelivered.append(homework)
+            timestamp = cursor.advance(timestamp, response, undelivered)
+            if defects:
+                raise defects_error(defects)
         except Exception as error:
-            error_message = MAIN_ERROR_MESSAGE.format(
-                error=error)
-            logging.exception(error_message)
-            if (last_message != error_message
-               and send_message(bot, error_message)):
-                last_message = error_message
-        finally:
-            time.sleep(RETRY_PERIOD)
+            logging.exception(MAIN_ERROR_MESSAGE.format(error=error))
+            error_message = errors.record(TELEGRAM_CHAT_ID, error)
+        else:
+            error_message = errors.check(TELEGRAM_CHAT_ID)
+        if error_message is not None:
+            with SIGNAL_EXIT.deferred():
+                send_message(bot, error_message)
+        # Не в finally: SystemExit по сигналу не должен ждать RETRY_PERIOD.
+        time.sleep(RETRY_PERIOD)
 
 
-if __name__ == '__main__':
-    # Logs settings
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, который не форматирует запись в потоке опроса.
+
+    Стандартный prepare() склеивает сообщение с аргументами сразу;
+    очередь здесь внутрипроцессная, поэтому запись можно отдать как есть,
+    и форматированием займётся поток QueueListener.
+    """
+
+    def prepare(self, record):
+        """Запись без форматирования."""
+        return record
+
+
+def setup_logging(filename=__file__ + '.log', queued=False):
+    """Настройка логов: в stdout и в файл с ротацией по размеру.
+
+    С queued=True запись на диск и форматирование уходят в поток
+    QueueListener; его нужно остановить (stop()) при выходе.
+    """
+    handlers = (
+        logging.StreamHandler(stream=sys.stdout),
+        logging.handlers.RotatingFileHandler(
+            filename=filename,
+            maxBytes=LOG_MAX_BYTES,
+            backupCount=LOG_BACKUP_COUNT,
+            encoding='utf-8')
+    )
+    if not queued:
+        logging.basicConfig(
+            level=logging.DEBUG,
+            handlers=handlers,
+            format=LOG_FORMAT
+        )
+        return None
+    formatter = logging.Formatter(LOG_FORMAT)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    log_queue = queue.SimpleQueue()
     logging.basicConfig(
         level=logging.DEBUG,
-        handlers=(
-            logging.StreamHandler(stream=sys.stdout),
-            logging.FileHandler(
-                filename=__file__ + '.log',
-                mode='w')
-        ),
-        format='%(asctime)s - '
-               '%(levelname)s - '
-               '%(name)s - '
-               '%(funcName)s - '
-               '%(lineno)d - '
-               '%(message)s'
+        handlers=(LazyQueueHandler(log_queue),)
     )
+    listener = logging.handlers.QueueListener(log_queue, *handlers)
+    listener.start()
+    return listener
+
+
+if __name__ == '__main__':
+    setup_logging()
+    SIGNAL_EXIT.install()
     main()
     logging.debug(LOGS_END)
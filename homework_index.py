@@ -0,0 +1,193 @@
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from datetime import datetime, timezone
+
+
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+INT64_MIN = -2 ** 63
+INT64_MAX = 2 ** 63 - 1
+# Коды статусов хранятся в bytearray.
+MAX_STATUS_CODE = 255
+# Text messages:
+TOO_MANY_STATUSES_RAISE = 'Слишком много разных статусов домашек: {status}'
+
+
+def homework_key(homework):
+    """Ключ домашки в индексе: id, а если его нет — название."""
+    return homework.get('id', homework.get('homework_name'))
+
+
+def updated_at(homework):
+    """Время изменения домашки (unix time) из date_updated или None."""
+    try:
+        return datetime.strptime(
+            homework['date_updated'], DATE_FORMAT
+        ).replace(tzinfo=timezone.utc).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class StatusCodes:
+    """Статусы домашек и их коды — маленькие целые, общие для всех индексов.
+
+    Код выдаётся статусу при первой встрече: так в индексе хранится
+    байт, а не строка из каждого ответа API. Текст уведомления по-прежнему
+    берётся из HOMEWORK_VERDICTS по имени статуса (name()).
+    """
+
+    __slots__ = ('codes', 'names', 'lock')
+
+    def __init__(self):
+        """Ни одного статуса."""
+        self.codes = {}
+        self.names = []
+        self.lock = threading.Lock()
+
+    def code(self, status):
+        """Код статуса; незнакомый статус получает следующий код."""
+        code = self.codes.get(status)
+        if code is not None:
+            return code
+        with self.lock:
+            code = self.codes.get(status)
+            if code is None:
+                if len(self.names) > MAX_STATUS_CODE:
+                    raise ValueError(TOO_MANY_STATUSES_RAISE.format(
+                        status=status)
+                    )
+                code = self.codes[status] = len(self.names)
+                self.names.append(status)
+            return code
+
+    def name(self, code):
+        """Статус по коду."""
+        return self.names[code]
+
+
+STATUS_CODES = StatusCodes()
+
+
+def is_compact_key(key):
+    """Помещается ли ключ домашки в колонку ids (целый id в int64)."""
+    return type(key) is int and INT64_MIN <= key <= INT64_MAX
+
+
+class HomeworkIndex:
+    """Последний отправленный статус каждой домашки подписчика.
+
+    Колонки вместо словаря: id домашек по возрастанию в array('q'),
+    коды статусов (STATUS_CODES) в bytearray той же длины — около
+    девяти байт на домашку. Поиск — бинарный. Домашки без целого id
+    (ключ — название) лежат в словаре others, он создаётся по
+    необходимости. Сырые ответы API индекс не хранит.
+    """
+
+    __slots__ = ('ids', 'codes', 'others')
+
+    def __init__(self):
+        """Пустой индекс."""
+        self.ids = array('q')
+        self.codes = bytearray()
+        self.others = None
+
+    def __len__(self):
+        """Сколько домашек в индексе."""
+        return len(self.ids) + len(self.others or ())
+
+    def __contains__(self, key):
+        """Есть ли в индексе домашка с ключом key."""
+        return self.code(key) is not None
+
+    def code(self, key):
+        """Код последнего статуса домашки или None."""
+        if not is_compact_key(key):
+            return None if self.others is None else self.others.get(key)
+        ids = self.ids
+        position = bisect_left(ids, key)
+        if position < len(ids) and ids[position] == key:
+            return self.codes[position]
+        return None
+
+    def get(self, key):
+        """Последний статус домашки или None."""
+        code = self.code(key)
+        return None if code is None else STATUS_CODES.name(code)
+
+    def has_status(self, statuses):
+        """Есть ли домашка в одном из статусов."""
+        for status in statuses:
+            # Незнакомый статус не заводим: его нет ни в одном индексе.
+            code = STATUS_CODES.codes.get(status)
+            if code is None:
+                continue
+            if code in self.codes or code in (self.others or {}).values():
+                return True
+        return False
+
+    def status_counts(self):
+        """Сколько домашек в каждом статусе: Counter по именам статусов."""
+        codes = Counter(bytes(self.codes))
+        if self.others:
+            codes.update(list(self.others.values()))
+        return Counter({
+            STATUS_CODES.name(code): count for code, count in codes.items()
+        })
+
+    def changes(self, homeworks):
+        """Домашки из ответа API, чей статус изменился, за один проход.
+
+        API отдаёт домашки от новых к старым, а уведомлять удобнее
+        в хронологическом порядке, поэтому список переворачивается.
+        """
+        get = self.get
+        return [
+            homework for homework in reversed(homeworks)
+            if get(homework_key(homework)) != homework.get('status')
+        ]
+
+    def restore(self, key, status):
+        """Вернуть статус домашки, сохранённый до перезапуска."""
+        code = STATUS_CODES.code(status)
+        if not is_compact_key(key):
+            if self.others is None:
+                self.others = {}
+            self.others[key] = code
+            return
+        ids = self.ids
+        position = bisect_left(ids, key)
+        if position < len(ids) and ids[position] == key:
+            self.codes[position] = code
+            return
+        ids.insert(position, key)
+        self.codes.insert(position, code)
+
+    def commit(self, homework):
+        """Запомнить статус домашки после успешного уведомления."""
+        self.restore(homework_key(homework), homework.get('status'))
+
+    def forget(self, key):
+        """Забыть домашку: о её статусе снова нужно уведомить."""
+        if not is_compact_key(key):
+            if self.others is not None:
+                self.others.pop(key, None)
+            return
+        ids = self.ids
+        position = bisect_left(ids, key)
+        if position < len(ids) and ids[position] == key:
+            del ids[position]
+            del self.codes[position]
+
+    def revert(self, homework, previous):
+        """Вернуть статус previous, если уведомление о homework потеряно.
+
+        Если домашку уже запомнили с другим статусом, она не трогается.
+        """
+        key = homework_key(homework)
+        if self.get(key) != homework.get('status'):
+            return
+        if previous is None:
+            self.forget(key)
+        else:
+            self.restore(key, previous)
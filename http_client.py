@@ -0,0 +1,64 @@
+import logging
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 5))
+READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 30))
+TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 16))
+# Сколько разных хостов держать в пуле: API Практикума и запас.
+POOL_HOSTS = 4
+# Text messages:
+CLIENT_STATS_LOGS = (
+    'HTTP: запросов %(requests)d, соединений %(connections)d, '
+    'переиспользовано %(reused)d'
+)
+
+
+class HttpClient:
+    """Общая keep-alive сессия с пулом соединений и таймаутами."""
+
+    def __init__(self, pool_size=POOL_SIZE, timeout=TIMEOUT):
+        """Сессия с пулом на pool_size соединений."""
+        self.timeout = timeout
+        self.adapter = HTTPAdapter(
+            pool_connections=POOL_HOSTS,
+            pool_maxsize=pool_size,
+            pool_block=True,
+        )
+        self.session = requests.Session()
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+
+    def get(self, url, **kwargs):
+        """GET-запрос через пул с таймаутом по умолчанию."""
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.get(url, **kwargs)
+
+    def stats(self):
+        """Сколько запросов, TCP-соединений и переиспользований было."""
+        pools = self.adapter.poolmanager.pools
+        total_requests = total_connections = 0
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            total_requests += pool.num_requests
+            total_connections += pool.num_connections
+        return dict(
+            requests=total_requests,
+            connections=total_connections,
+            reused=total_requests - total_connections,
+        )
+
+    def log_stats(self):
+        """Счётчики переиспользования соединений в лог."""
+        if logging.root.isEnabledFor(logging.DEBUG):
+            logging.debug(CLIENT_STATS_LOGS, self.stats())
+
+    def close(self):
+        """Закрыть все соединения пула."""
+        self.session.close()
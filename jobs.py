@@ -0,0 +1,75 @@
+import logging
+from concurrent.futures import Executor, Future
+
+import commands
+
+
+# Как часто задача JobQueue ищет готовых подписчиков, c. Цикл Poller.run
+# просыпается точно к сроку, а JobQueue — только по расписанию: без
+# частого шага опрос отставал бы в среднем на полшага.
+TICK = 0.1
+# Text messages:
+JOBS_LOGS_START = 'Опрос в JobQueue: шаг %s c, потоков Dispatcher %d'
+
+
+class DispatcherExecutor(Executor):
+    """Потоки telegram.ext.Dispatcher как concurrent.futures.Executor.
+
+    Задачи идут через dispatcher.run_async в те же потоки, что отвечают
+    на команды, а Poller получает обычные Future: их можно отменить
+    и дождаться при остановке. Потоки принадлежат Updater, поэтому
+    shutdown() их не трогает.
+    """
+
+    def __init__(self, dispatcher):
+        """Задачи пойдут в потоки dispatcher."""
+        self.dispatcher = dispatcher
+
+    def submit(self, fn, /, *args, **kwargs):
+        """Поставить fn(*args, **kwargs) в очередь Dispatcher."""
+        future = Future()
+
+        def run():
+            # Отменённую до старта задачу пропускаем.
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as error:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+        self.dispatcher.run_async(run)
+        return future
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        """Потоки остановит Updater.stop()."""
+
+
+def schedule(updater, engine, executor, interval=TICK):
+    """Опрашивать подписчиков задачей JobQueue раз в interval секунд.
+
+    Задача только отдаёт готовых подписчиков в executor
+    (Poller.tick), поэтому опрос, команды и уведомления делят потоки
+    Dispatcher и пул соединений бота. Возвращает задачу JobQueue.
+    """
+    engine.start()
+    logging.debug(JOBS_LOGS_START, interval, updater.dispatcher.workers)
+    return updater.job_queue.run_repeating(
+        lambda context: engine.tick(executor), interval=interval, first=0,
+    )
+
+
+def run(updater, engine, interval=TICK):
+    """Опрос задачами JobQueue и команды до engine.lifecycle.stop()."""
+    executor = DispatcherExecutor(updater.dispatcher)
+    job = schedule(updater, engine, executor, interval)
+    commands.start(updater)
+    try:
+        engine.lifecycle.stopping.wait()
+    finally:
+        # Сначала убрать задачу: остановленный APScheduler не примет шаг.
+        job.schedule_removal()
+        updater.job_queue.stop()
+        engine.shutdown(executor)
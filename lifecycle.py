@@ -0,0 +1,135 @@
+import logging
+import os
+import signal
+import threading
+from contextlib import contextmanager
+
+from clock import CLOCK
+
+
+# Сколько секунд после SIGTERM досылать сообщения и сохранять состояние.
+# Heroku ждёт 30 секунд, потом присылает SIGKILL.
+SHUTDOWN_TIMEOUT = float(os.getenv('SHUTDOWN_TIMEOUT', 20))
+STOP_SIGNALS = (signal.SIGTERM, signal.SIGINT)
+# На Windows нет SIGHUP: перечитать конфиг можно только перезапуском.
+RELOAD_SIGNAL = getattr(signal, 'SIGHUP', None)
+# Text messages:
+RELOAD_LOGS = 'Перечитываем конфигурацию'
+RELOAD_ERROR_LOGS = 'Конфигурация не перечитана: %s'
+SIGNAL_EXIT_LOGS = 'Получен сигнал %s, выходим'
+
+
+class Lifecycle:
+    """Пробуждение и остановка главного цикла.
+
+    Цикл ждёт в wait(), а не в time.sleep(): его будят сигналы
+    (stop, reload), новая работа (wake) и конец ожидания. После stop()
+    на завершение отводится shutdown_timeout секунд, остаток показывает
+    remaining(). reload — функция, которую цикл вызовет после SIGHUP.
+    Ждёт и считает срок clock (clock.Clock или clock.VirtualClock).
+    """
+
+    def __init__(self, reload=None, shutdown_timeout=SHUTDOWN_TIMEOUT,
+                 clock=CLOCK):
+        """Работаем; остановка даёт shutdown_timeout секунд."""
+        self.reload = reload
+        self.shutdown_timeout = shutdown_timeout
+        self.clock = clock
+        self.stopping = threading.Event()
+        self.woken = threading.Event()
+        self.reload_requested = threading.Event()
+        self.deadline = None
+
+    def install(self):
+        """Обрабатывать сигналы остановки и перечитывания конфига."""
+        for signum in STOP_SIGNALS:
+            signal.signal(signum, self.handle_stop)
+        if RELOAD_SIGNAL is not None and self.reload is not None:
+            signal.signal(RELOAD_SIGNAL, self.handle_reload)
+        return self
+
+    def handle_stop(self, signum, frame):
+        """Обработчик SIGTERM и SIGINT."""
+        self.stop()
+
+    def handle_reload(self, signum, frame):
+        """Обработчик SIGHUP."""
+        self.reload_requested.set()
+        self.woken.set()
+
+    def stop(self):
+        """Остановить цикл; отсчёт shutdown_timeout начинается сейчас."""
+        if self.deadline is None:
+            self.deadline = self.clock.monotonic() + self.shutdown_timeout
+        self.stopping.set()
+        self.woken.set()
+
+    def wake(self):
+        """Разбудить цикл раньше срока: появилась работа."""
+        self.woken.set()
+
+    def wait(self, timeout):
+        """Ждать timeout секунд или пробуждения; False — пора выходить."""
+        self.clock.wait(self.woken, timeout)
+        self.woken.clear()
+        return not self.stopping.is_set()
+
+    def maybe_reload(self):
+        """Перечитать конфиг, если об этом просили."""
+        if not self.reload_requested.is_set():
+            return
+        self.reload_requested.clear()
+        logging.info(RELOAD_LOGS)
+        try:
+            self.reload()
+        except Exception as error:
+            logging.exception(RELOAD_ERROR_LOGS, error)
+
+    def remaining(self):
+        """Сколько секунд ещё можно завершаться; None — без ограничения."""
+        if self.deadline is None:
+            return None
+        return max(0, self.deadline - self.clock.monotonic())
+
+
+class SignalExit:
+    """SIGTERM и SIGINT для однопоточного цикла: выход через SystemExit.
+
+    Сон прерывается сразу, а отправка внутри deferred() доделывается,
+    и выход случается на выходе из неё.
+    """
+
+    def __init__(self):
+        """Сигналов не было."""
+        self.requested = None
+        self.depth = 0
+
+    def install(self):
+        """Обрабатывать сигналы остановки."""
+        for signum in STOP_SIGNALS:
+            signal.signal(signum, self.handle)
+        return self
+
+    def handle(self, signum, frame):
+        """Обработчик сигнала."""
+        self.requested = signum
+        if not self.depth:
+            self.exit()
+
+    def exit(self):
+        """Выйти из программы по запрошенному сигналу."""
+        logging.warning(
+            SIGNAL_EXIT_LOGS, signal.Signals(self.requested).name
+        )
+        raise SystemExit(0)
+
+    @contextmanager
+    def deferred(self):
+        """Не прерывать тело блока; выйти после него, если просили."""
+        self.depth += 1
+        try:
+            yield
+        finally:
+            self.depth -= 1
+            if not self.depth and self.requested is not None:
+                self.exit()
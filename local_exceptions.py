@@ -1,10 +1,31 @@
 class Not200Error(Exception):
     """Не 200."""
 
-    ...
+    def __init__(self, message, status_code=None):
+        """Ошибка с кодом ответа status_code."""
+        super().__init__(message)
+        self.status_code = status_code
 
 
 class APIErrorKeyError(Exception):
     """В ответе от API код ошибки."""
 
     ...
+
+
+class CircuitOpenError(Exception):
+    """Сервис недоступен: размыкатель разомкнут, запрос не отправлялся."""
+
+    def __init__(self, message, retry_in=0):
+        """Ошибка; размыкатель пропустит запрос через retry_in c."""
+        super().__init__(message)
+        self.retry_in = retry_in
+
+
+class HomeworkDefectsError(Exception):
+    """В ответе API есть домашки, которые не получилось разобрать."""
+
+    def __init__(self, message, defects=()):
+        """Ошибка со списком проблемных домашек defects."""
+        super().__init__(message)
+        self.defects = list(defects)
@@ -0,0 +1,155 @@
+import json
+import logging
+import os
+import re
+import string
+import threading
+from functools import lru_cache
+
+
+DEFAULT_LOCALE = 'ru'
+LOCALES_DIR = os.getenv(
+    'LOCALES_DIR', os.path.join(os.path.dirname(__file__), 'locales')
+)
+# Сколько готовых текстов уведомлений помнить: (домашка, статус, язык).
+RENDER_CACHE_SIZE = int(os.getenv('RENDER_CACHE_SIZE', 4096))
+# Язык — имя файла в LOCALES_DIR: только буквы, цифры, - и _.
+LOCALE_NAME = re.compile(r'^[\w-]+$')
+FORMATTER = string.Formatter()
+# Text messages:
+LOCALE_LOADED_LOGS = 'Загружены шаблоны языка %s из %s'
+LOCALE_MISSING_LOGS = 'Нет шаблонов языка %s (%s), пишем на %s'
+
+
+def escape(text):
+    """Текст как литерал шаблона str.format."""
+    return text.replace('{', '{{').replace('}', '}}')
+
+
+def compile_template(template, **constants):
+    """Шаблон str.format как функция render(**fields) -> str.
+
+    Поля из constants подставляются сразу. Если осталось одно поле без
+    формата и преобразования (обычно {homework_name}), render только
+    склеивает три строки; иначе вызывает format у упрощённого шаблона.
+    """
+    # Литералы — строки, оставшиеся поля — (имя, формат, преобразование).
+    parts = []
+    for literal, field, spec, conversion in FORMATTER.parse(template):
+        parts.append(literal)
+        if field is None:
+            continue
+        if field in constants and not spec and not conversion:
+            parts.append(str(constants[field]))
+        else:
+            parts.append((field, spec, conversion))
+    fields = [part for part in parts if isinstance(part, tuple)]
+    if not fields:
+        text = ''.join(parts)
+        return lambda **values: text
+    name, spec, conversion = fields[0]
+    single = len(fields) == 1 and name.isidentifier()
+    if single and not spec and not conversion:
+        position = parts.index(fields[0])
+        prefix = ''.join(parts[:position])
+        suffix = ''.join(parts[position + 1:])
+        return lambda **values: prefix + str(values[name]) + suffix
+    return ''.join(
+        escape(part) if isinstance(part, str)
+        else '{' + part[0] + ('!' + part[2] if part[2] else '')
+        + (':' + part[1] if part[1] else '') + '}'
+        for part in parts
+    ).format
+
+
+class Catalog:
+    """Шаблоны одного языка, скомпилированные по статусам."""
+
+    def __init__(self, status_message, verdicts):
+        """Скомпилировать status_message для каждого вердикта."""
+        self.status_message = status_message
+        self.verdicts = dict(verdicts)
+        self.renderers = {
+            status: compile_template(status_message, verdict=verdict)
+            for status, verdict in self.verdicts.items()
+        }
+
+    def render(self, homework_name, status):
+        """Текст уведомления о статусе status домашки homework_name."""
+        return self.renderers[status](homework_name=homework_name)
+
+
+def load_catalog(path, default):
+    """Шаблоны языка из JSON-файла; чего нет в файле — из default.
+
+    Файл — {"status_message": "...", "verdicts": {"approved": "...", ...}}.
+    """
+    with open(path, encoding='utf-8') as file:
+        data = json.load(file)
+    return Catalog(
+        data.get('status_message', default.status_message),
+        {**default.verdicts, **data.get('verdicts', {})},
+    )
+
+
+class Messages:
+    """Тексты уведомлений на языке подписчика.
+
+    Шаблоны языка загружаются из directory/<locale>.json один раз, при
+    первом уведомлении на нём; шаблоны языка по умолчанию передаются
+    сюда как есть (homework.STATUS_MESSAGE и HOMEWORK_VERDICTS). Готовые
+    тексты кэшируются по (название, статус, язык) в LRU на cache_size.
+    """
+
+    def __init__(self, status_message, verdicts, directory=LOCALES_DIR,
+                 default_locale=DEFAULT_LOCALE,
+                 cache_size=RENDER_CACHE_SIZE):
+        """Каталог по умолчанию из status_message и verdicts."""
+        self.directory = directory
+        self.default_locale = default_locale
+        self.default = Catalog(status_message, verdicts)
+        self.catalogs = {default_locale: self.default}
+        self.lock = threading.Lock()
+        self.render = lru_cache(maxsize=cache_size)(self._render)
+
+    def catalog(self, locale):
+        """Шаблоны языка locale; неизвестный язык — язык по умолчанию."""
+        catalog = self.catalogs.get(locale)
+        if catalog is not None:
+            return catalog
+        with self.lock:
+            catalog = self.catalogs.get(locale)
+            if catalog is None:
+                catalog = self.catalogs[locale] = self._load(locale)
+            return catalog
+
+    def _load(self, locale):
+        path = os.path.join(self.directory, f'{locale}.json')
+        if not LOCALE_NAME.match(str(locale)):
+            logging.warning(
+                LOCALE_MISSING_LOGS, locale, path, self.default_locale
+            )
+            return self.default
+        try:
+            catalog = load_catalog(path, self.default)
+        except (OSError, ValueError) as error:
+            logging.warning(
+                LOCALE_MISSING_LOGS, locale, error, self.default_locale
+            )
+            return self.default
+        logging.info(LOCALE_LOADED_LOGS, locale, path)
+        return catalog
+
+    def _render(self, homework_name, status, locale):
+        catalog = self.catalog(locale)
+        if status not in catalog.renderers:
+            catalog = self.default
+        return catalog.render(homework_name, status)
+
+    def status(self, homework, locale=None):
+        """Текст уведомления о проверенной домашке на языке locale."""
+        return self.render(
+            str(homework.get('homework_name')),
+            homework.get('status'),
+            self.default_locale if locale is None else locale,
+        )
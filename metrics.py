@@ -0,0 +1,351 @@
+import bisect
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+METRICS_PATH = '/metrics'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30,
+)
+# Ответ на команду собирается из памяти: ждём доли миллисекунды.
+COMMAND_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1)
+# Text messages:
+METRICS_LOGS_START = 'Метрики на http://%s:%d%s'
+METRICS_REQUEST_LOGS = 'Запрос метрик: %s'
+
+
+def escape(value):
+    """Значение метки в формате Prometheus."""
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace('"', '\\"')
+        .replace('\n', '\\n')
+    )
+
+
+def format_labels(names, values, extra=''):
+    """Метки в фигурных скобках или пустая строка."""
+    pairs = [
+        f'{name}="{escape(value)}"' for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def format_value(value):
+    """Число в формате Prometheus."""
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    """Набор метрик, который отдаётся одним текстом."""
+
+    def __init__(self):
+        """Пустой набор."""
+        self.lock = threading.Lock()
+        self.metrics = []
+
+    def register(self, metric):
+        """Добавить метрику."""
+        with self.lock:
+            self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus."""
+        with self.lock:
+            metrics = self.metrics[:]
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class Metric:
+    """Метрика с метками: у каждого набора значений меток свой child."""
+
+    type = 'untyped'
+
+    def __init__(self, name, help, labelnames=(), registry=REGISTRY):
+        """Метрика name с метками labelnames в registry."""
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.children = {}
+        if registry is not None:
+            registry.register(self)
+
+    def labels(self, *values):
+        """Child для значений меток в порядке labelnames."""
+        child = self.children.get(values)
+        if child is None:
+            with self.lock:
+                child = self.children.setdefault(values, self.new_child())
+        return child
+
+    def new_child(self):
+        """Новый child."""
+        raise NotImplementedError
+
+    def items(self):
+        """Пары (значения меток, child)."""
+        with self.lock:
+            return list(self.children.items())
+
+
+class Value:
+    """Одно число, которое можно менять из разных потоков."""
+
+    __slots__ = ('lock', 'value', 'function')
+
+    def __init__(self):
+        """Ноль."""
+        self.lock = threading.Lock()
+        self.value = 0
+        self.function = None
+
+    def inc(self, amount=1):
+        """Увеличить."""
+        with self.lock:
+            self.value += amount
+
+    def set(self, value):
+        """Установить."""
+        self.value = value
+
+    def set_function(self, function):
+        """Брать значение из function() в момент сбора метрик."""
+        self.function = function
+
+    def get(self):
+        """Текущее значение."""
+        if self.function is not None:
+            value = self.function()
+            return math.nan if value is None else value
+        return self.value
+
+
+class Counter(Metric):
+    """Счётчик, который только растёт."""
+
+    type = 'counter'
+
+    def new_child(self):
+        """Новое значение."""
+        return Value()
+
+    def inc(self, amount=1):
+        """Увеличить счётчик без меток."""
+        self.labels().inc(amount)
+
+    def samples(self):
+        """Строки со значениями."""
+        return [
+            f'{self.name}{format_labels(self.labelnames, values)} '
+            f'{format_value(child.get())}'
+            for values, child in self.items()
+        ]
+
+
+class Gauge(Counter):
+    """Значение, которое может и расти, и падать."""
+
+    type = 'gauge'
+
+    def set(self, value):
+        """Установить значение без меток."""
+        self.labels().set(value)
+
+    def set_function(self, function):
+        """Значение без меток из function() в момент сбора."""
+        self.labels().set_function(function)
+
+
+class HistogramValue:
+    """Распределение наблюдений по корзинам."""
+
+    __slots__ = ('lock', 'bounds', 'counts', 'sum')
+
+    def __init__(self, bounds):
+        """Пустые корзины с верхними границами bounds."""
+        self.lock = threading.Lock()
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        """Учесть наблюдение."""
+        index = bisect.bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def snapshot(self):
+        """Накопленные по корзинам количества и сумма."""
+        with self.lock:
+            counts, total = self.counts[:], self.sum
+        cumulative = []
+        running = 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return cumulative, total
+
+
+class Histogram(Metric):
+    """Гистограмма с фиксированными корзинами."""
+
+    type = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS,
+                 registry=REGISTRY):
+        """Гистограмма с корзинами buckets."""
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames, registry)
+
+    def new_child(self):
+        """Новый набор корзин."""
+        return HistogramValue(self.bounds)
+
+    def samples(self):
+        """Строки _bucket, _sum и _count."""
+        lines = []
+        for values, child in self.items():
+            cumulative, total = child.snapshot()
+            for bound, count in zip(self.bounds + (math.inf,), cumulative):
+                labels = format_labels(
+                    self.labelnames, values, f'le="{format_value(bound)}"'
+                )
+                lines.append(f'{self.name}_bucket{labels} {count}')
+            labels = format_labels(self.labelnames, values)
+            lines.append(f'{self.name}_sum{labels} {format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative[-1]}')
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    'homework_stage_seconds',
+    'Длительность стадии обработки подписчика, c',
+    ('stage', 'tenant'),
+)
+STAGE_FAILURES = Counter(
+    'homework_stage_failures_total',
+    'Сколько раз стадия закончилась исключением',
+    ('stage', 'tenant'),
+)
+TENANTS = Gauge('homework_tenants', 'Сколько подписчиков опрашивается')
+API_CALLS_PER_DAY = Gauge(
+    'homework_api_calls_per_day',
+    'Запросов к API в сутки с момента запуска',
+)
+NOTIFICATION_LATENCY = Gauge(
+    'homework_notification_latency_seconds',
+    'Средняя задержка от изменения статуса до уведомления, c',
+)
+OUTBOX_PENDING = Gauge(
+    'homework_outbox_pending',
+    'Сколько сообщений ждёт отправки в Telegram',
+)
+HTTP_CONNECTIONS = Gauge(
+    'homework_http_connections',
+    'Запросы и TCP-соединения HTTP-клиента',
+    ('kind',),
+)
+API_CACHE = Counter(
+    'homework_api_cache_total',
+    'Ответы API: из кэша, запросом и ожиданием чужого запроса',
+    ('result',),
+)
+SCHEDULER_LAG = Gauge(
+    'homework_scheduler_lag_seconds',
+    'На сколько позже срока начался последний опрос, c',
+)
+COMMAND_SECONDS = Histogram(
+    'homework_command_seconds',
+    'Сколько готовится ответ на команду чата, c',
+    ('command',),
+    buckets=COMMAND_BUCKETS,
+)
+CIRCUIT_OPEN = Gauge(
+    'homework_circuit_open',
+    '1, если размыкатель сервиса разомкнут',
+    ('upstream',),
+)
+
+
+@contextmanager
+def stage(name, tenant):
+    """Замерить стадию name для подписчика tenant.
+
+    Исключению, вылетевшему из стадии, проставляется атрибут stage,
+    если его ещё нет: по нему error_digest группирует ошибки.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException as error:
+        STAGE_FAILURES.labels(name, tenant).inc()
+        if getattr(error, 'stage', None) is None:
+            error.stage = name
+        raise
+    finally:
+        STAGE_SECONDS.labels(name, tenant).observe(
+            time.perf_counter() - started
+        )
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Отдаёт registry по GET /metrics."""
+
+    registry = REGISTRY
+
+    def do_GET(self):
+        """Текст метрик или 404."""
+        if self.path.split('?')[0] != METRICS_PATH:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        body = self.registry.render().encode('utf-8')
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Запросы метрик — в общий лог на уровне DEBUG."""
+        logging.debug(METRICS_REQUEST_LOGS, format % args)
+
+
+def serve(port=METRICS_PORT, host=METRICS_HOST, registry=REGISTRY):
+    """Запустить HTTP-сервер метрик в фоновом потоке."""
+    handler = type(
+        'RegistryHandler', (MetricsHandler,), {'registry': registry}
+    )
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name='metrics', daemon=True
+    ).start()
+    logging.info(
+        METRICS_LOGS_START, host, server.server_port, METRICS_PATH
+    )
+    return server
@@ -0,0 +1,276 @@
+import heapq
+import itertools
+import logging
+import os
+import queue
+import threading
+import time
+
+from telegram.error import RetryAfter, TelegramError
+
+import metrics
+import retry
+
+
+OUTBOX_SIZE = int(os.getenv('OUTBOX_SIZE', 1000))
+# Лимиты Bot API: ~30 сообщений в секунду всего и 1 в секунду на чат.
+GLOBAL_RATE = 30
+CHAT_RATE = 1
+MAX_ATTEMPTS = 5
+RETRY_DELAY = 1
+RETRY_CAP = 60
+PUT_TIMEOUT = 1
+# Сколько секунд досылать очередь при остановке.
+STOP_TIMEOUT = 10
+# Как часто отправитель проверяет, не пора ли остановиться.
+IDLE_TIMEOUT = 0.5
+# Text messages:
+OUTBOX_FULL_LOGS = 'Очередь отправки полна, сообщение в %s ждёт'
+OUTBOX_SENT_LOGS = 'Сообщение в %s отправлено. %s'
+OUTBOX_RETRY_AFTER_LOGS = 'Flood control в %s: повтор через %s c'
+OUTBOX_RETRY_LOGS = 'Ошибка %s отправки в %s, попытка %d'
+OUTBOX_DROPPED_LOGS = 'Ошибка %s, сообщение в %s не отправлено:\n%s'
+OUTBOX_STOP_LOGS = 'Отправитель остановлен, не отправлено сообщений: %d'
+OUTBOX_DONE_ERROR_LOGS = 'Ошибка подтверждения отправки в %s: %s'
+
+
+class TokenBucket:
+    """Ведро токенов: rate токенов в секунду, не больше capacity подряд."""
+
+    def __init__(self, rate, capacity=None):
+        """Полное ведро."""
+        self.rate = rate
+        self.capacity = max(1, capacity or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(
+            self.capacity,
+            self.tokens + (now - self.updated) * self.rate,
+        )
+        self.updated = now
+
+    def delay(self, now):
+        """Через сколько секунд появится токен; 0 — уже есть."""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        """Забрать токен."""
+        self._refill(now)
+        self.tokens -= 1
+
+
+class Envelope:
+    """Сообщение в очереди отправки.
+
+    done(delivered) вызывается один раз: True — Telegram принял
+    сообщение, False — outbox от него отказался.
+    """
+
+    __slots__ = ('chat_id', 'text', 'tenant', 'attempt', 'done')
+
+    def __init__(self, chat_id, text, tenant=None, done=None):
+        """Сообщение text в chat_id, ещё без попыток."""
+        self.chat_id = chat_id
+        self.text = text
+        self.tenant = chat_id if tenant is None else tenant
+        self.attempt = 0
+        self.done = done
+
+    def settle(self, delivered):
+        """Сообщить исход отправки тому, кто поставил сообщение."""
+        if self.done is None:
+            return
+        try:
+            self.done(delivered)
+        except Exception as error:
+            # Поток-отправитель не должен падать из-за чужого кода.
+            logging.exception(OUTBOX_DONE_ERROR_LOGS, self.chat_id, error)
+
+
+class Outbox:
+    """Очередь сообщений в Telegram с отдельным потоком-отправителем.
+
+    Опрос API только кладёт сообщения в ограниченную очередь, а поток
+    отправляет их с учётом общего лимита и лимита на каждый чат. При
+    RetryAfter и сетевых ошибках сообщение откладывается, а не теряется;
+    пока размыкатель Telegram разомкнут, отправка на паузе. Исход
+    каждого сообщения put() сообщает через done (Envelope.settle).
+    """
+
+    def __init__(self, bot, maxsize=OUTBOX_SIZE, global_rate=GLOBAL_RATE,
+                 chat_rate=CHAT_RATE, retry_policy=None, breaker=None):
+        """Очередь до maxsize сообщений; поток запускает start()."""
+        self.bot = bot
+        self.retry_policy = (
+            retry.RetryPolicy(base=RETRY_DELAY, cap=RETRY_CAP)
+            if retry_policy is None else retry_policy
+        )
+        self.breaker = (
+            retry.CircuitBreaker('Telegram') if breaker is None else breaker
+        )
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.global_bucket = TokenBucket(global_rate)
+        self.chat_rate = chat_rate
+        self.chat_buckets = {}
+        self.delayed = []
+        self.sequence = itertools.count()
+        self.stopping = threading.Event()
+        self.deadline = None
+        self.thread = threading.Thread(
+            target=self._run, name='outbox', daemon=True
+        )
+        self.sent = self.retried = self.dropped = 0
+
+    def start(self):
+        """Запустить поток-отправитель."""
+        self.thread.start()
+        return self
+
+    def put(self, chat_id, text, timeout=PUT_TIMEOUT, tenant=None,
+            done=None):
+        """Поставить сообщение в очередь; False, если очередь полна.
+
+        tenant — имя подписчика для метрик, по умолчанию chat_id.
+        done(delivered) вызовется из потока-отправителя, только если
+        сообщение принято в очередь.
+        """
+        if self.stopping.is_set():
+            return False
+        try:
+            self.queue.put(
+                Envelope(chat_id, text, tenant, done), timeout=timeout
+            )
+        except queue.Full:
+            logging.warning(OUTBOX_FULL_LOGS, chat_id)
+            return False
+        return True
+
+    def pending(self):
+        """Сколько сообщений ждёт отправки."""
+        return self.queue.qsize() + len(self.delayed)
+
+    def stop(self, timeout=None):
+        """Дослать очередь не дольше timeout секунд и остановиться."""
+        if timeout is not None:
+            self.deadline = time.monotonic() + timeout
+        self.stopping.set()
+        if self.thread.is_alive():
+            self.thread.join(timeout)
+
+    def _schedule(self, envelope, ready_at):
+        heapq.heappush(
+            self.delayed, (ready_at, next(self.sequence), envelope)
+        )
+
+    def _next(self):
+        while True:
+            now = time.monotonic()
+            if self.deadline is not None and now >= self.deadline:
+                return None
+            if self.delayed and self.delayed[0][0] <= now:
+                return heapq.heappop(self.delayed)[2]
+            if (self.stopping.is_set()
+               and not self.delayed and self.queue.empty()):
+                return None
+            timeout = IDLE_TIMEOUT
+            if self.delayed:
+                timeout = min(timeout, self.delayed[0][0] - now)
+            try:
+                return self.queue.get(timeout=timeout)
+            except queue.Empty:
+                continue
+
+    def _run(self):
+        while True:
+            envelope = self._next()
+            if envelope is None:
+                break
+            self._deliver(envelope)
+        left = self._abandon()
+        if left:
+            self.dropped += left
+            logging.error(OUTBOX_STOP_LOGS, left)
+
+    def _abandon(self):
+        """Отказаться от неотправленных к сроку сообщений; сколько их."""
+        envelopes = [envelope for _, _, envelope in self.delayed]
+        self.delayed = []
+        while True:
+            try:
+                envelopes.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        for envelope in envelopes:
+            # Статус домашки не сохранится: после перезапуска уведомим.
+            envelope.settle(False)
+        return len(envelopes)
+
+    def _acquire(self, envelope):
+        """Дождаться лимитов; None, если сообщение пришлось отложить."""
+        now = time.monotonic()
+        chat_bucket = self.chat_buckets.get(envelope.chat_id)
+        if chat_bucket is None:
+            chat_bucket = self.chat_buckets[envelope.chat_id] = (
+                TokenBucket(self.chat_rate)
+            )
+        wait = chat_bucket.delay(now)
+        if wait:
+            self._schedule(envelope, now + wait)
+            return None
+        if not self.breaker.allow():
+            self._schedule(envelope, now + self.breaker.retry_in())
+            return None
+        wait = self.global_bucket.delay(now)
+        if wait:
+            time.sleep(wait)
+            now = time.monotonic()
+        self.global_bucket.take(now)
+        chat_bucket.take(now)
+        return now
+
+    def _deliver(self, envelope):
+        now = self._acquire(envelope)
+        if now is None:
+            return
+        try:
+            with metrics.stage('send_message', envelope.tenant):
+                self.bot.send_message(
+                    chat_id=envelope.chat_id,
+                    text=envelope.text)
+        except RetryAfter as error:
+            logging.warning(
+                OUTBOX_RETRY_AFTER_LOGS, envelope.chat_id, error.retry_after
+            )
+            self.retried += 1
+            self._schedule(envelope, now + error.retry_after)
+        except TelegramError as error:
+            self.breaker.record(error)
+            envelope.attempt += 1
+            if (retry.classify(error) != retry.TRANSIENT
+               or envelope.attempt >= MAX_ATTEMPTS):
+                self._drop(envelope, error)
+                return
+            logging.warning(
+                OUTBOX_RETRY_LOGS, error, envelope.chat_id, envelope.attempt
+            )
+            self.retried += 1
+            self._schedule(envelope, now + self.retry_policy.delay(
+                envelope.attempt - 1, error)
+            )
+        else:
+            self.breaker.record()
+            self.sent += 1
+            logging.debug(OUTBOX_SENT_LOGS, envelope.chat_id, envelope.text)
+            envelope.settle(True)
+
+    def _drop(self, envelope, error):
+        self.dropped += 1
+        logging.error(
+            OUTBOX_DROPPED_LOGS, error, envelope.chat_id, envelope.text
+        )
+        envelope.settle(False)
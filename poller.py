@@ -0,0 +1,460 @@
+import functools
+import logging
+import math
+import threading
+from concurrent.futures import wait
+
+import cursor
+import homework
+import local_exceptions
+import metrics
+import retry
+import scheduler
+from clock import CLOCK
+from error_digest import ErrorDigest
+from homework_index import homework_key
+from lifecycle import Lifecycle
+
+
+MAX_WORKERS = 16
+# Не спать дольше, чтобы вовремя сбрасывать состояние в store.
+MAX_TICK = 1
+# Отставание от расписания, после которого не хватает потоков, c.
+LAG_WARNING = 30
+# Text messages:
+POLLER_LOGS_START = 'Опрашиваем подписчиков: %d, потоков: %d'
+POLLER_CYCLE_LOGS = 'Цикл опроса занял %.3f c'
+POLLER_METRICS_LOGS = (
+    'Запросов к API: %(api_calls)d (%(api_calls_per_day).0f в сутки), '
+    'уведомлений: %(notifications)d, '
+    'средняя задержка: %(avg_notification_latency)s'
+)
+TENANT_LOGS_START = 'Опрос подписчика %s'
+TENANT_NO_UPDATES = 'Статус домашки подписчика %s не менялся'
+TENANT_PAUSED_LOGS = 'Опрос подписчика %s на паузе'
+TENANT_ERROR_LOGS = 'Подписчик %s: %s'
+TENANTS_UPDATED_LOGS = 'Подписчики: добавлено %d, удалено %d'
+POLLER_LAG_LOGS = (
+    'Опрос отстаёт от расписания на %.1f c: добавьте потоков (--workers)'
+)
+POLLER_STOPPING_LOGS = 'Останавливаемся, на завершение %.1f c'
+POLLER_STOP_LOGS = 'Не дождались опросов: %d, отменено: %d'
+
+
+class Poller:
+    """Конкурентный опрос API для всех подписчиков.
+
+    Если передан outbox (outbox.Outbox), сообщения только ставятся в его
+    очередь, и медленный Telegram не задерживает опрос; статус домашки
+    сохраняется, только когда outbox подтвердит отправку. Когда опрашивать
+    каждого подписчика, решает schedule (по умолчанию раз в RETRY_PERIOD).
+    Если передан store (storage.StateStore), состояние переживает
+    перезапуск. Запросы к API идут через общий для всех подписчиков
+    размыкатель breaker (retry.CircuitBreaker). Останавливает и будит
+    главный цикл lifecycle (lifecycle.Lifecycle). Об ошибках подписчик
+    узнаёт не чаще раза в окно errors (error_digest.ErrorDigest).
+    Подписчики с одним токеном делят ответы API через cache
+    (response_cache.ResponseCache). Время и пул опросов даёт clock
+    (clock.Clock); с clock.VirtualClock сутки опроса проходят за
+    секунды. Компоненты по умолчанию создаются с тем же clock.
+    """
+
+    def __init__(self, bot, tenants, max_workers=MAX_WORKERS,
+                 client=None, outbox=None, schedule=None, store=None,
+                 breaker=None, lifecycle=None, errors=None, cache=None,
+                 clock=CLOCK):
+        """Опрос tenants; недостающие компоненты — по умолчанию."""
+        self.bot = bot
+        self.clock = clock
+        self.tenants = tenants
+        self.client = client
+        self.cache = cache
+        self.outbox = outbox
+        self.store = store
+        self.breaker = (
+            retry.CircuitBreaker('API Практикума', clock=clock)
+            if breaker is None else breaker
+        )
+        self.schedule = (
+            scheduler.FixedScheduler(clock=clock)
+            if schedule is None else schedule
+        )
+        self.max_workers = max(1, min(max_workers, len(tenants) or 1))
+        self.lifecycle = (
+            Lifecycle(clock=clock) if lifecycle is None else lifecycle
+        )
+        self.errors = (
+            ErrorDigest(template=homework.MAIN_ERROR_MESSAGE, clock=clock)
+            if errors is None else errors
+        )
+        self.futures = set()
+        self.futures_lock = threading.Lock()
+        self.queue = scheduler.PollQueue()
+        self.by_name = {tenant.name: tenant for tenant in tenants}
+        for tenant in tenants:
+            self.queue.push(tenant)
+        # На сколько позже срока начался последний опрос, c.
+        self.lag = 0
+
+    def deliver(self, tenant, message, done=None):
+        """Отправить сообщение подписчику или поставить в очередь.
+
+        done(delivered) outbox вызовет, когда Telegram примет сообщение
+        или outbox от него откажется.
+        """
+        if self.outbox is not None:
+            with metrics.stage('enqueue', tenant.name):
+                return self.outbox.put(
+                    tenant.chat_id, message, tenant=tenant.name, done=done
+                )
+        with metrics.stage('send_message', tenant.name):
+            return homework.send_chat_message(
+                self.bot, tenant.chat_id, message
+            )
+
+    def get_api_answer(self, tenant):
+        """Ответ API для подписчика: из кэша или запросом."""
+        if self.cache is None:
+            return self.fetch(tenant, tenant.practicum_token, tenant.timestamp)
+        return self.cache.get(
+            tenant.practicum_token, tenant.timestamp,
+            lambda token, from_date: self.fetch(tenant, token, from_date),
+        )
+
+    def fetch(self, tenant, token, from_date):
+        """Запрос к API за подписчика через размыкатель."""
+        self.breaker.check()
+        try:
+            with metrics.stage('get_api_answer', tenant.name):
+                response = homework.get_tenant_api_answer(
+                    token, from_date, self.client
+                )
+        except Exception as error:
+            self.breaker.record(error)
+            raise
+        self.breaker.record()
+        return response
+
+    def poll_tenant(self, tenant, due_at=None):
+        """Один цикл опроса API для одного подписчика.
+
+        due_at — когда по расписанию было пора опрашивать, по
+        clock.monotonic(); из него считается отставание lag.
+        """
+        if tenant.paused:
+            return self.skip(tenant)
+        logging.debug(TENANT_LOGS_START, tenant)
+        if due_at is not None:
+            self.lag = max(0, self.clock.monotonic() - due_at)
+        changes = []
+        failure = None
+        self.retry_dropped(tenant)
+        try:
+            response = self.get_api_answer(tenant)
+            tenant.polled_at = self.clock.time()
+            with metrics.stage('check_response', tenant.name):
+                homeworks, defects = homework.validate_response(response)
+            changes = tenant.homeworks.changes(homeworks)
+            if not changes:
+                logging.debug(TENANT_NO_UPDATES, tenant)
+            undelivered = [
+                work for work in changes
+                if not self.notify_change(tenant, work)
+            ]
+            # Курсор не уходит дальше домашек, чьи уведомления ещё
+            # не подтвердил outbox: иначе потерянное не вернётся.
+            tenant.timestamp = cursor.advance(
+                tenant.timestamp, response,
+                undelivered + tenant.deliveries.unconfirmed(),
+            )
+            self.save(tenant)
+            self.report_defects(tenant, defects)
+        except local_exceptions.CircuitOpenError as error:
+            # Саму ошибку API уже получили те, чьи запросы упали.
+            failure = error
+            logging.debug(TENANT_ERROR_LOGS, tenant, error)
+        except Exception as error:
+            failure = error
+            self.report_error(tenant, error)
+        finally:
+            self.notify(tenant, self.errors.check(tenant.name))
+            tenant.next_poll_at = self.clock.monotonic() + (
+                self.schedule.next_interval(tenant, changes, failure)
+            )
+            self.reschedule(tenant)
+
+    def notify_change(self, tenant, work):
+        """Уведомить о новом статусе домашки; False — не удалось.
+
+        Без outbox статус запоминается и сохраняется после отправки.
+        С outbox — запоминается сразу, чтобы не уведомить дважды,
+        а сохраняется, когда outbox подтвердит отправку (acknowledge).
+        """
+        # Домашки уже проверены validate_response: только текст.
+        with metrics.stage('parse_status', tenant.name):
+            message = homework.MESSAGES.status(work, tenant.locale)
+        if self.outbox is None:
+            if not self.deliver(tenant, message):
+                return False
+            tenant.homeworks.commit(work)
+            self.confirm(tenant, work, message)
+            return True
+        previous = tenant.homeworks.get(homework_key(work))
+        ticket = tenant.deliveries.track(work, previous, message)
+        tenant.homeworks.commit(work)
+        done = functools.partial(self.acknowledge, tenant, ticket)
+        if self.deliver(tenant, message, done=done):
+            return True
+        tenant.deliveries.cancel(ticket)
+        tenant.homeworks.revert(work, previous)
+        return False
+
+    def confirm(self, tenant, work, message, save=True):
+        """Уведомление отправлено: в историю, статус — в store."""
+        tenant.remember(message, self.clock.time())
+        if save and self.store is not None:
+            self.store.save_homework(tenant, work)
+
+    def acknowledge(self, tenant, ticket, delivered):
+        """Исход уведомления ticket из потока outbox.
+
+        Отправленное сохраняется; потерянное вернёт retry_dropped()
+        в следующем опросе подписчика.
+        """
+        pending = tenant.deliveries.settle(ticket, delivered)
+        if pending is not None:
+            self.confirm(
+                tenant, pending.homework, pending.message,
+                save=pending.latest,
+            )
+
+    def retry_dropped(self, tenant):
+        """Уведомления, которые outbox не отправил, — снова в изменения.
+
+        Индекс возвращается к прежнему статусу домашки, и этот опрос
+        уведомит о ней снова: курсор её не пропустил.
+        """
+        for pending in tenant.deliveries.take_dropped():
+            tenant.homeworks.revert(pending.homework, pending.previous)
+
+    def skip(self, tenant):
+        """Подписчик на паузе: не ходить в API, проверить через period."""
+        logging.debug(TENANT_PAUSED_LOGS, tenant)
+        tenant.next_poll_at = self.clock.monotonic() + self.schedule.period
+        self.reschedule(tenant)
+
+    def pause(self, tenant, paused=True):
+        """Приостановить или возобновить опрос подписчика.
+
+        Возобновлённого подписчика опрашиваем сразу, если его опрос
+        сейчас не идёт.
+        """
+        tenant.paused = paused
+        self.save(tenant)
+        if not paused and self.queue.move(tenant, self.clock.monotonic()):
+            self.lifecycle.wake()
+
+    def reschedule(self, tenant):
+        """Вернуть подписчика в очередь опроса, если его не удалили."""
+        if self.by_name.get(tenant.name) is tenant:
+            self.queue.push(tenant)
+            # Главный цикл пересчитает, сколько спать до ближайшего опроса.
+            self.lifecycle.wake()
+
+    def spread(self, tenants):
+        """Впервые опросить tenants каждого со своим сдвигом в периоде."""
+        now = self.clock.monotonic()
+        for tenant in tenants:
+            if tenant.next_poll_at == 0:
+                tenant.next_poll_at = now + self.schedule.first_interval(
+                    tenant, len(self.tenants)
+                )
+                self.reschedule(tenant)
+
+    def report_error(self, tenant, error):
+        """Ошибку опроса в лог, в чат подписчика — сразу или сводкой."""
+        logging.exception(TENANT_ERROR_LOGS, tenant, error)
+        self.notify(tenant, self.errors.record(tenant.name, error))
+
+    def report_defects(self, tenant, defects):
+        """Домашки с ошибками — в лог и в чат, как ошибку стадии проверки.
+
+        Остальные домашки ответа уже обработаны, поэтому опрос считается
+        удачным и не откладывается.
+        """
+        if not defects:
+            return
+        error = homework.defects_error(defects)
+        error.stage = 'check_response'
+        metrics.STAGE_FAILURES.labels(error.stage, tenant.name).inc()
+        logging.error(TENANT_ERROR_LOGS, tenant, error)
+        self.notify(tenant, self.errors.record(tenant.name, error))
+
+    def notify(self, tenant, message):
+        """Отправить подписчику сообщение об ошибках, если оно есть."""
+        if message is not None:
+            self.deliver(tenant, message)
+
+    def register_metrics(self):
+        """Отдавать состояние опроса в metrics в момент сбора."""
+        metrics.TENANTS.set_function(lambda: len(self.tenants))
+        metrics.API_CALLS_PER_DAY.set_function(
+            lambda: self.schedule.metrics.snapshot()['api_calls_per_day']
+        )
+        metrics.NOTIFICATION_LATENCY.set_function(
+            lambda: self.schedule.metrics.snapshot()[
+                'avg_notification_latency'
+            ]
+        )
+        metrics.SCHEDULER_LAG.set_function(lambda: self.lag)
+        metrics.CIRCUIT_OPEN.labels(self.breaker.name).set_function(
+            lambda: int(self.breaker.state != retry.CLOSED)
+        )
+        if self.outbox is not None:
+            metrics.OUTBOX_PENDING.set_function(self.outbox.pending)
+            metrics.CIRCUIT_OPEN.labels(
+                self.outbox.breaker.name
+            ).set_function(
+                lambda: int(self.outbox.breaker.state != retry.CLOSED)
+            )
+        if self.cache is not None:
+            for result in ('hits', 'misses', 'coalesced'):
+                metrics.API_CACHE.labels(result).set_function(
+                    lambda result=result: self.cache.stats()[result]
+                )
+        if self.client is not None:
+            for kind in ('requests', 'connections', 'reused'):
+                metrics.HTTP_CONNECTIONS.labels(kind).set_function(
+                    lambda kind=kind: self.client.stats()[kind]
+                )
+
+    def save(self, tenant):
+        """Отдать курсор и последнее сообщение подписчика в store."""
+        if self.store is not None:
+            self.store.save_tenant(tenant)
+
+    def poll_once(self, executor):
+        """Один цикл опроса всех подписчиков, не больше max_workers разом."""
+        started = self.clock.monotonic()
+        futures = [
+            executor.submit(self.poll_tenant, tenant)
+            for tenant in self.tenants
+        ]
+        for future in futures:
+            future.result()
+        logging.debug(POLLER_CYCLE_LOGS, self.clock.monotonic() - started)
+        if self.store is not None:
+            self.store.flush()
+        self.log_stats()
+
+    def log_stats(self):
+        """Счётчики опроса и HTTP-клиента в лог."""
+        if logging.root.isEnabledFor(logging.DEBUG):
+            logging.debug(
+                POLLER_METRICS_LOGS, self.schedule.metrics.snapshot()
+            )
+        if self.client is not None:
+            self.client.log_stats()
+        if self.cache is not None:
+            self.cache.log_stats()
+        if self.lag > LAG_WARNING:
+            logging.warning(POLLER_LAG_LOGS, self.lag)
+
+    def update_tenants(self, tenants):
+        """Заменить список подписчиков, сохранив состояние оставшихся."""
+        current = {tenant.name: tenant for tenant in self.tenants}
+        added = [
+            tenant for tenant in tenants if tenant.name not in current
+        ]
+        if added and self.store is not None:
+            self.store.load(added)
+        names = {tenant.name for tenant in tenants}
+        for tenant in tenants:
+            kept = current.get(tenant.name)
+            if kept is not None:
+                kept.practicum_token = tenant.practicum_token
+                kept.chat_id = tenant.chat_id
+                kept.locale = tenant.locale
+        self.tenants = [
+            current.get(tenant.name, tenant) for tenant in tenants
+        ]
+        self.by_name = {tenant.name: tenant for tenant in self.tenants}
+        for name in set(current) - names:
+            # Запись в очереди опроса устареет и будет пропущена.
+            current[name].next_poll_at = math.inf
+        self.spread(added)
+        logging.info(
+            TENANTS_UPDATED_LOGS, len(added), len(set(current) - names)
+        )
+
+    def submit(self, executor, tenant, due_at=None):
+        """Отдать опрос подписчика в пул и запомнить его future."""
+        future = executor.submit(self.poll_tenant, tenant, due_at)
+        with self.futures_lock:
+            self.futures.add(future)
+        future.add_done_callback(self.forget)
+        return future
+
+    def forget(self, future):
+        """Опрос закончился: future больше не нужен."""
+        with self.futures_lock:
+            self.futures.discard(future)
+
+    def submit_due(self, executor):
+        """Отдать в пул подписчиков, которым пора; сколько отдано."""
+        due = self.queue.pop_due(self.clock.monotonic())
+        for tenant, due_at in due:
+            self.submit(executor, tenant, due_at)
+        return len(due)
+
+    def sleep_time(self):
+        """Сколько спать до ближайшего опроса, не дольше MAX_TICK."""
+        delay = self.queue.next_poll_at() - self.clock.monotonic()
+        return min(MAX_TICK, max(0, delay))
+
+    def drain(self, timeout=None):
+        """Отменить ждущие опросы и дождаться идущих не дольше timeout."""
+        with self.futures_lock:
+            futures = list(self.futures)
+        cancelled = sum(future.cancel() for future in futures)
+        _, not_done = wait(futures, timeout=timeout)
+        if not_done or cancelled:
+            logging.warning(POLLER_STOP_LOGS, len(not_done), cancelled)
+
+    def start(self):
+        """Подготовить опрос: впервые подписчики опрашиваются вразброс."""
+        logging.debug(POLLER_LOGS_START, len(self.tenants), self.max_workers)
+        self.spread(self.tenants)
+
+    def tick(self, executor):
+        """Один шаг цикла: SIGHUP, готовые подписчики, сброс store."""
+        self.lifecycle.maybe_reload()
+        if self.submit_due(executor):
+            self.log_stats()
+        if self.store is not None:
+            self.store.maybe_flush()
+
+    def shutdown(self, executor):
+        """Остановиться: ждущие опросы отменить, идущие доделать.
+
+        Идущие ждём в пределах lifecycle.remaining().
+        """
+        self.lifecycle.stop()
+        logging.info(POLLER_STOPPING_LOGS, self.lifecycle.remaining())
+        self.drain(self.lifecycle.remaining())
+        executor.shutdown(wait=False)
+
+    def run(self):
+        """Опрашивать подписчиков по расписанию до lifecycle.stop().
+
+        Цикл спит в lifecycle.wait() и просыпается по сигналу, после
+        каждого опроса и после SIGHUP.
+        """
+        self.start()
+        executor = self.clock.executor(self.max_workers)
+        try:
+            while not self.lifecycle.stopping.is_set():
+                self.tick(executor)
+                self.lifecycle.wait(self.sleep_time())
+        finally:
+            self.shutdown(executor)
@@ -0,0 +1,119 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from clock import CLOCK
+
+
+# Сколько секунд ответ API годится для других чатов с тем же токеном.
+CACHE_TTL = float(os.getenv('API_CACHE_TTL', 60))
+CACHE_SIZE = int(os.getenv('API_CACHE_SIZE', 1024))
+# Ширина корзины from_date, c: запросы из одной корзины делят ответ.
+CACHE_BUCKET = int(os.getenv('API_CACHE_BUCKET', 5 * 60))
+# Text messages:
+CACHE_STATS_LOGS = (
+    'Кэш API: попаданий %(hits)d, промахов %(misses)d, '
+    'присоединились к запросу %(coalesced)d'
+)
+
+
+class Flight:
+    """Запрос к API, которого ждут несколько вызывающих."""
+
+    def __init__(self):
+        """Запрос ещё идёт."""
+        self.finished = threading.Event()
+        self.response = None
+        self.error = None
+
+    def done(self, response=None, error=None):
+        """Запрос закончился ответом response или исключением error."""
+        self.response = response
+        self.error = error
+        self.finished.set()
+
+    def wait(self):
+        """Дождаться ответа или выбросить исключение запроса."""
+        self.finished.wait()
+        if self.error is not None:
+            raise self.error
+        return self.response
+
+
+class ResponseCache:
+    """Общие ответы API для чатов, которые следят за одним токеном.
+
+    Ключ — токен и корзина from_date шириной bucket секунд. Запрос
+    уходит с началом корзины: он не позже from_date каждого, кто делит
+    ответ, а повторы отсеет HomeworkIndex каждого чата. Ответ живёт ttl
+    секунд, лишние вытесняются по LRU. Пока запрос по ключу идёт,
+    остальные ждут его, а не шлют свой (single-flight). Ошибки не
+    кэшируются. Срок жизни ответа считает clock.
+    """
+
+    def __init__(self, ttl=CACHE_TTL, maxsize=CACHE_SIZE,
+                 bucket=CACHE_BUCKET, clock=CLOCK):
+        """Пустой кэш с корзинами from_date шириной bucket секунд."""
+        self.ttl = ttl
+        self.clock = clock
+        self.maxsize = maxsize
+        self.bucket = bucket
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.flights = {}
+        self.hits = self.misses = self.coalesced = 0
+
+    def __len__(self):
+        """Сколько ответов в кэше."""
+        return len(self.entries)
+
+    def get(self, token, from_date, fetch):
+        """Ответ API для token и from_date через fetch(token, from_date)."""
+        key = token, from_date // self.bucket
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > self.clock.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            flight = self.flights.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                flight = self.flights[key] = Flight()
+                self.misses += 1
+                leader = True
+        if not leader:
+            return flight.wait()
+        return self._fetch(key, flight, fetch)
+
+    def _fetch(self, key, flight, fetch):
+        token, bucket = key
+        try:
+            response = fetch(token, bucket * self.bucket)
+        except BaseException as error:
+            with self.lock:
+                del self.flights[key]
+            flight.done(error=error)
+            raise
+        with self.lock:
+            del self.flights[key]
+            self.entries[key] = (self.clock.monotonic() + self.ttl, response)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        flight.done(response)
+        return response
+
+    def stats(self):
+        """Счётчики попаданий, промахов и присоединений к запросу."""
+        return dict(
+            hits=self.hits, misses=self.misses, coalesced=self.coalesced,
+        )
+
+    def log_stats(self):
+        """Счётчики кэша в лог."""
+        if logging.root.isEnabledFor(logging.DEBUG):
+            logging.debug(CACHE_STATS_LOGS, self.stats())
@@ -0,0 +1,169 @@
+import logging
+import random
+import sys
+import threading
+from http import HTTPStatus
+
+import local_exceptions
+from clock import CLOCK
+
+
+TRANSIENT = 'transient'
+PERMANENT = 'permanent'
+UNKNOWN = 'unknown'
+# Ответы API, после которых есть смысл быстро повторить запрос.
+TRANSIENT_STATUSES = frozenset([
+    HTTPStatus.REQUEST_TIMEOUT,
+    HTTPStatus.TOO_MANY_REQUESTS,
+    HTTPStatus.INTERNAL_SERVER_ERROR,
+    HTTPStatus.BAD_GATEWAY,
+    HTTPStatus.SERVICE_UNAVAILABLE,
+    HTTPStatus.GATEWAY_TIMEOUT,
+])
+RETRY_BASE = 5
+RETRY_CAP = 10 * 60
+# Через сколько повторять после ошибки, которую повтор не исправит.
+PERMANENT_DELAY = 60 * 60
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 60
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+# Text messages:
+BREAKER_OPEN_LOGS = 'Размыкатель %s разомкнут после %d ошибок'
+BREAKER_CLOSED_LOGS = 'Размыкатель %s снова замкнут'
+BREAKER_OPEN_RAISE = '{name} недоступен, повтор через {retry_in:.0f} c'
+
+
+def classify(error):
+    """Временная ли ошибка: TRANSIENT, PERMANENT или UNKNOWN."""
+    if isinstance(error, (local_exceptions.CircuitOpenError,
+                          ConnectionError)):
+        return TRANSIENT
+    if isinstance(error, local_exceptions.Not200Error):
+        if error.status_code in TRANSIENT_STATUSES:
+            return TRANSIENT
+        return PERMANENT
+    if isinstance(error, local_exceptions.APIErrorKeyError):
+        return PERMANENT
+    return classify_telegram(error)
+
+
+def classify_telegram(error):
+    """Вид ошибки Telegram; UNKNOWN — если это не ошибка Telegram.
+
+    Пока telegram не импортирован, его ошибок быть не может, и
+    импортировать его ради проверки не нужно.
+    """
+    if 'telegram.error' not in sys.modules:
+        return UNKNOWN
+    from telegram.error import (BadRequest, NetworkError, RetryAfter,
+                                Unauthorized)
+    if isinstance(error, RetryAfter):
+        return TRANSIENT
+    if isinstance(error, (BadRequest, Unauthorized)):
+        return PERMANENT
+    if isinstance(error, NetworkError):
+        return TRANSIENT
+    return UNKNOWN
+
+
+class RetryPolicy:
+    """Задержка перед повтором по типу ошибки.
+
+    Временные ошибки повторяются с экспоненциальной задержкой и полным
+    разбросом: случайно от 0 до min(cap, base * 2 ** attempt), чтобы
+    после сбоя подписчики не вернулись все разом. Постоянные ждут
+    permanent_delay, прочие — default_delay.
+    """
+
+    def __init__(self, base=RETRY_BASE, cap=RETRY_CAP,
+                 permanent_delay=PERMANENT_DELAY, default_delay=None):
+        """Задержки с основанием base и пределом cap."""
+        self.base = base
+        self.cap = cap
+        self.permanent_delay = permanent_delay
+        self.default_delay = cap if default_delay is None else default_delay
+
+    def delay(self, attempt, error):
+        """Через сколько секунд повторить attempt-ю (с нуля) попытку."""
+        kind = classify(error)
+        if kind == PERMANENT:
+            return self.permanent_delay
+        if kind == UNKNOWN:
+            return self.default_delay
+        backoff = random.uniform(0, min(self.cap, self.base * 2 ** attempt))
+        if isinstance(error, local_exceptions.CircuitOpenError):
+            return error.retry_in + backoff
+        # RetryAfter из telegram: Telegram сам сказал, сколько ждать.
+        return getattr(error, 'retry_after', 0) + backoff
+
+
+class CircuitBreaker:
+    """Размыкатель для одного внешнего сервиса.
+
+    После failure_threshold временных ошибок подряд размыкается и
+    reset_timeout секунд не пропускает запросы. Затем пропускает один
+    пробный: успех замыкает цепь, ошибка снова размыкает. Время — по
+    clock (clock.Clock или clock.VirtualClock).
+    """
+
+    def __init__(self, name, failure_threshold=FAILURE_THRESHOLD,
+                 reset_timeout=RESET_TIMEOUT, clock=CLOCK):
+        """Замкнутый размыкатель для сервиса name."""
+        self.name = name
+        self.clock = clock
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0
+
+    def retry_in(self):
+        """Сколько секунд до пробного запроса; 0 — можно сейчас."""
+        if self.state == CLOSED:
+            return 0
+        reset_at = self.opened_at + self.reset_timeout
+        return max(0, reset_at - self.clock.monotonic())
+
+    def allow(self):
+        """Можно ли отправить запрос сейчас."""
+        with self.lock:
+            if self.state == CLOSED:
+                return True
+            if self.retry_in():
+                return False
+            # Один пробный запрос на reset_timeout, даже если
+            # предыдущий пробный так и не вернулся.
+            self.state = HALF_OPEN
+            self.opened_at = self.clock.monotonic()
+            return True
+
+    def check(self):
+        """Пропустить запрос или выбросить CircuitOpenError."""
+        if not self.allow():
+            retry_in = self.retry_in()
+            raise local_exceptions.CircuitOpenError(
+                BREAKER_OPEN_RAISE.format(name=self.name, retry_in=retry_in),
+                retry_in=retry_in,
+            )
+
+    def record(self, error=None):
+        """Учесть исход запроса: None — успех, иначе ошибка."""
+        with self.lock:
+            if error is None or classify(error) != TRANSIENT:
+                if self.state != CLOSED:
+                    logging.warning(BREAKER_CLOSED_LOGS, self.name)
+                self.state = CLOSED
+                self.failures = 0
+                return
+            self.failures += 1
+            if (self.state == HALF_OPEN
+               or self.failures >= self.failure_threshold):
+                if self.state != OPEN:
+                    logging.error(
+                        BREAKER_OPEN_LOGS, self.name, self.failures
+                    )
+                self.state = OPEN
+                self.opened_at = self.clock.monotonic()
@@ -0,0 +1,230 @@
+import heapq
+import itertools
+import math
+import os
+import random
+import threading
+import zlib
+
+import homework
+import retry
+from clock import CLOCK
+from homework_index import updated_at
+
+
+MIN_PERIOD = int(os.getenv('POLL_MIN_PERIOD', 2 * 60))
+MAX_PERIOD = int(os.getenv('POLL_MAX_PERIOD', 60 * 60))
+# Разброс интервала, чтобы подписчики не синхронизировались.
+JITTER = 0.1
+# Во сколько раз растёт интервал после каждого опроса без изменений.
+IDLE_GROWTH = 1.5
+# Предел роста интервала; дальше всё равно упрёмся в max_period.
+MAX_IDLE_STEPS = 10
+# Статусы, при которых скоро ждём изменений и опрашиваем чаще.
+ACTIVE_STATUSES = frozenset(['reviewing'])
+# Статусы, которые ещё изменятся: реже period такие домашки не опрашиваем.
+PENDING_STATUSES = ACTIVE_STATUSES | {'rejected'}
+SECONDS_PER_DAY = 24 * 60 * 60
+PHASE_RANGE = 2 ** 32
+
+
+def phase(tenant):
+    """Постоянная доля периода для подписчика, от 0 до 1."""
+    return zlib.crc32(tenant.name.encode('utf-8')) / PHASE_RANGE
+
+
+class PollQueue:
+    """Подписчики по времени следующего опроса (tenant.next_poll_at).
+
+    Куча с ленивым удалением: запись, чьё время уже не совпадает
+    с next_poll_at подписчика, устарела и пропускается. Вставка —
+    O(log n), ближайшее время — O(1), тик без готовых подписчиков — O(1).
+    """
+
+    def __init__(self):
+        """Пустая очередь."""
+        self.lock = threading.Lock()
+        self.heap = []
+        self.sequence = itertools.count()
+
+    def __len__(self):
+        """Сколько записей в куче, с устаревшими."""
+        return len(self.heap)
+
+    def push(self, tenant):
+        """Поставить подписчика на его next_poll_at."""
+        with self.lock:
+            heapq.heappush(
+                self.heap, (tenant.next_poll_at, next(self.sequence), tenant)
+            )
+
+    def move(self, tenant, poll_at):
+        """Перенести опрос подписчика на poll_at; False — он уже идёт."""
+        with self.lock:
+            if tenant.next_poll_at == math.inf:
+                return False
+            tenant.next_poll_at = poll_at
+            heapq.heappush(
+                self.heap, (poll_at, next(self.sequence), tenant)
+            )
+            return True
+
+    def pop_due(self, now):
+        """Пары (подписчик, когда было пора) для всех, кому пора.
+
+        Пока опрос идёт, подписчик не считается готовым: его
+        next_poll_at становится бесконечным.
+        """
+        due = []
+        with self.lock:
+            while self.heap and self.heap[0][0] <= now:
+                poll_at, _, tenant = heapq.heappop(self.heap)
+                if poll_at == tenant.next_poll_at:
+                    tenant.next_poll_at = math.inf
+                    due.append((tenant, poll_at))
+        return due
+
+    def next_poll_at(self):
+        """Ближайшее время опроса; inf — опрашивать некого."""
+        with self.lock:
+            while self.heap:
+                poll_at, _, tenant = self.heap[0]
+                if poll_at == tenant.next_poll_at:
+                    break
+                heapq.heappop(self.heap)
+            return self.heap[0][0] if self.heap else math.inf
+
+
+class PollMetrics:
+    """Запросы к API и задержка между изменением статуса и уведомлением."""
+
+    def __init__(self, clock=CLOCK):
+        """Счётчики с нуля; сутки считаются от сейчас."""
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.started = clock.time()
+        self.api_calls = 0
+        self.notifications = 0
+        self.latency_total = 0.0
+        self.latency_count = 0
+
+    def record_poll(self, changes, now=None):
+        """Учесть один запрос к API и найденные в нём изменения."""
+        now = self.clock.time() if now is None else now
+        with self.lock:
+            self.api_calls += 1
+            self.notifications += len(changes)
+            for work in changes:
+                updated = updated_at(work)
+                if updated is not None:
+                    self.latency_total += max(0.0, now - updated)
+                    self.latency_count += 1
+
+    def snapshot(self, now=None):
+        """Текущие значения: запросов в сутки и средняя задержка, c."""
+        now = self.clock.time() if now is None else now
+        with self.lock:
+            days = max(now - self.started, 1) / SECONDS_PER_DAY
+            return dict(
+                api_calls=self.api_calls,
+                api_calls_per_day=self.api_calls / days,
+                notifications=self.notifications,
+                avg_notification_latency=(
+                    self.latency_total / self.latency_count
+                    if self.latency_count else None
+                ),
+            )
+
+
+class FixedScheduler:
+    """Опрос каждого подписчика раз в period секунд.
+
+    Задержку уведомлений metrics считает по clock.
+    """
+
+    def __init__(self, period=homework.RETRY_PERIOD, clock=CLOCK):
+        """Опрос раз в period секунд."""
+        self.period = period
+        self.metrics = PollMetrics(clock)
+
+    def next_interval(self, tenant, changes, error):
+        """Через сколько секунд снова опросить подписчика.
+
+        changes — найденные изменения, error — исключение опроса или None.
+        """
+        self.metrics.record_poll(changes)
+        return self.period
+
+    def first_interval(self, tenant, tenants):
+        """Через сколько секунд опросить подписчика впервые.
+
+        Свой постоянный сдвиг внутри period у каждого из tenants
+        подписчиков: запросы идут равномерно, а не все разом.
+        """
+        return phase(tenant) * self.period * (1 - 1 / max(1, tenants))
+
+
+class TenantPollState:
+    """Сколько опросов подряд прошли без изменений и с ошибкой."""
+
+    __slots__ = ('idle_polls', 'errors')
+
+    def __init__(self):
+        """Ни опросов без изменений, ни ошибок."""
+        self.idle_polls = 0
+        self.errors = 0
+
+
+class AdaptiveScheduler(FixedScheduler):
+    """Интервал опроса по состоянию домашек и истории подписчика.
+
+    После каждого опроса без изменений интервал растёт в IDLE_GROWTH
+    раз. Работу, только что взятую на ревью, опрашиваем с min_period,
+    а пока ревью затягивается — всё реже, до period. Пока у подписчика
+    есть домашка, статус которой ещё изменится (PENDING_STATUSES),
+    интервал не больше period; иначе растёт до max_period. Итог
+    с разбросом JITTER в пределах [min_period, max_period]. После ошибки
+    задержку выбирает retry_policy (retry.RetryPolicy): временные сбои
+    повторяются быстрее min_period, постоянные — не чаще max_period.
+    """
+
+    def __init__(self, period=homework.RETRY_PERIOD, min_period=MIN_PERIOD,
+                 max_period=MAX_PERIOD, jitter=JITTER, retry_policy=None,
+                 clock=CLOCK):
+        """Интервал от period в пределах [min_period, max_period]."""
+        super().__init__(period, clock)
+        self.min_period = min_period
+        self.max_period = max_period
+        self.jitter = jitter
+        self.retry_policy = (
+            retry.RetryPolicy(
+                cap=max_period, permanent_delay=max_period,
+                default_delay=period,
+            )
+            if retry_policy is None else retry_policy
+        )
+        self.states = {}
+
+    def next_interval(self, tenant, changes, error):
+        """Через сколько секунд снова опросить подписчика."""
+        super().next_interval(tenant, changes, error)
+        state = self.states.get(tenant.name)
+        if state is None:
+            state = self.states[tenant.name] = TenantPollState()
+        if error is not None:
+            state.errors += 1
+            return min(
+                self.max_period,
+                self.retry_policy.delay(state.errors - 1, error),
+            )
+        state.errors = 0
+        state.idle_polls = 0 if changes else state.idle_polls + 1
+        growth = IDLE_GROWTH ** min(state.idle_polls, MAX_IDLE_STEPS)
+        if tenant.homeworks.has_status(ACTIVE_STATUSES):
+            interval = min(self.period, self.min_period * growth)
+        elif tenant.homeworks.has_status(PENDING_STATUSES):
+            interval = self.period
+        else:
+            interval = self.period * growth
+        interval *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        return min(self.max_period, max(self.min_period, interval))
@@ -0,0 +1,185 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from homework_index import homework_key
+
+
+STATE_PATH = os.getenv('STATE_PATH', 'state.db')
+# Как часто сбрасывать накопленные изменения на диск, c.
+FLUSH_INTERVAL = 5
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS tenants (
+    name TEXT PRIMARY KEY,
+    from_date INTEGER NOT NULL,
+    last_message TEXT,
+    paused INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS homeworks (
+    tenant TEXT NOT NULL,
+    key TEXT NOT NULL,
+    status TEXT,
+    PRIMARY KEY (tenant, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS error_windows (
+    tenant TEXT PRIMARY KEY,
+    opened_at REAL NOT NULL,
+    counts TEXT NOT NULL
+);
+'''
+# Колонки, которых нет в базах, созданных раньше: (таблица, колонка, тип).
+MIGRATIONS = (
+    ('tenants', 'paused', 'INTEGER NOT NULL DEFAULT 0'),
+)
+# Text messages:
+STORE_LOADED_LOGS = (
+    'Состояние из %s: подписчиков %d, домашек %d за %.3f c'
+)
+STORE_FLUSHED_LOGS = 'Сохранено подписчиков %d, домашек %d'
+
+
+class StateStore:
+    """Состояние подписчиков в SQLite, чтобы перезапуск ничего не терял.
+
+    Хранит курсор from_date, последнее сообщение, паузу, статус каждой
+    домашки и окна сводок ошибок. Изменения копятся в памяти и пишутся
+    одной транзакцией не чаще раза в flush_interval секунд.
+    """
+
+    def __init__(self, path=STATE_PATH, flush_interval=FLUSH_INTERVAL):
+        """Открыть базу path и создать таблицы, если их нет."""
+        self.path = path
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+        self.migrate()
+        self.pending_tenants = {}
+        self.pending_homeworks = {}
+        self.flushed_at = time.monotonic()
+
+    def migrate(self):
+        """Добавить в старую базу недостающие колонки."""
+        for table, column, definition in MIGRATIONS:
+            columns = {
+                row[1] for row in self.connection.execute(
+                    f'PRAGMA table_info({table})'
+                )
+            }
+            if column not in columns:
+                self.connection.execute(
+                    f'ALTER TABLE {table} ADD COLUMN {column} {definition}'
+                )
+
+    def load(self, tenants):
+        """Восстановить состояние подписчиков из базы."""
+        started = time.monotonic()
+        by_name = {tenant.name: tenant for tenant in tenants}
+        loaded_homeworks = 0
+        with self.lock:
+            for name, from_date, last_message, paused in (
+                self.connection.execute(
+                    'SELECT name, from_date, last_message, paused '
+                    'FROM tenants'
+                )
+            ):
+                tenant = by_name.get(name)
+                if tenant is not None:
+                    tenant.timestamp = from_date
+                    tenant.last_message = last_message
+                    tenant.paused = bool(paused)
+            for name, key, status in self.connection.execute(
+                'SELECT tenant, key, status FROM homeworks'
+            ):
+                tenant = by_name.get(name)
+                if tenant is not None:
+                    tenant.homeworks.restore(json.loads(key), status)
+                    loaded_homeworks += 1
+        logging.debug(
+            STORE_LOADED_LOGS, self.path, len(by_name), loaded_homeworks,
+            time.monotonic() - started,
+        )
+
+    def save_tenant(self, tenant):
+        """Запомнить курсор, последнее сообщение и паузу подписчика."""
+        with self.lock:
+            self.pending_tenants[tenant.name] = (
+                tenant.timestamp, tenant.last_message, int(tenant.paused)
+            )
+
+    def save_homework(self, tenant, homework):
+        """Запомнить статус домашки подписчика."""
+        key = json.dumps(homework_key(homework))
+        with self.lock:
+            self.pending_homeworks[tenant.name, key] = homework.get('status')
+
+    def load_errors(self, digest, names=None):
+        """Восстановить окна сводок ошибок (error_digest.ErrorDigest).
+
+        names — только этих подписчиков; None — всех.
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                'SELECT tenant, opened_at, counts FROM error_windows'
+            ).fetchall()
+        for name, opened_at, counts in rows:
+            if names is None or name in names:
+                digest.restore(name, opened_at, json.loads(counts))
+
+    def save_errors(self, digest, names=None):
+        """Записать открытые окна сводок ошибок вместо прежних.
+
+        names — только окна этих подписчиков, остальные в базе не
+        трогаются: так пишут процессы опроса каждый свою долю.
+        """
+        rows = [
+            (name, opened_at, json.dumps(counts, ensure_ascii=False))
+            for name, opened_at, counts in digest.snapshot()
+            if names is None or name in names
+        ]
+        with self.lock, self.connection:
+            if names is None:
+                self.connection.execute('DELETE FROM error_windows')
+            else:
+                self.connection.executemany(
+                    'DELETE FROM error_windows WHERE tenant = ?',
+                    [(name,) for name in names],
+                )
+            self.connection.executemany(
+                'INSERT INTO error_windows VALUES (?, ?, ?)', rows
+            )
+
+    def maybe_flush(self):
+        """Сбросить изменения, если с прошлого раза прошло flush_interval."""
+        if time.monotonic() - self.flushed_at >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Записать накопленные изменения одной транзакцией."""
+        with self.lock:
+            tenants, self.pending_tenants = self.pending_tenants, {}
+            homeworks, self.pending_homeworks = self.pending_homeworks, {}
+            self.flushed_at = time.monotonic()
+            if not tenants and not homeworks:
+                return
+            with self.connection:
+                self.connection.executemany(
+                    'INSERT OR REPLACE INTO tenants VALUES (?, ?, ?, ?)',
+                    [(name, *state) for name, state in tenants.items()],
+                )
+                self.connection.executemany(
+                    'INSERT OR REPLACE INTO homeworks VALUES (?, ?, ?)',
+                    [(name, key, status)
+                     for (name, key), status in homeworks.items()],
+                )
+        logging.debug(STORE_FLUSHED_LOGS, len(tenants), len(homeworks))
+
+    def close(self):
+        """Сбросить изменения и закрыть базу."""
+        self.flush()
+        self.connection.close()
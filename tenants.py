@@ -0,0 +1,112 @@
+import json
+import logging
+import time
+from collections import deque
+
+import homework
+import messages
+from delivery import Deliveries
+from homework_index import HomeworkIndex
+
+
+# Сколько последних уведомлений подписчика помнить для /history.
+HISTORY_SIZE = 10
+# Text messages:
+TENANTS_LOGS_START = 'Загружаем подписчиков из %s'
+TENANTS_LOADED_LOGS = 'Загружено подписчиков: %d'
+TENANTS_NOT_LIST_RAISE = 'Конфиг подписчиков не список, a {type}'
+TENANT_NOT_DICT_RAISE = 'Подписчик #{index} не словарь, a {type}'
+TENANT_NO_KEY_RAISE = 'У подписчика #{index} нет ключа {key}'
+TENANT_DUPLICATE_RAISE = 'Подписчик {name} указан дважды'
+TENANT_KEYS = (
+    'practicum_token',
+    'chat_id',
+)
+
+
+class Tenant:
+    """Подписчик: токен Практикума, чат в Telegram и состояние опроса."""
+
+    def __init__(self, name, practicum_token, chat_id, timestamp=None,
+                 locale=messages.DEFAULT_LOCALE):
+        """Подписчик; timestamp по умолчанию — сейчас."""
+        self.name = name
+        self.practicum_token = practicum_token
+        self.chat_id = chat_id
+        # Язык уведомлений о статусах: шаблоны messages.Messages.
+        self.locale = locale
+        self.timestamp = (
+            int(time.time()) if timestamp is None else timestamp
+        )
+        self.last_message = None
+        # Последние уведомления: пары (unix time, текст).
+        self.history = deque(maxlen=HISTORY_SIZE)
+        self.homeworks = HomeworkIndex()
+        # Уведомления в outbox, которые ещё не подтвердил Telegram.
+        self.deliveries = Deliveries()
+        # Когда API последний раз ответил, unix time; None — ещё не отвечал.
+        self.polled_at = None
+        self.paused = False
+        # Когда опросить снова, по time.monotonic(); 0 — сразу.
+        self.next_poll_at = 0
+
+    def remember(self, message, now=None):
+        """Запомнить уведомление, отправленное подписчику."""
+        self.last_message = message
+        self.history.append((time.time() if now is None else now, message))
+
+    def __repr__(self):
+        """Имя и чат подписчика."""
+        return f'Tenant({self.name!r}, chat_id={self.chat_id!r})'
+
+
+def tenant_from_env():
+    """Единственный подписчик из переменных окружения."""
+    homework.check_tokens()
+    return Tenant(
+        name='default',
+        practicum_token=homework.PRACTICUM_TOKEN,
+        chat_id=homework.TELEGRAM_CHAT_ID,
+    )
+
+
+def parse_tenants(config):
+    """Подписчики из распарсенного конфига."""
+    if not isinstance(config, list):
+        raise TypeError(TENANTS_NOT_LIST_RAISE.format(
+            type=type(config))
+        )
+    tenants = []
+    names = set()
+    for index, item in enumerate(config):
+        if not isinstance(item, dict):
+            raise TypeError(TENANT_NOT_DICT_RAISE.format(
+                index=index,
+                type=type(item))
+            )
+        for key in TENANT_KEYS:
+            if key not in item:
+                raise KeyError(TENANT_NO_KEY_RAISE.format(
+                    index=index,
+                    key=key)
+                )
+        name = str(item.get('name', item['chat_id']))
+        if name in names:
+            raise ValueError(TENANT_DUPLICATE_RAISE.format(name=name))
+        names.add(name)
+        tenants.append(Tenant(
+            name=name,
+            practicum_token=item['practicum_token'],
+            chat_id=item['chat_id'],
+            locale=item.get('locale', messages.DEFAULT_LOCALE),
+        ))
+    return tenants
+
+
+def load_tenants(path):
+    """Подписчики из JSON-файла."""
+    logging.debug(TENANTS_LOGS_START, path)
+    with open(path, encoding='utf-8') as file:
+        tenants = parse_tenants(json.load(file))
+    logging.debug(TENANTS_LOADED_LOGS, len(tenants))
+    return tenants
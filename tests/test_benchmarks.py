@@ -0,0 +1,194 @@
+import time
+
+import pytest
+import requests
+import telegram
+
+from benchmarks import (
+    memory, render, run, simulate, stub_servers, validation,
+)
+
+
+class TestHomeworkModel:
+    def test_status_changes_on_schedule(self):
+        model = stub_servers.HomeworkModel(change_period=10)
+        name = model.name('token', 0)
+        changed = model.started + model.offset(name)
+        assert model.state(name, changed - 1) == (None, None)
+        assert model.state(name, changed + 1) == ('reviewing', changed)
+        assert model.state(name, changed + 11) == ('rejected', changed + 10)
+
+    def test_homeworks_since_from_date(self):
+        model = stub_servers.HomeworkModel(
+            homeworks_per_tenant=2, change_period=10, payload_bytes=16,
+        )
+        now = model.started + 100
+        homeworks = model.homeworks('token', 0, now)
+        assert len(homeworks) == 2
+        assert homeworks[0]['reviewer_comment'] == 'x' * 16
+        assert model.homeworks('token', now + 1, now) == [], (
+            'Домашки, не менявшиеся с from_date, не должны возвращаться.'
+        )
+
+
+class TestStubServers:
+    def test_practicum_stub_errors(self):
+        model = stub_servers.HomeworkModel()
+        stub = stub_servers.PracticumStub(model, error_rate=1).start()
+        try:
+            response = requests.get(
+                stub.endpoint,
+                headers={'Authorization': 'OAuth token'},
+                params={'from_date': 0},
+                timeout=1,
+            )
+        finally:
+            stub.stop()
+        assert response.status_code == 503
+        assert stub.requests == 1
+
+    def test_telegram_stub_accepts_bot(self):
+        model = stub_servers.HomeworkModel(change_period=1000)
+        model.started -= 1000
+        stub = stub_servers.TelegramStub(model).start()
+        try:
+            bot = telegram.Bot(token=run.BOT_TOKEN, base_url=stub.base_url)
+            name = model.name('token', 0)
+            message = bot.send_message(
+                chat_id=1, text=f'Изменился статус проверки работы "{name}".'
+            )
+        finally:
+            stub.stop()
+        assert message.chat_id == 1
+        assert stub.messages == 1
+        assert len(stub.latencies) == 1
+
+    def test_coalesced_message_counts_every_status(self):
+        model = stub_servers.HomeworkModel(change_period=1000)
+        model.started -= 1000
+        names = [model.name('token', index) for index in range(3)]
+        text = '\n\n'.join(f'Работа "{name}" проверена.' for name in names)
+        assert len(model.latencies(text, time.time())) == 3, (
+            'В склеенном сообщении нужно учесть каждое уведомление.'
+        )
+
+
+class TestRun:
+    def test_percentile(self):
+        values = list(range(1, 101))
+        assert run.percentile(values, 0.5) == 50
+        assert run.percentile(values, 0.99) == 99
+        assert run.percentile([], 0.5) is None
+
+    @pytest.mark.timeout(10)
+    def test_scenario_delivers_notifications(self):
+        report = run.run_scenario(
+            tenants=2, duration=1.5, period=0.2, homeworks=1,
+            change_period=0.5, api_latency=0, telegram_latency=0,
+        )
+        assert report['api_requests'] >= 2
+        assert report['messages'] > 0, (
+            'За сценарий не дошло ни одного уведомления.'
+        )
+        assert report['latency_p50'] is not None
+        assert report['max_rss_mb'] > 0
+
+    @pytest.mark.timeout(10)
+    def test_coalesced_scenario(self):
+        report = run.run_scenario(
+            tenants=2, duration=1.5, period=0.2, homeworks=5,
+            change_period=0.5, api_latency=0, telegram_latency=0,
+            coalesce_window=1,
+        )
+        assert report['notifications'] > 0
+        assert report['messages'] < report['notifications'], (
+            'Уведомления чата должны склеиваться в меньшее число сообщений.'
+        )
+
+    @pytest.mark.timeout(10)
+    def test_job_queue_engine(self):
+        report = run.run_scenario(
+            tenants=2, duration=1.5, period=0.2, homeworks=1,
+            change_period=0.5, api_latency=0, telegram_latency=0,
+            engine='job-queue',
+        )
+        assert report['api_requests'] >= 2, (
+            'Задачи JobQueue должны опрашивать подписчиков.'
+        )
+        assert report['messages'] > 0
+
+
+class TestMemory:
+    def test_compact_index_is_smaller(self):
+        for per_tenant in memory.PER_TENANT:
+            report = memory.run_case(homeworks=2000, per_tenant=per_tenant)
+            assert report['homeworks'] == 2000
+            assert report['compact_bytes'] < report['legacy_bytes'], (
+                'Колонки должны занимать меньше словаря статусов.'
+            )
+
+
+class TestValidation:
+    def test_defects_are_counted(self):
+        report = validation.run_case(2000, defect_rate=0.01, repeats=1)
+        assert report['homeworks'] == 2000
+        assert report['defects'] == 20
+        assert report['per_homework_us'] > 0
+
+
+class TestRender:
+    def test_modes_render_same_texts(self):
+        notifications = render.make_notifications(count=50, homeworks=5)
+        catalog = render.messages.Messages(
+            render.homework.STATUS_MESSAGE, render.homework.HOMEWORK_VERDICTS
+        )
+        for work, locale in notifications:
+            assert catalog.status(work, locale) == catalog._render(
+                work['homework_name'], work['status'], locale
+            )
+        reports = render.run(count=200, homeworks=10, repeats=1)
+        assert [report['mode'] for report in reports] == [
+            'format', 'compiled', 'cached'
+        ]
+
+
+class TestSimulate:
+    @pytest.mark.timeout(10)
+    def test_fixed_schedule_day(self):
+        report = simulate.run_simulation(
+            days=1, tenants=5, change_period=60 * 60, period=600,
+        )
+        assert report['api_calls'] == 5 * 24 * 6, (
+            'За сутки каждого подписчика опрашивают раз в period.'
+        )
+        assert report['notifications'] >= 5 * 23
+        assert report['latency_max'] <= 600, (
+            'Уведомление не должно опаздывать больше чем на period.'
+        )
+
+    @pytest.mark.timeout(10)
+    def test_adaptive_is_not_more_expensive(self):
+        reports = {
+            schedule: simulate.run_simulation(
+                days=2, tenants=10, schedule=schedule
+            )
+            for schedule in simulate.SCHEDULES
+        }
+        assert (
+            reports['adaptive']['api_calls_per_day']
+            <= reports['fixed']['api_calls_per_day']
+        ), 'Адаптивное расписание не должно тратить больше запросов к API.'
+
+    @pytest.mark.timeout(10)
+    def test_same_seed_same_report(self):
+        reports = [
+            simulate.run_simulation(
+                days=1, tenants=3, schedule='adaptive', seed=1
+            )
+            for _ in range(2)
+        ]
+        for report in reports:
+            del report['seconds']
+        assert reports[0] == reports[1], (
+            'В виртуальном времени прогон должен повторяться.'
+        )
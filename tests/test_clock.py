@@ -0,0 +1,151 @@
+import random
+import threading
+from http import HTTPStatus
+
+import pytest
+import requests
+
+import error_digest
+import lifecycle
+import poller
+import retry
+import scheduler
+import tenants
+from clock import InlineExecutor, VirtualClock
+from test_poller import MockBot
+from transport import ReplayResponse
+
+
+WEEK = 7 * scheduler.SECONDS_PER_DAY
+EMPTY = '{"homeworks": [], "current_date": 0}'
+
+
+class TestVirtualClock:
+    def test_sleep_moves_time(self):
+        clock = VirtualClock(start=1000)
+        clock.sleep(WEEK)
+        assert clock.time() == 1000 + WEEK
+        assert clock.monotonic() == WEEK
+        assert clock.slept == WEEK
+
+    def test_timers_fire_in_order(self):
+        clock = VirtualClock()
+        fired = []
+        clock.call_later(20, lambda: fired.append((20, clock.monotonic())))
+        clock.call_later(10, lambda: fired.append((10, clock.monotonic())))
+        clock.call_later(5, lambda: fired.append('cancelled')).cancel()
+        clock.sleep(15)
+        assert fired == [(10, 10)]
+        clock.sleep(15)
+        assert fired == [(10, 10), (20, 20)], (
+            'Таймеры должны срабатывать по сроку и ровно в срок.'
+        )
+        assert clock.monotonic() == 30
+
+    def test_wait_stops_at_timer(self):
+        clock = VirtualClock()
+        event = threading.Event()
+        clock.call_later(30, event.set)
+        assert clock.wait(event, 600) is True
+        assert clock.monotonic() == 30, (
+            'Ожидание должно закончиться, как только событие наступило.'
+        )
+        assert clock.wait(threading.Event(), 60) is False
+        assert clock.monotonic() == 90
+
+    def test_wait_forever_without_timers(self):
+        clock = VirtualClock()
+        with pytest.raises(RuntimeError):
+            clock.wait(threading.Event())
+
+    def test_inline_executor(self):
+        executor = InlineExecutor()
+        assert executor.submit(lambda value: value * 2, 21).result() == 42
+        future = executor.submit(lambda: 1 / 0)
+        assert isinstance(future.exception(), ZeroDivisionError)
+
+
+class TestVirtualTime:
+    def test_lifecycle_deadline(self):
+        clock = VirtualClock()
+        cycle = lifecycle.Lifecycle(shutdown_timeout=20, clock=clock)
+        clock.call_later(100, cycle.stop)
+        assert cycle.wait(3600) is False
+        assert clock.monotonic() == 100
+        clock.sleep(5)
+        assert cycle.remaining() == 15
+
+    def test_error_digest_window(self):
+        clock = VirtualClock()
+        digest = error_digest.ErrorDigest(window=3600, clock=clock)
+        assert digest.record('chat', ValueError('first')) == 'first'
+        assert digest.record('chat', ValueError('second')) is None
+        clock.sleep(3600)
+        assert 'ValueError × 1' in digest.check('chat')
+
+    @pytest.mark.timeout(10)
+    def test_week_of_fixed_polling(self):
+        clock = VirtualClock()
+        calls = []
+
+        class Client:
+            def get(self, url, headers=None, params=None, **kwargs):
+                calls.append(clock.monotonic())
+                return ReplayResponse(HTTPStatus.OK, EMPTY)
+
+            def log_stats(self):
+                pass
+
+        registry = [
+            tenants.Tenant(str(number), 'token', number, timestamp=0)
+            for number in range(3)
+        ]
+        engine = poller.Poller(
+            MockBot(), registry, client=Client(),
+            schedule=scheduler.FixedScheduler(600, clock=clock),
+            clock=clock,
+        )
+        clock.call_later(WEEK, engine.lifecycle.stop)
+        engine.run()
+        assert 3 * (WEEK // 600) <= len(calls) <= 3 * (WEEK // 600 + 1), (
+            'За неделю каждого подписчика опрашивают раз в 600 c.'
+        )
+        assert clock.monotonic() == WEEK
+
+    @pytest.mark.timeout(10)
+    def test_backoff_budget_for_a_day_of_outage(self):
+        random.seed(0)
+        clock = VirtualClock()
+        calls = []
+
+        class Client:
+            def get(self, url, headers=None, params=None, **kwargs):
+                calls.append(clock.monotonic())
+                raise requests.ConnectionError('down')
+
+            def log_stats(self):
+                pass
+
+        bot = MockBot()
+        registry = [
+            tenants.Tenant(str(number), 'token', number, timestamp=0)
+            for number in range(5)
+        ]
+        breaker = retry.CircuitBreaker(
+            'api', failure_threshold=5, reset_timeout=60, clock=clock
+        )
+        engine = poller.Poller(
+            bot, registry, client=Client(),
+            schedule=scheduler.AdaptiveScheduler(600, clock=clock),
+            breaker=breaker,
+            clock=clock,
+        )
+        clock.call_later(scheduler.SECONDS_PER_DAY, engine.lifecycle.stop)
+        engine.run()
+        assert len(calls) < 5 * scheduler.SECONDS_PER_DAY // 600, (
+            'Пока API лежит, запросов должно быть меньше, чем при опросе '
+            'раз в period: backoff и размыкатель.'
+        )
+        assert len(bot.sent) <= 5 * 25, (
+            'Об ошибках подписчик узнаёт не чаще раза в час.'
+        )
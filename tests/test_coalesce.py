@@ -0,0 +1,168 @@
+import threading
+import time
+
+import coalesce
+import outbox
+import worker
+from test_outbox import RecordingBot
+
+
+class RecordingTarget:
+    def __init__(self, accept=True):
+        self.accept = accept
+        self.sent = []
+        self.dones = []
+        self.arrived = threading.Event()
+
+    def put(self, chat_id, text, timeout=None, tenant=None, done=None):
+        if not self.accept:
+            return False
+        self.sent.append((time.monotonic(), chat_id, text, tenant))
+        self.dones.append(done)
+        self.arrived.set()
+        return True
+
+    def pending(self):
+        return 0
+
+
+class TestRender:
+    def test_texts_are_joined_up_to_limit(self):
+        texts = ['a' * 2000, 'b' * 2000, 'c' * 2000]
+        messages = coalesce.render(texts)
+        assert messages == [
+            'a' * 2000 + coalesce.SEPARATOR + 'b' * 2000, 'c' * 2000
+        ], 'Уведомления склеиваются по порядку, пока влезают в сообщение.'
+
+    def test_long_text_is_split(self):
+        text = '\n'.join('строка %d' % number for number in range(2000))
+        messages = coalesce.render([text, 'x' * 5000])
+        assert all(
+            len(message) <= coalesce.MESSAGE_LIMIT for message in messages
+        ), 'Ни одно сообщение не должно быть длиннее предела Bot API.'
+        assert messages[0].startswith('строка 0\n')
+        assert messages[-1] == 'x' * (5000 - coalesce.MESSAGE_LIMIT)
+
+    def test_single_text_is_unchanged(self):
+        assert coalesce.render(['один']) == ['один']
+
+    def test_pack_tracks_sources(self):
+        texts = ['a' * 3000, 'b' * 5000, 'c']
+        assert [sources for _, sources in coalesce.pack(texts)] == [
+            [0], [1], [1, 2]
+        ], 'Каждое сообщение должно знать, чьи уведомления в нём.'
+
+
+class TestCoalescer:
+    def test_burst_becomes_one_message(self):
+        target = RecordingTarget()
+        coalescer = coalesce.Coalescer(target, window=0.2).start()
+        started = time.monotonic()
+        for number in range(3):
+            assert coalescer.put(1, f'hw{number}', tenant='ann')
+        assert coalescer.put(2, 'other')
+        assert target.arrived.wait(1)
+        time.sleep(0.1)
+        coalescer.stop(timeout=1)
+        assert sorted(item[1:] for item in target.sent) == [
+            (1, coalesce.SEPARATOR.join(['hw0', 'hw1', 'hw2']), 'ann'),
+            (2, 'other', None),
+        ], 'Уведомления чата за окно должны уйти одним сообщением.'
+        assert all(
+            sent_at - started >= 0.2 for sent_at, *_ in target.sent
+        ), 'Сообщение уходит, когда окно чата закончилось.'
+
+    def test_size_cap_flushes_before_window(self):
+        target = RecordingTarget()
+        coalescer = coalesce.Coalescer(
+            target, window=60, max_messages=2
+        ).start()
+        coalescer.put(1, 'a')
+        coalescer.put(1, 'b')
+        assert target.arrived.wait(1), (
+            'Набралось max_messages: окно не ждём.'
+        )
+        coalescer.stop(timeout=1)
+        assert [item[2] for item in target.sent] == ['a\n\nb']
+
+    def test_stop_flushes_open_windows(self):
+        target = RecordingTarget()
+        coalescer = coalesce.Coalescer(target, window=60).start()
+        coalescer.put(1, 'a')
+        started = time.monotonic()
+        coalescer.stop(timeout=1)
+        assert time.monotonic() - started < 0.5
+        assert [item[2] for item in target.sent] == ['a']
+        assert not coalescer.put(1, 'b'), (
+            'После остановки уведомления не принимаются.'
+        )
+
+    def test_full_buffer_rejects(self):
+        coalescer = coalesce.Coalescer(RecordingTarget(), window=60, maxsize=1)
+        assert coalescer.put(1, 'a')
+        assert not coalescer.put(2, 'b', timeout=0.05)
+        assert coalescer.pending() == 1
+
+    def test_rejected_message_is_dropped_at_deadline(self):
+        coalescer = coalesce.Coalescer(
+            RecordingTarget(accept=False), window=60
+        ).start()
+        coalescer.put(1, 'a')
+        coalescer.stop(timeout=0.2)
+        assert coalescer.dropped == 1
+
+    def test_done_waits_for_delivery(self):
+        target = RecordingTarget()
+        coalescer = coalesce.Coalescer(target, window=60).start()
+        outcomes = []
+        coalescer.put(1, 'a', done=lambda ok: outcomes.append(('a', ok)))
+        coalescer.put(1, 'b' * 5000, done=lambda ok: outcomes.append(
+            ('b', ok)
+        ))
+        coalescer.stop(timeout=1)
+        assert outcomes == [], (
+            'Принятое в окно — ещё не отправленное: done ждёт target.'
+        )
+        first, head, tail = target.dones
+        first(True)
+        head(True)
+        assert outcomes == [('a', True)]
+        tail(False)
+        assert outcomes == [('a', True), ('b', False)], (
+            'Уведомление отправлено, только если дошли все его части.'
+        )
+
+    def test_rejected_message_reports_failure(self):
+        coalescer = coalesce.Coalescer(
+            RecordingTarget(accept=False), window=60
+        ).start()
+        outcomes = []
+        coalescer.put(1, 'a', done=outcomes.append)
+        coalescer.stop(timeout=0.2)
+        coalescer.thread.join(1)
+        assert outcomes == [False], (
+            'Не переданное к сроку уведомление должно сообщить done(False).'
+        )
+
+    def test_fewer_telegram_calls_through_outbox(self):
+        bot = RecordingBot()
+        bot.expected = 1
+        sender = outbox.Outbox(bot).start()
+        coalescer = coalesce.Coalescer(sender, window=0.1).start()
+        for number in range(5):
+            coalescer.put(1, f'hw{number}')
+        assert bot.done.wait(1)
+        coalescer.stop(timeout=1)
+        sender.stop(timeout=1)
+        assert len(bot.sent) == 1, (
+            'Пять уведомлений в окне — один вызов send_message.'
+        )
+
+
+class TestWorker:
+    def test_zero_window_disables_coalescing(self):
+        target = RecordingTarget()
+        options = worker.parse_args(['--coalesce-window', '0'])
+        assert worker.make_coalescer(options, target) is target
+        options = worker.parse_args([])
+        assert options.coalesce_window == coalesce.COALESCE_WINDOW
@@ -0,0 +1,117 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+import commands
+import poller
+import storage
+import tenants
+from test_poller import MockBot
+
+
+class FakeMessage:
+    def __init__(self):
+        self.replies = []
+
+    def reply_text(self, text):
+        self.replies.append(text)
+
+
+def make_update(chat_id):
+    return SimpleNamespace(
+        effective_chat=SimpleNamespace(id=chat_id),
+        effective_message=FakeMessage(),
+    )
+
+
+@pytest.fixture
+def slow_api(monkeypatch):
+    def slow_get(*args, **kwargs):
+        time.sleep(5)
+
+    monkeypatch.setattr(requests, 'get', slow_get)
+
+
+@pytest.fixture
+def engine():
+    tenant = tenants.Tenant('ann', 'token', 1, timestamp=0)
+    for work in ({'id': 1, 'status': 'approved'},
+                 {'id': 2, 'status': 'reviewing'},
+                 {'id': 3, 'status': 'approved'}):
+        tenant.homeworks.commit(work)
+    tenant.remember('первое', now=100)
+    tenant.remember('второе', now=160)
+    tenant.polled_at = 160
+    return poller.Poller(MockBot(), [tenant])
+
+
+class TestCommands:
+    def test_status_from_index(self, engine):
+        text = commands.status_text(engine.tenants[0], now=280)
+        assert text == (
+            'ann: API отвечал 2 мин назад\n'
+            'Домашек: 3, принято: 2, на проверке: 1\n'
+            'Последнее уведомление: второе'
+        )
+
+    def test_history_newest_first(self, engine):
+        text = commands.history_text(engine.tenants[0], now=160)
+        assert text == 'ann:\n0 мин назад: второе\n1 мин назад: первое'
+
+    def test_unknown_chat(self, engine):
+        assert commands.Commands(engine).status(2) == (
+            commands.NOT_SUBSCRIBED_MESSAGE
+        )
+
+    def test_reply_does_not_wait_for_api(self, engine, slow_api):
+        handlers = commands.Commands(engine)
+        for name in commands.COMMANDS:
+            update = make_update('1')
+            started = time.perf_counter()
+            handlers.handler(name)(update, None)
+            assert time.perf_counter() - started < 0.1, (
+                'Команда должна отвечать из памяти, не дожидаясь API.'
+            )
+            assert len(update.effective_message.replies) == 1
+
+    def test_register(self, engine):
+        added = []
+        dispatcher = SimpleNamespace(add_handler=added.append)
+        commands.Commands(engine).register(dispatcher)
+        assert [handler.command for handler in added] == [
+            [name] for name in commands.COMMANDS
+        ]
+
+
+class TestPause:
+    def test_paused_tenant_is_not_polled(self, engine, slow_api):
+        tenant = engine.tenants[0]
+        commands.Commands(engine).pause(1)
+        started = time.perf_counter()
+        engine.poll_tenant(tenant)
+        assert time.perf_counter() - started < 0.1, (
+            'На паузе подписчик не должен ходить в API.'
+        )
+        assert tenant.next_poll_at > time.monotonic()
+
+    def test_resume_polls_now(self, engine):
+        tenant = engine.tenants[0]
+        tenant.next_poll_at = time.monotonic() + 600
+        engine.pause(tenant)
+        engine.pause(tenant, paused=False)
+        assert not tenant.paused
+        assert engine.queue.next_poll_at() <= time.monotonic()
+
+    def test_pause_survives_restart(self, tmp_path):
+        path = tmp_path / 'state.db'
+        store = storage.StateStore(path)
+        tenant = tenants.Tenant('ann', 'token', 1)
+        poller.Poller(MockBot(), [tenant], store=store).pause(tenant)
+        store.close()
+        restored = tenants.Tenant('ann', 'token', 1)
+        store = storage.StateStore(path)
+        store.load([restored])
+        store.close()
+        assert restored.paused
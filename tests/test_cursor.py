@@ -0,0 +1,50 @@
+import requests
+
+import cursor
+import poller
+import tenants
+import utils
+from test_poller import MockBot
+
+
+class TestAdvance:
+    def test_empty_response_advances_with_overlap(self):
+        assert cursor.advance(0, {'current_date': 1000}, overlap=60) == 940
+
+    def test_never_moves_back(self):
+        assert cursor.advance(990, {'current_date': 1000}, overlap=60) == 990
+
+    def test_undelivered_homework_is_kept_in_window(self):
+        undelivered = [{'date_updated': '1970-01-01T00:10:00Z'}]
+        assert cursor.advance(
+            0, {'current_date': 1000}, undelivered, overlap=60
+        ) == 540
+
+    def test_unknown_date_stops_cursor(self):
+        assert cursor.advance(
+            5, {'current_date': 1000}, [{'status': 'approved'}]
+        ) == 5
+
+    def test_missing_current_date(self):
+        assert cursor.advance(5, {'homeworks': []}) == 5
+
+
+class TestPollerCursor:
+    def test_window_stays_bounded_without_changes(self, monkeypatch):
+        requested = []
+
+        def mock_get(url, headers=None, params=None, **kwargs):
+            requested.append(params['from_date'])
+            now = 10_000 + 1000 * len(requested)
+            return utils.MockResponseGET(random_timestamp=now, data={
+                'homeworks': [], 'current_date': now,
+            })
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        tenant = tenants.Tenant('a', 'token', 1, timestamp=0)
+        engine = poller.Poller(MockBot(), [tenant])
+        for _ in range(3):
+            engine.poll_tenant(tenant)
+        assert requested == [
+            0, 11_000 - cursor.OVERLAP, 12_000 - cursor.OVERLAP,
+        ], 'from_date должен двигаться и без новых домашек.'
@@ -0,0 +1,36 @@
+from delivery import Deliveries
+
+
+class TestDeliveries:
+    def test_only_latest_status_is_saved(self):
+        deliveries = Deliveries()
+        reviewing = {'id': 1, 'status': 'reviewing'}
+        approved = {'id': 1, 'status': 'approved'}
+        first = deliveries.track(reviewing, None, 'на ревью')
+        second = deliveries.track(approved, 'reviewing', 'принята')
+        assert deliveries.unconfirmed() == [reviewing, approved]
+        assert deliveries.settle(second, True).latest
+        assert not deliveries.settle(first, True).latest, (
+            'Опоздавшее подтверждение не должно затирать новый статус.'
+        )
+        assert not len(deliveries) and deliveries.unconfirmed() == []
+
+    def test_dropped_wait_for_next_poll(self):
+        deliveries = Deliveries()
+        work = {'id': 1, 'status': 'approved'}
+        ticket = deliveries.track(work, 'reviewing', 'принята')
+        assert deliveries.settle(ticket, False) is None
+        assert deliveries.settle(ticket, True) is None
+        assert deliveries.unconfirmed() == [work], (
+            'Курсор не должен уйти дальше потерянного уведомления.'
+        )
+        [pending] = deliveries.take_dropped()
+        assert pending.previous == 'reviewing'
+        assert deliveries.unconfirmed() == []
+
+    def test_cancel(self):
+        deliveries = Deliveries()
+        work = {'id': 1, 'status': 'approved'}
+        ticket = deliveries.track(work, None, 'принята')
+        assert deliveries.cancel(ticket).homework is work
+        assert deliveries.take_dropped() == [] and not len(deliveries)
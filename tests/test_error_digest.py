@@ -0,0 +1,70 @@
+import pytest
+import requests
+
+import error_digest
+import metrics
+import poller
+import tenants
+from test_poller import MockBot
+
+
+class TestErrorDigest:
+    def test_first_error_then_one_digest_per_window(self):
+        digest = error_digest.ErrorDigest(
+            window=60, template='Ошибка: {error}'
+        )
+        assert digest.record('a', ValueError('one'), now=0) == 'Ошибка: one'
+        for now in range(1, 50):
+            assert digest.record('a', ValueError(f'#{now}'), now=now) is None
+        assert digest.check('a', now=59) is None
+        report = digest.check('a', now=60)
+        assert 'ValueError × 49: #1' in report
+        assert digest.check('a', now=61) is None, (
+            'Сводка за окно должна уходить один раз.'
+        )
+
+    def test_quiet_window_closes(self):
+        digest = error_digest.ErrorDigest(window=60)
+        digest.record('a', KeyError('x'), now=0)
+        assert digest.check('a', now=60) is None
+        assert digest.record('a', KeyError('x'), now=61) == "'x'", (
+            'После тихого окна ошибка снова сообщается сразу.'
+        )
+
+    def test_tenants_are_separate(self):
+        digest = error_digest.ErrorDigest(window=60)
+        assert digest.record('a', ValueError('x'), now=0) is not None
+        assert digest.record('b', ValueError('x'), now=0) is not None
+
+    def test_fingerprint_uses_stage_not_text(self):
+        with pytest.raises(ValueError) as first:
+            with metrics.stage('check_response', 'a'):
+                raise ValueError('headers - {"Authorization": "1"}')
+        second = ValueError('headers - {"Authorization": "2"}')
+        second.stage = 'check_response'
+        assert (
+            error_digest.fingerprint(first.value)
+            == error_digest.fingerprint(second)
+            == ('check_response', 'ValueError')
+        )
+
+
+class TestPollerErrors:
+    def test_differing_error_texts_sent_once(self, monkeypatch):
+        calls = iter(range(100))
+
+        def broken_get(*args, **kwargs):
+            raise requests.RequestException(f'boom {next(calls)}')
+
+        monkeypatch.setattr(requests, 'get', broken_get)
+        bot = MockBot()
+        tenant = tenants.Tenant('a', 'token', 1, timestamp=0)
+        engine = poller.Poller(bot, [tenant])
+        for _ in range(5):
+            engine.poll_tenant(tenant)
+        assert len(bot.sent) == 1, (
+            'Ошибки одного типа в окне не должны отправляться по одной.'
+        )
+        engine.errors.window = 0
+        engine.poll_tenant(tenant)
+        assert 'get_api_answer: ConnectionError' in bot.sent[-1][1]
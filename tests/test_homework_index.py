@@ -0,0 +1,99 @@
+import time
+
+import pytest
+
+from homework_index import MAX_STATUS_CODE, HomeworkIndex, StatusCodes
+
+
+class TestHomeworkIndex:
+    def test_every_transition_is_reported(self):
+        index = HomeworkIndex()
+        homeworks = [
+            {'id': 2, 'homework_name': 'hw2', 'status': 'reviewing'},
+            {'id': 1, 'homework_name': 'hw1', 'status': 'approved'},
+        ]
+        changes = index.changes(homeworks)
+        assert [homework['id'] for homework in changes] == [1, 2], (
+            'Должны приходить все изменения, от старых к новым.'
+        )
+        for homework in changes:
+            index.commit(homework)
+        assert index.changes(homeworks) == []
+        homeworks[0]['status'] = 'approved'
+        assert index.changes(homeworks) == [homeworks[0]]
+
+    def test_uncommitted_change_is_reported_again(self):
+        index = HomeworkIndex()
+        homeworks = [{'homework_name': 'hw1', 'status': 'approved'}]
+        assert index.changes(homeworks) == homeworks
+        assert index.changes(homeworks) == homeworks, (
+            'Неотправленное изменение не должно теряться.'
+        )
+
+    def test_diff_is_linear(self):
+        index = HomeworkIndex()
+        homeworks = [
+            {'id': number, 'status': 'approved'} for number in range(50000)
+        ]
+        for homework in homeworks:
+            index.commit(homework)
+        started = time.monotonic()
+        assert index.changes(homeworks) == []
+        assert time.monotonic() - started < 0.5
+
+    def test_ids_and_names_share_index(self):
+        index = HomeworkIndex()
+        index.restore(30, 'approved')
+        index.restore(10, 'reviewing')
+        index.restore('hw', 'rejected')
+        index.restore(2 ** 70, 'reviewing')
+        index.restore(10, 'approved')
+        assert list(index.ids) == [10, 30], (
+            'Целые id должны лежать в колонке по возрастанию.'
+        )
+        assert len(index) == 4
+        assert index.get(10) == 'approved'
+        assert index.get('hw') == 'rejected'
+        assert index.get(2 ** 70) == 'reviewing'
+        assert index.get(20) is None
+        assert 'hw' in index and 20 not in index
+        assert index.status_counts() == {'approved': 2, 'reviewing': 1,
+                                         'rejected': 1}
+
+    def test_has_status(self):
+        index = HomeworkIndex()
+        assert not index.has_status({'reviewing'})
+        index.restore(1, 'approved')
+        assert not index.has_status({'reviewing', 'never_seen_status'})
+        index.restore('hw', 'reviewing')
+        assert index.has_status({'reviewing'}), (
+            'Статус домашки без id тоже должен находиться.'
+        )
+
+    def test_revert_lost_notification(self):
+        index = HomeworkIndex()
+        index.restore(1, 'reviewing')
+        approved = {'id': 1, 'status': 'approved'}
+        index.commit(approved)
+        index.revert(approved, 'reviewing')
+        assert index.get(1) == 'reviewing'
+        named = {'homework_name': 'hw', 'status': 'approved'}
+        index.commit(named)
+        index.revert(named, None)
+        assert 'hw' not in index and len(index) == 1, (
+            'Домашка без прежнего статуса должна забываться.'
+        )
+        index.commit(approved)
+        index.revert({'id': 1, 'status': 'rejected'}, None)
+        assert index.get(1) == 'approved', (
+            'Более новый статус откатывать нельзя.'
+        )
+
+    def test_statuses_are_interned(self):
+        codes = StatusCodes()
+        assert codes.code('approved') == codes.code(''.join('approved'))
+        assert codes.name(codes.code('rejected')) == 'rejected'
+        for number in range(MAX_STATUS_CODE - 1):
+            codes.code(f'status{number}')
+        with pytest.raises(ValueError):
+            codes.code('one_too_many')
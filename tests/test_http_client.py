@@ -0,0 +1,65 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import homework
+import http_client
+
+
+class HomeworkHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = json.dumps({'homeworks': [], 'current_date': 1}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def local_endpoint(monkeypatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), HomeworkHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(
+        homework, 'ENDPOINT', f'http://127.0.0.1:{server.server_port}/'
+    )
+    yield
+    server.shutdown()
+    server.server_close()
+
+
+class TestHttpClient:
+    def test_connections_are_reused(self, local_endpoint):
+        client = http_client.HttpClient(pool_size=2)
+        for _ in range(5):
+            homework.get_tenant_api_answer('token', 0, client)
+        stats = client.stats()
+        client.close()
+        assert stats['requests'] == 5
+        assert stats['connections'] == 1, (
+            'Keep-alive соединение должно переиспользоваться.'
+        )
+        assert stats['reused'] == 4
+
+    def test_default_timeout_is_passed(self, monkeypatch):
+        calls = []
+
+        def mock_get(*args, **kwargs):
+            calls.append(kwargs)
+            raise requests.Timeout('slow')
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        with pytest.raises(ConnectionError):
+            homework.get_api_answer(0)
+        assert calls[0]['timeout'] == http_client.TIMEOUT, (
+            'Запрос к API должен идти с таймаутом.'
+        )
@@ -0,0 +1,81 @@
+import threading
+import time
+
+import pytest
+import requests
+
+import commands
+import jobs
+import poller
+import tenants
+import utils
+from benchmarks import run, stub_servers
+from test_poller import MockBot
+
+
+class QueuedDispatcher:
+    def __init__(self):
+        self.queue = []
+
+    def run_async(self, func, *args, **kwargs):
+        self.queue.append(lambda: func(*args, **kwargs))
+
+
+class TestDispatcherExecutor:
+    def test_result_and_error(self):
+        dispatcher = QueuedDispatcher()
+        executor = jobs.DispatcherExecutor(dispatcher)
+        ok = executor.submit(lambda x: x * 2, 21)
+        failed = executor.submit(lambda: 1 / 0)
+        for run in dispatcher.queue:
+            run()
+        assert ok.result() == 42
+        assert isinstance(failed.exception(), ZeroDivisionError)
+
+    def test_cancelled_task_is_skipped(self):
+        dispatcher = QueuedDispatcher()
+        calls = []
+        future = jobs.DispatcherExecutor(dispatcher).submit(calls.append, 1)
+        assert future.cancel()
+        dispatcher.queue[0]()
+        assert calls == [], 'Отменённый опрос не должен запускаться.'
+
+
+class TestJobQueue:
+    @pytest.mark.timeout(10)
+    def test_polls_in_dispatcher_threads(self, monkeypatch):
+        threads = []
+
+        def mock_get(*args, **kwargs):
+            threads.append(threading.current_thread().name)
+            return utils.MockResponseGET(random_timestamp=1, data={
+                'homeworks': [], 'current_date': 1000,
+            })
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        stub = stub_servers.TelegramStub(stub_servers.HomeworkModel()).start()
+        bot = commands.make_bot(
+            run.BOT_TOKEN, workers=2, base_url=stub.base_url
+        )
+        updater = commands.make_updater(bot, None, workers=2)
+        tenant = tenants.Tenant('ann', 'token', 1, timestamp=0)
+        engine = poller.Poller(MockBot(), [tenant])
+        executor = jobs.DispatcherExecutor(updater.dispatcher)
+        job = jobs.schedule(updater, engine, executor, interval=0.05)
+        # Без start_polling: Dispatcher и JobQueue, но не long polling.
+        threading.Thread(target=updater.dispatcher.start).start()
+        updater.job_queue.start()
+        try:
+            deadline = time.monotonic() + 1
+            while tenant.polled_at is None and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            job.schedule_removal()
+            updater.job_queue.stop()
+            engine.shutdown(executor)
+            updater.stop()
+            stub.stop()
+        assert tenant.polled_at is not None, 'Задача JobQueue должна опросить.'
+        assert threads[0].startswith('Bot:123456:worker:'), (
+            'Опрос должен идти в потоках Dispatcher.'
+        )
@@ -0,0 +1,108 @@
+import os
+import signal
+import threading
+import time
+
+import pytest
+import requests
+
+import lifecycle
+import poller
+import tenants
+import utils
+from test_poller import MockBot
+
+
+@pytest.fixture
+def restore_signals():
+    handlers = {
+        signum: signal.getsignal(signum)
+        for signum in (*lifecycle.STOP_SIGNALS, lifecycle.RELOAD_SIGNAL)
+        if signum is not None
+    }
+    yield
+    for signum, handler in handlers.items():
+        signal.signal(signum, handler)
+
+
+class TestLifecycle:
+    def test_stop_wakes_wait(self):
+        cycle = lifecycle.Lifecycle(shutdown_timeout=5)
+        threading.Timer(0.1, cycle.stop).start()
+        started = time.monotonic()
+        assert cycle.wait(10) is False
+        assert time.monotonic() - started < 1, (
+            'stop() должен будить ожидание сразу.'
+        )
+        assert 0 < cycle.remaining() <= 5
+
+    def test_sigterm_stops(self, restore_signals):
+        cycle = lifecycle.Lifecycle().install()
+        os.kill(os.getpid(), signal.SIGTERM)
+        assert cycle.wait(1) is False
+        assert cycle.stopping.is_set()
+
+    def test_reload_errors_are_logged(self, restore_signals):
+        calls = []
+
+        def reload():
+            calls.append(1)
+            raise ValueError('bad config')
+
+        cycle = lifecycle.Lifecycle(reload=reload).install()
+        os.kill(os.getpid(), lifecycle.RELOAD_SIGNAL)
+        assert cycle.wait(1) is True
+        cycle.maybe_reload()
+        cycle.maybe_reload()
+        assert calls == [1], 'Конфиг перечитывается один раз на сигнал.'
+
+
+class TestSignalExit:
+    def test_exit_waits_for_deferred_block(self):
+        exit = lifecycle.SignalExit()
+        done = []
+        with pytest.raises(SystemExit):
+            with exit.deferred():
+                exit.handle(signal.SIGTERM, None)
+                done.append(1)
+        assert done == [1], 'Отправка внутри deferred() должна доделаться.'
+
+    def test_exit_outside_deferred_block(self):
+        with pytest.raises(SystemExit):
+            lifecycle.SignalExit().handle(signal.SIGTERM, None)
+
+
+class TestPollerShutdown:
+    def test_run_stops_and_finishes_inflight_poll(self, monkeypatch):
+        started = threading.Event()
+
+        def slow_get(*args, **kwargs):
+            started.set()
+            time.sleep(0.3)
+            return utils.MockResponseGET(random_timestamp=7, data={
+                'homeworks': [], 'current_date': 7,
+            })
+
+        monkeypatch.setattr(requests, 'get', slow_get)
+        tenant = tenants.Tenant('a', 'token', 1, timestamp=0)
+        cycle = lifecycle.Lifecycle(shutdown_timeout=1)
+        engine = poller.Poller(MockBot(), [tenant], lifecycle=cycle)
+        thread = threading.Thread(target=engine.run)
+        thread.start()
+        assert started.wait(1)
+        cycle.stop()
+        thread.join(1.5)
+        assert not thread.is_alive(), 'Цикл должен остановиться по stop().'
+        assert tenant.next_poll_at != 0, 'Начатый опрос должен доделаться.'
+
+    def test_update_tenants_keeps_state(self):
+        old = tenants.Tenant('a', 'token', 1, timestamp=5)
+        engine = poller.Poller(MockBot(), [old])
+        engine.update_tenants([
+            tenants.Tenant('a', 'new-token', 1),
+            tenants.Tenant('b', 'token', 2),
+        ])
+        assert [tenant.name for tenant in engine.tenants] == ['a', 'b']
+        assert engine.tenants[0] is old
+        assert old.timestamp == 5
+        assert old.practicum_token == 'new-token'
@@ -0,0 +1,50 @@
+import logging
+
+import pytest
+
+import homework
+
+
+@pytest.fixture
+def clean_root_logger():
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield root
+    for handler in root.handlers:
+        handler.close()
+    root.handlers[:] = handlers
+    root.setLevel(level)
+
+
+class Unformattable:
+    def __str__(self):
+        raise AssertionError(
+            'Аргументы лога не должны форматироваться в потоке опроса.'
+        )
+
+
+class TestQueuedLogging:
+    def test_records_are_written_by_listener(self, tmp_path,
+                                             clean_root_logger):
+        log_file = tmp_path / 'bot.log'
+        clean_root_logger.handlers.clear()
+        listener = homework.setup_logging(log_file, queued=True)
+        logging.info(homework.MESSAGE_SENT_LOGS, 'привет')
+        listener.stop()
+        assert 'Сообщение успешно отправлено. привет' in log_file.read_text(
+            encoding='utf-8'
+        )
+
+    def test_prepare_keeps_arguments(self):
+        handler = homework.LazyQueueHandler(None)
+        record = logging.LogRecord(
+            'root', logging.DEBUG, __file__, 1,
+            homework.MESSAGE_SENT_LOGS, (Unformattable(),), None,
+        )
+        prepared = handler.prepare(record)
+        assert prepared.msg == homework.MESSAGE_SENT_LOGS
+        assert isinstance(prepared.args[0], Unformattable)
+
+    def test_disabled_debug_is_not_formatted(self, caplog):
+        with caplog.at_level(logging.INFO):
+            logging.debug(homework.MESSAGE_SENT_LOGS, Unformattable())
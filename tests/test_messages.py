@@ -0,0 +1,93 @@
+import json
+import os
+
+import pytest
+
+import homework
+import messages
+
+
+@pytest.fixture
+def locales(tmp_path):
+    (tmp_path / 'en.json').write_text(json.dumps({
+        'status_message': 'Homework "{homework_name}": {verdict}',
+        'verdicts': {'approved': 'approved {ok}'},
+    }), encoding='utf-8')
+    (tmp_path / 'broken.json').write_text('{', encoding='utf-8')
+    return tmp_path
+
+
+class TestCompileTemplate:
+    @pytest.mark.parametrize('template', [
+        'Работа "{homework_name}". {verdict}',
+        '{{{homework_name}}} {verdict}',
+        '{verdict}',
+        '{homework_name!r:>20} {verdict}',
+        '{homework_name} {homework_name} {verdict}',
+    ])
+    def test_same_as_format(self, template):
+        verdict = 'Вердикт с {скобками}'
+        render = messages.compile_template(template, verdict=verdict)
+        assert render(homework_name='hw') == template.format(
+            homework_name='hw', verdict=verdict
+        ), 'Скомпилированный шаблон должен давать тот же текст, что format.'
+
+
+class TestMessages:
+    def test_default_locale_matches_parse_status(self):
+        work = {'homework_name': 'hw', 'status': 'approved'}
+        assert homework.MESSAGES.status(work) == (
+            homework.STATUS_MESSAGE.format(
+                homework_name='hw',
+                verdict=homework.HOMEWORK_VERDICTS['approved'],
+            )
+        )
+
+    def test_locale_falls_back_to_default(self, locales):
+        catalog = messages.Messages(
+            homework.STATUS_MESSAGE, homework.HOMEWORK_VERDICTS,
+            directory=locales,
+        )
+        approved = {'homework_name': 'hw', 'status': 'approved'}
+        rejected = {'homework_name': 'hw', 'status': 'rejected'}
+        assert catalog.status(approved, 'en') == 'Homework "hw": approved {ok}'
+        assert catalog.status(rejected, 'en') == (
+            'Homework "hw": ' + homework.HOMEWORK_VERDICTS['rejected']
+        ), 'Вердикта нет в файле языка: берётся вердикт по умолчанию.'
+        for locale in ('broken', 'missing', '../en'):
+            assert catalog.status(approved, locale) == (
+                catalog.status(approved)
+            ), f'Язык {locale} без шаблонов должен писать по умолчанию.'
+
+    def test_locale_is_loaded_once(self, locales, monkeypatch):
+        loads = []
+        load_catalog = messages.load_catalog
+
+        def counting_load(path, default):
+            loads.append(path)
+            return load_catalog(path, default)
+
+        monkeypatch.setattr(messages, 'load_catalog', counting_load)
+        catalog = messages.Messages(
+            homework.STATUS_MESSAGE, homework.HOMEWORK_VERDICTS,
+            directory=locales, cache_size=2,
+        )
+        for number in range(10):
+            catalog.status(
+                {'homework_name': f'hw{number}', 'status': 'approved'}, 'en'
+            )
+        assert len(loads) == 1, 'Шаблоны языка нужно читать один раз.'
+        info = catalog.render.cache_info()
+        assert info.currsize == 2, 'Кэш текстов должен быть ограничен.'
+
+    def test_shipped_locales_are_complete(self):
+        for path in sorted(os.listdir(messages.LOCALES_DIR)):
+            with open(os.path.join(messages.LOCALES_DIR, path),
+                      encoding='utf-8') as file:
+                data = json.load(file)
+            assert set(data['verdicts']) == set(homework.HOMEWORK_VERDICTS), (
+                f'В {path} должны быть вердикты для всех статусов.'
+            )
+            messages.compile_template(data['status_message'], verdict='')(
+                homework_name='hw'
+            )
@@ -0,0 +1,65 @@
+import urllib.request
+
+import pytest
+
+import metrics
+
+
+@pytest.fixture
+def registry():
+    return metrics.Registry()
+
+
+class TestMetrics:
+    def test_histogram_text(self, registry):
+        histogram = metrics.Histogram(
+            'stage_seconds', 'Стадия', ('stage',), buckets=(0.1, 1),
+            registry=registry,
+        )
+        child = histogram.labels('get_api_answer')
+        for value in (0.05, 0.1, 0.5, 3):
+            child.observe(value)
+        text = registry.render()
+        bucket = 'stage_seconds_bucket{stage="get_api_answer",le="%s"} %d'
+        assert bucket % ('0.1', 2) in text
+        assert bucket % ('1', 3) in text
+        assert bucket % ('+Inf', 4) in text
+        assert 'stage_seconds_count{stage="get_api_answer"} 4' in text
+        assert '# TYPE stage_seconds histogram' in text
+
+    def test_counter_and_gauge(self, registry):
+        counter = metrics.Counter(
+            'failures_total', 'Ошибки', ('tenant',), registry=registry
+        )
+        counter.labels('a"b').inc()
+        counter.labels('a"b').inc(2)
+        gauge = metrics.Gauge('pending', 'Очередь', registry=registry)
+        gauge.set_function(lambda: 7)
+        text = registry.render()
+        assert 'failures_total{tenant="a\\"b"} 3' in text
+        assert 'pending 7' in text
+
+    def test_stage_counts_failures(self):
+        with pytest.raises(ValueError):
+            with metrics.stage('parse_status', 'test-tenant'):
+                raise ValueError('unknown status')
+        failures = metrics.STAGE_FAILURES.labels('parse_status', 'test-tenant')
+        assert failures.get() >= 1
+        counts, _ = metrics.STAGE_SECONDS.labels(
+            'parse_status', 'test-tenant'
+        ).snapshot()
+        assert counts[-1] >= 1
+
+    def test_endpoint_serves_text(self, registry):
+        metrics.Gauge('up', 'Жив', registry=registry).set(1)
+        server = metrics.serve(port=0, registry=registry)
+        try:
+            url = f'http://127.0.0.1:{server.server_port}/metrics'
+            with urllib.request.urlopen(url, timeout=1) as response:
+                body = response.read().decode()
+                content_type = response.headers['Content-Type']
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert 'up 1' in body
+        assert content_type.startswith('text/plain')
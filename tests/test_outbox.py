@@ -0,0 +1,110 @@
+import threading
+import time
+
+from telegram.error import BadRequest, RetryAfter
+
+import outbox
+
+
+class RecordingBot:
+    def __init__(self, failures=(), delay=0):
+        self.failures = list(failures)
+        self.delay = delay
+        self.sent = []
+        self.done = threading.Event()
+        self.expected = None
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        time.sleep(self.delay)
+        if self.failures:
+            raise self.failures.pop(0)
+        self.sent.append((time.monotonic(), chat_id, text))
+        if self.expected and len(self.sent) >= self.expected:
+            self.done.set()
+
+
+class TestTokenBucket:
+    def test_bucket_limits_rate(self):
+        bucket = outbox.TokenBucket(rate=2)
+        now = bucket.updated
+        bucket.take(now)
+        bucket.take(now)
+        assert bucket.delay(now) == 0.5
+        assert bucket.delay(now + 0.5) == 0
+
+
+class TestOutbox:
+    def test_put_does_not_wait_for_telegram(self):
+        bot = RecordingBot(delay=0.3)
+        sender = outbox.Outbox(bot).start()
+        started = time.monotonic()
+        assert sender.put(1, 'a')
+        assert sender.put(2, 'b')
+        assert time.monotonic() - started < 0.1, (
+            'Постановка в очередь не должна ждать Telegram.'
+        )
+        sender.stop(timeout=1.5)
+        assert len(bot.sent) == 2
+
+    def test_retry_after_reschedules(self):
+        bot = RecordingBot(failures=[RetryAfter(0.2)])
+        bot.expected = 1
+        sender = outbox.Outbox(bot, chat_rate=10).start()
+        started = time.monotonic()
+        sender.put(1, 'hello')
+        assert bot.done.wait(1), 'Сообщение после RetryAfter не отправлено.'
+        assert bot.sent[0][0] - started >= 0.2
+        assert sender.retried == 1
+        sender.stop(timeout=0.5)
+
+    def test_bad_request_is_dropped(self):
+        bot = RecordingBot(failures=[BadRequest('chat not found')])
+        sender = outbox.Outbox(bot).start()
+        sender.put(1, 'hello')
+        sender.stop(timeout=1)
+        assert sender.dropped == 1 and not bot.sent
+
+    def test_done_reports_outcome(self):
+        bot = RecordingBot(failures=[BadRequest('chat not found')])
+        sender = outbox.Outbox(bot).start()
+        outcomes = []
+        sender.put(1, 'lost', done=lambda delivered: outcomes.append(
+            ('lost', delivered)
+        ))
+        sender.put(2, 'sent', done=lambda delivered: outcomes.append(
+            ('sent', delivered)
+        ))
+        sender.stop(timeout=1)
+        assert sorted(outcomes) == [('lost', False), ('sent', True)], (
+            'Исход каждого сообщения должен сообщаться через done.'
+        )
+
+    def test_unsent_at_deadline_are_reported(self):
+        bot = RecordingBot(delay=0.3)
+        sender = outbox.Outbox(bot).start()
+        outcomes = []
+        for number in range(3):
+            sender.put(number, str(number), done=outcomes.append)
+        sender.stop(timeout=0.1)
+        sender.thread.join(1)
+        assert sorted(outcomes) == [False, False, True], (
+            'Не отправленные к сроку сообщения должны сообщить done(False).'
+        )
+        assert sender.dropped == 2
+
+    def test_per_chat_rate_limit(self):
+        bot = RecordingBot()
+        bot.expected = 6
+        sender = outbox.Outbox(bot, chat_rate=4).start()
+        for number in range(6):
+            sender.put(1, str(number))
+        assert bot.done.wait(1.5)
+        first, last = bot.sent[0][0], bot.sent[-1][0]
+        assert last - first >= 0.4, 'Лимит на чат не соблюдается.'
+        assert [text for _, _, text in bot.sent] == list('012345')
+        sender.stop(timeout=0.5)
+
+    def test_full_queue_rejects(self):
+        sender = outbox.Outbox(RecordingBot(), maxsize=1)
+        assert sender.put(1, 'a')
+        assert not sender.put(1, 'b', timeout=0)
@@ -0,0 +1,292 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+from telegram.error import NetworkError
+
+import cursor
+import homework
+import outbox
+import poller
+import retry
+import storage
+import tenants
+import utils
+
+
+class MockBot:
+    def __init__(self):
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        with self.lock:
+            self.sent.append((chat_id, text))
+
+
+class TestTenants:
+    def test_load_tenants(self, tmp_path):
+        path = tmp_path / 'tenants.json'
+        path.write_text(json.dumps([
+            {'name': 'ann', 'practicum_token': 't1', 'chat_id': 1},
+            {'practicum_token': 't2', 'chat_id': 2, 'locale': 'en'},
+        ]))
+        registry = tenants.load_tenants(path)
+        assert [tenant.name for tenant in registry] == ['ann', '2']
+        assert registry[1].practicum_token == 't2'
+        assert [tenant.locale for tenant in registry] == ['ru', 'en']
+        assert registry[0].last_message is None
+
+    @pytest.mark.parametrize('config', [
+        {'practicum_token': 't1', 'chat_id': 1},
+        [{'practicum_token': 't1'}],
+        [{'practicum_token': 't1', 'chat_id': 1},
+         {'practicum_token': 't2', 'chat_id': 1}],
+    ])
+    def test_parse_invalid_tenants(self, config):
+        with pytest.raises((TypeError, KeyError, ValueError)):
+            tenants.parse_tenants(config)
+
+
+class TestPoller:
+    def make_tenants(self, count):
+        return [
+            tenants.Tenant(str(index), f'token{index}', index, timestamp=0)
+            for index in range(count)
+        ]
+
+    def test_each_tenant_gets_own_state(self, monkeypatch):
+        def mock_get(url, headers=None, params=None, **kwargs):
+            token = headers['Authorization'].split()[1]
+            return utils.MockResponseGET(random_timestamp=1000, data={
+                'homeworks': [{'homework_name': token, 'status': 'approved'}],
+                'current_date': 1000,
+            })
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        bot = MockBot()
+        registry = self.make_tenants(3)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            poller.Poller(bot, registry, max_workers=2).poll_once(executor)
+        assert sorted(chat_id for chat_id, _ in bot.sent) == [0, 1, 2], (
+            'Каждый подписчик должен получить своё сообщение.'
+        )
+        for tenant in registry:
+            assert tenant.timestamp == 1000 - cursor.OVERLAP
+            assert f'"token{tenant.chat_id}"' in tenant.last_message
+
+    def test_tenants_polled_concurrently(self, monkeypatch):
+        delay = 0.2
+
+        def slow_get(*args, **kwargs):
+            time.sleep(delay)
+            return utils.MockResponseGET(random_timestamp=1)
+
+        monkeypatch.setattr(requests, 'get', slow_get)
+        registry = self.make_tenants(8)
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            poller.Poller(MockBot(), registry, 8).poll_once(executor)
+        assert time.monotonic() - started < delay * 3, (
+            'Подписчики должны опрашиваться параллельно.'
+        )
+
+    def test_error_goes_to_tenant_chat(self, monkeypatch):
+        def broken_get(*args, **kwargs):
+            raise requests.RequestException('boom')
+
+        monkeypatch.setattr(requests, 'get', broken_get)
+        bot = MockBot()
+        tenant = self.make_tenants(1)[0]
+        engine = poller.Poller(bot, [tenant])
+        engine.poll_tenant(tenant)
+        engine.poll_tenant(tenant)
+        assert len(bot.sent) == 1, (
+            'Одинаковая ошибка не должна отправляться повторно.'
+        )
+
+    def test_all_changed_homeworks_are_sent(self, monkeypatch):
+        def mock_get(*args, **kwargs):
+            return utils.MockResponseGET(random_timestamp=5, data={
+                'homeworks': [
+                    {'id': 2, 'homework_name': 'hw2', 'status': 'approved'},
+                    {'id': 1, 'homework_name': 'hw1', 'status': 'rejected'},
+                ],
+                'current_date': 5,
+            })
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        bot = MockBot()
+        tenant = self.make_tenants(1)[0]
+        engine = poller.Poller(bot, [tenant])
+        engine.poll_tenant(tenant)
+        engine.poll_tenant(tenant)
+        assert len(bot.sent) == 2, (
+            'Нужно уведомить о каждой изменившейся домашке ровно один раз.'
+        )
+        assert tenant.homeworks.get(1) == 'rejected'
+
+    def test_message_in_tenant_locale(self, monkeypatch):
+        def mock_get(*args, **kwargs):
+            return utils.MockResponseGET(random_timestamp=5, data={
+                'homeworks': [
+                    {'id': 1, 'homework_name': 'hw1', 'status': 'approved'},
+                ],
+                'current_date': 5,
+            })
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        bot = MockBot()
+        tenant = tenants.Tenant('en', 'token', 1, timestamp=0, locale='en')
+        poller.Poller(bot, [tenant]).poll_tenant(tenant)
+        assert bot.sent == [(1, homework.MESSAGES.status(
+            {'homework_name': 'hw1', 'status': 'approved'}, 'en'
+        ))]
+        assert 'Homework "hw1"' in bot.sent[0][1], (
+            'Уведомление должно прийти на языке подписчика.'
+        )
+
+    def test_bad_homework_does_not_block_others(self, monkeypatch):
+        def mock_get(*args, **kwargs):
+            return utils.MockResponseGET(random_timestamp=5, data={
+                'homeworks': [
+                    {'id': 3, 'homework_name': 'hw3', 'status': 'unknown'},
+                    {'id': 2, 'homework_name': 'hw2'},
+                    {'id': 1, 'homework_name': 'hw1', 'status': 'approved'},
+                ],
+                'current_date': 5,
+            })
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        bot = MockBot()
+        tenant = self.make_tenants(1)[0]
+        engine = poller.Poller(bot, [tenant])
+        engine.poll_tenant(tenant)
+        assert tenant.homeworks.get(1) == 'approved', (
+            'Годные домашки нужно обработать, даже если в ответе есть плохие.'
+        )
+        assert len(bot.sent) == 2
+        assert 'hw1' in bot.sent[0][1]
+        assert 'Домашек с ошибками в ответе API: 2' in bot.sent[1][1]
+
+    def test_only_due_tenants_are_submitted(self, monkeypatch):
+        monkeypatch.setattr(
+            requests, 'get',
+            lambda *args, **kwargs: utils.MockResponseGET(random_timestamp=1)
+        )
+        registry = self.make_tenants(3)
+        registry[2].next_poll_at = time.monotonic() + 100
+        engine = poller.Poller(MockBot(), registry)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            assert engine.submit_due(executor) == 2
+        assert all(
+            tenant.next_poll_at > time.monotonic() for tenant in registry
+        ), 'После опроса подписчик должен получить новое время опроса.'
+        assert 0 < engine.sleep_time() <= poller.MAX_TICK
+
+    def test_lag_is_measured_from_due_time(self, monkeypatch):
+        monkeypatch.setattr(
+            requests, 'get',
+            lambda *args, **kwargs: utils.MockResponseGET(random_timestamp=1)
+        )
+        tenant = self.make_tenants(1)[0]
+        engine = poller.Poller(MockBot(), [tenant])
+        engine.poll_tenant(tenant, due_at=time.monotonic() - 5)
+        assert 5 <= engine.lag < 6
+
+    def test_removed_tenants_are_not_polled(self):
+        registry = self.make_tenants(2)
+        engine = poller.Poller(MockBot(), registry)
+        engine.update_tenants(registry[:1])
+        due = engine.queue.pop_due(time.monotonic())
+        assert [tenant for tenant, _ in due] == registry[:1]
+
+
+class FlakyBot(MockBot):
+    def __init__(self):
+        super().__init__()
+        self.broken = True
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        if self.broken:
+            raise NetworkError('Telegram недоступен')
+        super().send_message(chat_id=chat_id, text=text)
+
+
+def wait_for(condition, timeout=1):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class TestOutboxDelivery:
+    UPDATED = '2023-01-01T00:00:00Z'
+    UPDATED_AT = 1672531200
+
+    def make_engine(self, monkeypatch, bot, store=None, start=True):
+        monkeypatch.setattr(
+            requests, 'get',
+            lambda *args, **kwargs: utils.MockResponseGET(data={
+                'homeworks': [{
+                    'id': 7, 'homework_name': 'hw7', 'status': 'approved',
+                    'date_updated': self.UPDATED,
+                }],
+                'current_date': self.UPDATED_AT + 3600,
+            })
+        )
+        sender = outbox.Outbox(
+            bot, chat_rate=1000,
+            retry_policy=retry.RetryPolicy(base=0.001, cap=0.001),
+            breaker=retry.CircuitBreaker('Telegram', failure_threshold=100),
+        )
+        if start:
+            sender.start()
+        tenant = tenants.Tenant('ann', 'token', 1, timestamp=0)
+        engine = poller.Poller(bot, [tenant], outbox=sender, store=store)
+        return engine, sender, tenant
+
+    def test_dropped_notification_is_sent_again(self, monkeypatch, tmp_path):
+        bot = FlakyBot()
+        store = storage.StateStore(tmp_path / 'state.db')
+        engine, sender, tenant = self.make_engine(monkeypatch, bot, store)
+        engine.poll_tenant(tenant)
+        assert wait_for(lambda: sender.dropped == 1)
+        assert tenant.timestamp <= self.UPDATED_AT - cursor.OVERLAP, (
+            'Курсор не должен пропускать неподтверждённое уведомление.'
+        )
+        store.flush()
+        restarted = tenants.Tenant('ann', 'token', 1, timestamp=0)
+        store.load([restarted])
+        assert 7 not in restarted.homeworks, (
+            'Статус неотправленного уведомления не должен сохраняться.'
+        )
+        bot.broken = False
+        engine.poll_tenant(tenant)
+        assert wait_for(lambda: len(bot.sent) == 1), (
+            'Потерянное outbox уведомление должно уйти в следующем опросе.'
+        )
+        assert wait_for(lambda: not len(tenant.deliveries))
+        engine.poll_tenant(tenant)
+        sender.stop(timeout=1)
+        assert len(bot.sent) == 1, 'Отправленное не должно повторяться.'
+        assert tenant.timestamp == self.UPDATED_AT + 3600 - cursor.OVERLAP
+        store.close()
+        restarted = tenants.Tenant('ann', 'token', 1, timestamp=0)
+        storage.StateStore(tmp_path / 'state.db').load([restarted])
+        assert restarted.homeworks.get(7) == 'approved'
+
+    def test_in_flight_notification_is_not_repeated(self, monkeypatch):
+        bot = MockBot()
+        engine, sender, tenant = self.make_engine(
+            monkeypatch, bot, start=False
+        )
+        engine.poll_tenant(tenant)
+        engine.poll_tenant(tenant)
+        assert sender.queue.qsize() == 1, (
+            'Пока уведомление в очереди, о домашке не уведомляем снова.'
+        )
+        assert len(tenant.deliveries) == 1
@@ -0,0 +1,108 @@
+import threading
+import time
+
+import pytest
+import requests
+
+import poller
+import response_cache
+import tenants
+import utils
+from test_poller import MockBot
+
+
+class CountingFetch:
+    def __init__(self, delay=0, error=None):
+        self.delay = delay
+        self.error = error
+        self.calls = []
+
+    def __call__(self, token, from_date):
+        self.calls.append((token, from_date))
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return {'homeworks': [], 'current_date': from_date}
+
+
+class TestResponseCache:
+    def test_same_bucket_shares_response(self):
+        cache = response_cache.ResponseCache(ttl=60, bucket=300)
+        fetch = CountingFetch()
+        cache.get('token', 301, fetch)
+        cache.get('token', 599, fetch)
+        cache.get('other', 301, fetch)
+        assert fetch.calls == [('token', 300), ('other', 300)], (
+            'Запрос должен уходить с началом корзины from_date.'
+        )
+        assert cache.stats() == dict(hits=1, misses=2, coalesced=0)
+
+    def test_ttl_expires(self):
+        cache = response_cache.ResponseCache(ttl=0.05)
+        fetch = CountingFetch()
+        cache.get('token', 0, fetch)
+        time.sleep(0.1)
+        cache.get('token', 0, fetch)
+        assert len(fetch.calls) == 2
+
+    def test_lru_eviction(self):
+        cache = response_cache.ResponseCache(ttl=60, maxsize=2)
+        fetch = CountingFetch()
+        for token in ('a', 'b', 'a', 'c'):
+            cache.get(token, 0, fetch)
+        assert len(cache) == 2
+        cache.get('a', 0, fetch)
+        cache.get('b', 0, fetch)
+        assert [token for token, _ in fetch.calls] == ['a', 'b', 'c', 'b'], (
+            'Вытесняться должен давно не использованный ответ.'
+        )
+
+    def test_concurrent_callers_share_one_request(self):
+        cache = response_cache.ResponseCache(ttl=60)
+        fetch = CountingFetch(delay=0.2)
+        threads = [
+            threading.Thread(target=cache.get, args=('token', 0, fetch))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(fetch.calls) == 1
+        assert cache.stats()['coalesced'] == 4
+
+    def test_errors_are_not_cached(self):
+        cache = response_cache.ResponseCache(ttl=60)
+        fetch = CountingFetch(error=ConnectionError('down'))
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                cache.get('token', 0, fetch)
+        assert len(fetch.calls) == 2
+        assert len(cache) == 0
+
+
+class TestPollerCache:
+    def test_tenants_with_one_token_share_request(self, monkeypatch):
+        calls = []
+
+        def mock_get(*args, **kwargs):
+            calls.append(kwargs['params']['from_date'])
+            return utils.MockResponseGET(random_timestamp=1, data={
+                'homeworks': [{'id': 1, 'homework_name': 'hw',
+                               'status': 'approved'}],
+                'current_date': 1000,
+            })
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        bot = MockBot()
+        registry = [
+            tenants.Tenant(name, 'shared', chat_id, timestamp=0)
+            for name, chat_id in (('student', 1), ('mentor', 2))
+        ]
+        engine = poller.Poller(
+            bot, registry, cache=response_cache.ResponseCache(ttl=60)
+        )
+        for tenant in registry:
+            engine.poll_tenant(tenant)
+        assert calls == [0]
+        assert sorted(chat_id for chat_id, _ in bot.sent) == [1, 2]
@@ -0,0 +1,82 @@
+import pytest
+import requests
+from telegram.error import BadRequest, TimedOut
+
+import local_exceptions
+import poller
+import retry
+import tenants
+import utils
+from clock import VirtualClock
+
+
+class TestClassify:
+    @pytest.mark.parametrize('error, kind', [
+        (ConnectionError('down'), retry.TRANSIENT),
+        (local_exceptions.Not200Error('500', status_code=500),
+         retry.TRANSIENT),
+        (local_exceptions.Not200Error('401', status_code=401),
+         retry.PERMANENT),
+        (local_exceptions.APIErrorKeyError('code'), retry.PERMANENT),
+        (TimedOut(), retry.TRANSIENT),
+        (BadRequest('chat not found'), retry.PERMANENT),
+        (KeyError('homeworks'), retry.UNKNOWN),
+    ])
+    def test_classify(self, error, kind):
+        assert retry.classify(error) == kind
+
+    def test_full_jitter_bounds(self):
+        policy = retry.RetryPolicy(base=1, cap=8, permanent_delay=100)
+        for attempt in range(6):
+            delay = policy.delay(attempt, ConnectionError())
+            assert 0 <= delay <= min(8, 2 ** attempt)
+        assert policy.delay(0, local_exceptions.APIErrorKeyError()) == 100
+
+
+class TestCircuitBreaker:
+    def test_opens_and_half_opens(self):
+        clock = VirtualClock()
+        breaker = retry.CircuitBreaker(
+            'api', failure_threshold=2, reset_timeout=10, clock=clock
+        )
+        for _ in range(2):
+            assert breaker.allow()
+            breaker.record(ConnectionError())
+        assert not breaker.allow(), 'Размыкатель должен разомкнуться.'
+        with pytest.raises(local_exceptions.CircuitOpenError):
+            breaker.check()
+        clock.sleep(10)
+        assert breaker.allow(), 'После паузы нужен пробный запрос.'
+        assert not breaker.allow(), 'Пробный запрос должен быть один.'
+        breaker.record()
+        assert breaker.state == retry.CLOSED and breaker.allow()
+
+    def test_permanent_errors_do_not_open(self):
+        breaker = retry.CircuitBreaker('api', failure_threshold=1)
+        breaker.record(local_exceptions.APIErrorKeyError('bad token'))
+        assert breaker.allow()
+
+
+class TestPollerBreaker:
+    def test_open_breaker_stops_requests(self, monkeypatch):
+        calls = []
+
+        def broken_get(*args, **kwargs):
+            calls.append(1)
+            raise requests.ConnectionError('down')
+
+        monkeypatch.setattr(requests, 'get', broken_get)
+        bot = utils.MockTelegramBot()
+        registry = [
+            tenants.Tenant(str(number), 'token', number, timestamp=0)
+            for number in range(5)
+        ]
+        engine = poller.Poller(
+            bot, registry,
+            breaker=retry.CircuitBreaker('api', failure_threshold=2),
+        )
+        for tenant in registry:
+            engine.poll_tenant(tenant)
+        assert len(calls) == 2, (
+            'После размыкания запросы к API отправляться не должны.'
+        )
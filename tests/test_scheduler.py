@@ -0,0 +1,137 @@
+import pytest
+
+import local_exceptions
+import retry
+import scheduler
+import tenants
+
+
+@pytest.fixture
+def tenant():
+    return tenants.Tenant('ann', 'token', 1, timestamp=0)
+
+
+@pytest.fixture
+def adaptive():
+    return scheduler.AdaptiveScheduler(
+        period=600, min_period=60, max_period=3600, jitter=0
+    )
+
+
+class TestAdaptiveScheduler:
+    def test_reviewing_is_polled_often(self, tenant, adaptive):
+        work = {'id': 1, 'status': 'reviewing'}
+        tenant.homeworks.commit(work)
+        assert adaptive.next_interval(tenant, [work], None) == 60
+
+    def test_long_review_backs_off_to_period(self, tenant, adaptive):
+        work = {'id': 1, 'status': 'reviewing'}
+        tenant.homeworks.commit(work)
+        intervals = [adaptive.next_interval(tenant, [work], None)] + [
+            adaptive.next_interval(tenant, [], None) for _ in range(10)
+        ]
+        assert intervals == sorted(intervals), (
+            'Пока ревью затягивается, опрашивать нужно всё реже.'
+        )
+        assert intervals[0] == 60 and intervals[-1] == 600, (
+            'Пока статус может измениться, реже period не опрашиваем.'
+        )
+
+    def test_rejected_is_polled_every_period(self, tenant, adaptive):
+        work = {'id': 1, 'status': 'rejected'}
+        tenant.homeworks.commit(work)
+        assert {
+            adaptive.next_interval(tenant, [], None) for _ in range(10)
+        } == {600}, 'Доработку отправят в любой момент: ждём не дольше period.'
+
+    def test_idle_interval_grows_to_max(self, tenant, adaptive):
+        intervals = [
+            adaptive.next_interval(tenant, [], None) for _ in range(10)
+        ]
+        assert intervals == sorted(intervals), (
+            'Без изменений интервал опроса должен расти.'
+        )
+        assert intervals[0] > 600 and intervals[-1] == 3600
+
+    def test_errors_use_retry_policy(self, tenant, adaptive):
+        for attempt in range(3):
+            interval = adaptive.next_interval(
+                tenant, [], ConnectionError('down')
+            )
+            assert 0 <= interval <= retry.RETRY_BASE * 2 ** attempt, (
+                'Временную ошибку нужно повторять с растущей задержкой.'
+            )
+        error = local_exceptions.APIErrorKeyError('not_authenticated')
+        assert adaptive.next_interval(tenant, [], error) == 3600, (
+            'Постоянную ошибку не нужно повторять часто.'
+        )
+        work = {'id': 1, 'status': 'approved'}
+        tenant.homeworks.commit(work)
+        assert adaptive.next_interval(tenant, [work], None) == 600
+        assert adaptive.states[tenant.name].errors == 0
+
+    def test_jitter_stays_in_bounds(self, tenant):
+        schedule = scheduler.AdaptiveScheduler(
+            period=600, min_period=500, max_period=700, jitter=0.5
+        )
+        for _ in range(100):
+            assert 500 <= schedule.next_interval(tenant, [], None) <= 700
+
+
+class TestPollMetrics:
+    def test_latency_and_call_rate(self):
+        metrics = scheduler.PollMetrics()
+        metrics.started = 0
+        updated = scheduler.updated_at(
+            {'date_updated': '1970-01-02T00:00:00Z'}
+        )
+        metrics.record_poll([{'date_updated': '1970-01-02T00:00:00Z'}],
+                            now=updated + 30)
+        metrics.record_poll([{'homework_name': 'no date'}])
+        snapshot = metrics.snapshot(now=scheduler.SECONDS_PER_DAY * 2)
+        assert snapshot['api_calls'] == 2
+        assert snapshot['api_calls_per_day'] == 1
+        assert snapshot['avg_notification_latency'] == 30
+
+
+class TestPollQueue:
+    def test_pops_due_in_order_and_skips_stale(self):
+        queue = scheduler.PollQueue()
+        registry = [
+            tenants.Tenant(name, 'token', 1) for name in ('a', 'b', 'c')
+        ]
+        for tenant, poll_at in zip(registry, (3, 1, 2)):
+            tenant.next_poll_at = poll_at
+            queue.push(tenant)
+        registry[2].next_poll_at = 10
+        queue.push(registry[2])
+        assert queue.next_poll_at() == 1
+        due = queue.pop_due(5)
+        assert [(tenant.name, at) for tenant, at in due] == [
+            ('b', 1), ('a', 3)
+        ], 'Устаревшая запись подписчика c не должна попадать в опрос.'
+        assert all(tenant.next_poll_at == float('inf') for tenant, _ in due)
+        assert queue.next_poll_at() == 10
+
+
+class TestFirstInterval:
+    def test_phases_are_stable_and_spread(self):
+        fixed = scheduler.FixedScheduler(period=600)
+        registry = [
+            tenants.Tenant(f'tenant{index}', 'token', index)
+            for index in range(1000)
+        ]
+        offsets = [fixed.first_interval(tenant, 1000) for tenant in registry]
+        assert offsets == [
+            fixed.first_interval(tenant, 1000) for tenant in registry
+        ], 'Сдвиг подписчика должен быть постоянным.'
+        per_minute = [0] * 10
+        for offset in offsets:
+            assert 0 <= offset < 600
+            per_minute[int(offset // 60)] += 1
+        assert max(per_minute) < 2 * min(per_minute), (
+            'Первые опросы должны распределяться по периоду равномерно.'
+        )
+
+    def test_single_tenant_is_polled_at_once(self, tenant):
+        assert scheduler.FixedScheduler().first_interval(tenant, 1) == 0
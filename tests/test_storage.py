@@ -0,0 +1,72 @@
+import sqlite3
+
+import storage
+import tenants
+
+
+def make_tenant():
+    return tenants.Tenant('ann', 'token', 1, timestamp=100)
+
+
+class TestStateStore:
+    def test_state_survives_restart(self, tmp_path):
+        path = tmp_path / 'state.db'
+        store = storage.StateStore(path)
+        tenant = make_tenant()
+        for work in ({'id': 7, 'status': 'approved'},
+                     {'homework_name': 'hw', 'status': 'reviewing'}):
+            tenant.homeworks.commit(work)
+            store.save_homework(tenant, work)
+        tenant.timestamp = 500
+        tenant.last_message = 'Хьюстон, у нас проблемы: boom'
+        store.save_tenant(tenant)
+        store.close()
+
+        restored = make_tenant()
+        store = storage.StateStore(path)
+        store.load([restored, tenants.Tenant('bob', 'token', 2)])
+        store.close()
+        assert restored.timestamp == 500, (
+            'После перезапуска курсор from_date должен восстановиться.'
+        )
+        assert restored.last_message == tenant.last_message
+        assert restored.homeworks.get(7) == 'approved'
+        assert restored.homeworks.get('hw') == 'reviewing'
+        assert restored.homeworks.changes(
+            [{'id': 7, 'status': 'approved'}]
+        ) == []
+
+    def test_writes_are_batched(self, tmp_path):
+        store = storage.StateStore(tmp_path / 'state.db', flush_interval=60)
+        tenant = make_tenant()
+        store.save_tenant(tenant)
+        store.maybe_flush()
+        count = store.connection.execute(
+            'SELECT COUNT(*) FROM tenants'
+        ).fetchone()[0]
+        assert count == 0, 'Запись должна копиться до flush_interval.'
+        store.flush()
+        count = store.connection.execute(
+            'SELECT COUNT(*) FROM tenants'
+        ).fetchone()[0]
+        assert count == 1
+        store.close()
+
+    def test_old_schema_is_migrated(self, tmp_path):
+        path = tmp_path / 'state.db'
+        connection = sqlite3.connect(path)
+        connection.execute(
+            'CREATE TABLE tenants (name TEXT PRIMARY KEY, '
+            'from_date INTEGER NOT NULL, last_message TEXT)'
+        )
+        connection.execute("INSERT INTO tenants VALUES ('ann', 500, NULL)")
+        connection.commit()
+        connection.close()
+        store = storage.StateStore(path)
+        tenant = make_tenant()
+        store.load([tenant])
+        assert tenant.timestamp == 500
+        assert not tenant.paused
+        tenant.paused = True
+        store.save_tenant(tenant)
+        store.close()
@@ -0,0 +1,189 @@
+import multiprocessing
+import queue
+import threading
+
+import pytest
+
+import lifecycle
+import scheduler
+import storage
+import tenants
+import topology
+import worker
+from error_digest import ErrorDigest
+
+
+class ListOutbox:
+    def __init__(self, accept=True):
+        self.accept = accept
+        self.items = []
+
+    def put(self, chat_id, text, timeout=None, tenant=None, done=None):
+        if self.accept:
+            self.items.append((chat_id, text, tenant))
+            if done is not None:
+                done(True)
+        return self.accept
+
+
+def shard_process(messages):
+    cycle = lifecycle.Lifecycle().install()
+    messages.put((1, 'статус изменился', 'ann', None))
+    cycle.stopping.wait()
+
+
+def failing_process(messages):
+    raise SystemExit(3)
+
+
+def sender_process(messages, results):
+    outbox = ListOutbox()
+    topology.relay(messages, outbox, lifecycle.Lifecycle())
+    results.put(outbox.items)
+
+
+class TestSharding:
+    def test_shards_are_stable_and_cover_everyone(self):
+        registry = [tenants.Tenant(f't{index}', 'token', index)
+                    for index in range(100)]
+        parts = topology.split(registry, 4)
+        assert sorted(len(part) for part in parts)[0] > 10, (
+            'Подписчики должны делиться между процессами поровну.'
+        )
+        assert sum(len(part) for part in parts) == 100
+        assert parts == topology.split(registry, 4)
+
+    def test_each_shard_polls_across_the_period(self):
+        registry = [tenants.Tenant(f't{index}', 'token', index)
+                    for index in range(1000)]
+        schedule = scheduler.FixedScheduler(600)
+        for part in topology.split(registry, 4):
+            offsets = [
+                schedule.first_interval(tenant, len(registry))
+                for tenant in part
+            ]
+            assert {int(offset // 60) for offset in offsets} == set(
+                range(10)
+            ), (
+                'Первые опросы каждого процесса должны покрывать весь '
+                'период, иначе процессы опроса работают по очереди.'
+            )
+
+
+class TestQueueOutbox:
+    def test_full_queue_is_backpressure(self):
+        messages = queue.Queue(maxsize=1)
+        outbox = topology.QueueOutbox(messages)
+        assert outbox.put(1, 'a', tenant='ann')
+        assert not outbox.put(2, 'b', timeout=0.01), (
+            'Полная очередь должна вернуть False, а не потерять сообщение.'
+        )
+        assert messages.get() == (1, 'a', 'ann', None)
+
+    def test_delivery_is_acknowledged_by_sender(self):
+        messages = queue.Queue()
+        acks = [queue.Queue(), queue.Queue()]
+        outbox = topology.QueueOutbox(messages, acks[1], shard=1).start()
+        outcomes = []
+        try:
+            assert outbox.put(1, 'a', tenant='ann', done=outcomes.append)
+            assert outbox.put(2, 'b', tenant='bob', done=outcomes.append)
+            messages.put(None)
+            assert outcomes == [], (
+                'Очередь — ещё не отправка: done ждёт отправителя.'
+            )
+            cycle = lifecycle.Lifecycle(shutdown_timeout=0.1)
+            cycle.stop()
+            relay = threading.Thread(
+                target=topology.relay,
+                args=(messages, ListOutbox(accept=False), cycle, acks),
+            )
+            relay.start()
+            relay.join()
+            assert outbox.wait(1)
+        finally:
+            outbox.stop()
+        assert outcomes == [False, False], (
+            'Сообщения, не отправленные к сроку, должны вернуться '
+            'процессу опроса как неотправленные.'
+        )
+        assert acks[0].empty()
+
+
+class TestRelay:
+    def test_relays_until_none(self):
+        messages = queue.Queue()
+        for item in ((1, 'a', 'ann', None), (2, 'b', 'bob', None), None):
+            messages.put(item)
+        outbox = ListOutbox()
+        topology.relay(messages, outbox, lifecycle.Lifecycle())
+        assert outbox.items == [(1, 'a', 'ann'), (2, 'b', 'bob')]
+
+    def test_acknowledges_delivery(self):
+        messages = queue.Queue()
+        acks = [queue.Queue()]
+        messages.put((1, 'a', 'ann', (0, 7)))
+        messages.put(None)
+        topology.relay(messages, ListOutbox(), lifecycle.Lifecycle(), acks)
+        assert acks[0].get_nowait() == ((0, 7), True)
+
+    def test_stops_at_deadline(self):
+        messages = queue.Queue()
+        messages.put((1, 'a', 'ann', None))
+        messages.put((2, 'b', 'bob', None))
+        cycle = lifecycle.Lifecycle(shutdown_timeout=0.1)
+        cycle.stop()
+        topology.relay(messages, ListOutbox(accept=False), cycle)
+        assert messages.empty()
+
+
+class TestTopology:
+    def make(self, target, shutdown_timeout=5):
+        context = multiprocessing.get_context('spawn')
+        messages = context.Queue(maxsize=10)
+        results = context.Queue()
+        cycle = lifecycle.Lifecycle(shutdown_timeout=shutdown_timeout)
+        processes = topology.Topology(
+            [context.Process(target=target, args=(messages,))],
+            context.Process(target=sender_process, args=(messages, results)),
+            messages, cycle,
+        )
+        return processes, cycle, results
+
+    @pytest.mark.timeout(15)
+    def test_stop_drains_pollers_then_sender(self):
+        processes, cycle, results = self.make(shard_process)
+        threading.Timer(2.5, cycle.stop).start()
+        processes.run()
+        assert results.get(timeout=1) == [(1, 'статус изменился', 'ann')]
+        assert processes.pollers[0].exitcode == 0, (
+            'Процесс опроса должен выйти по SIGTERM сам.'
+        )
+        assert processes.sender.exitcode == 0
+
+    @pytest.mark.timeout(15)
+    def test_dead_process_stops_everyone(self):
+        processes, cycle, results = self.make(failing_process)
+        processes.run()
+        assert processes.pollers[0].exitcode == 3
+        assert processes.sender.exitcode == 0
+        assert results.get(timeout=1) == []
+
+
+class TestOptions:
+    def test_processes_exclude_commands(self):
+        with pytest.raises(SystemExit):
+            worker.parse_args(['--processes', '2', '--commands'])
+
+
+class TestSharedState:
+    def test_processes_keep_each_others_error_windows(self, tmp_path):
+        store = storage.StateStore(tmp_path / 'state.db')
+        for name in ('ann', 'bob'):
+            digest = ErrorDigest()
+            digest.record(name, ValueError('boom'), now=100)
+            store.save_errors(digest, names={name})
+        restored = ErrorDigest()
+        store.load_errors(restored, names={'bob'})
+        store.close()
+        assert [key for key, _, _ in restored.snapshot()] == ['bob']
@@ -0,0 +1,244 @@
+import json
+import time
+
+import pytest
+import requests
+
+import homework
+import poller
+import tenants
+import transport
+import worker
+from benchmarks import replay, stub_servers
+from test_poller import MockBot
+
+
+class FakeResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.text = json.dumps(body)
+
+
+class FakeClient:
+    def __init__(self, *results):
+        self.results = list(results)
+
+    def get(self, url, **kwargs):
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+class TestRecord:
+    def test_token_is_redacted(self, tmp_path):
+        path = str(tmp_path / 'rec.jsonl')
+        client = transport.RecordingClient(
+            FakeClient(FakeResponse(200, {'homeworks': []})),
+            transport.Recorder(path),
+        )
+        response = client.get(
+            'https://api/', headers={'Authorization': 'OAuth secret-token'},
+            params={'from_date': 0},
+        )
+        assert response.status_code == 200
+        text = (tmp_path / 'rec.jsonl').read_text()
+        assert 'secret-token' not in text, 'Токен не должен попасть в запись.'
+        [event] = transport.load(path)
+        assert event['token'] == transport.redact('secret-token')
+        assert event['body'] == '{"homeworks": []}'
+
+    def test_bot_calls_are_recorded(self, tmp_path):
+        path = str(tmp_path / 'rec.jsonl')
+        bot = transport.RecordingBot(MockBot(), transport.Recorder(path))
+        bot.send_message(chat_id=1, text='привет')
+        assert bot.sent == [(1, 'привет')], (
+            'Остальные атрибуты должны браться у обёрнутого бота.'
+        )
+        [event] = transport.load(path)
+        assert (event['kind'], event['chat_id'], event['text']) == (
+            transport.SEND_EVENT, 1, 'привет'
+        )
+        assert event['error'] is None
+
+    def test_error_notification_is_scrubbed(self, tmp_path):
+        path = str(tmp_path / 'rec.jsonl')
+        recorder = transport.Recorder(path)
+        client = transport.RecordingClient(
+            FakeClient(FakeResponse(500, {})), recorder
+        )
+        bot = transport.RecordingBot(MockBot(), recorder)
+        registry = [tenants.Tenant('ann', 'SECRET-TOKEN-123', 1)]
+        engine = poller.Poller(bot, registry, client=client)
+        engine.poll_tenant(registry[0])
+        assert bot.sent, 'Ошибка API должна дойти до подписчика.'
+        assert 'SECRET-TOKEN-123' in bot.sent[0][1]
+        text = (tmp_path / 'rec.jsonl').read_text()
+        assert 'SECRET-TOKEN-123' not in text, (
+            'Токен из текста ошибки не должен попасть в запись.'
+        )
+        assert transport.redact('SECRET-TOKEN-123') in text
+
+    def test_broken_tail_is_skipped(self, tmp_path):
+        path = tmp_path / 'rec.jsonl'
+        recorder = transport.Recorder(str(path))
+        recorder.write(transport.SEND_EVENT, chat_id=1, text='a', seconds=0)
+        recorder.close()
+        with open(path, 'a') as file:
+            file.write('{"kind": "se')
+        assert len(transport.load(str(path))) == 1
+
+
+class TestReplay:
+    def make_events(self, token='tok'):
+        return [
+            dict(kind=transport.API_EVENT, at=100, token=transport.redact(
+                token), status=200, body='{"n": 1}', seconds=0.5),
+            dict(kind=transport.API_EVENT, at=110, token=transport.redact(
+                token), status=200, body='{"n": 2}', seconds=0.5),
+            dict(kind=transport.API_EVENT, at=120, token=transport.redact(
+                token), status=None, body=None, error='reset', seconds=0),
+        ]
+
+    def get(self, client, token='tok'):
+        return client.get('url', headers={'Authorization': f'OAuth {token}'})
+
+    def test_state_follows_recording_time(self):
+        client = transport.ReplayClient(self.make_events(), speed=100)
+        started = time.monotonic()
+        assert self.get(client).json() == {'n': 1}
+        assert time.monotonic() - started >= 0.005, (
+            'Задержка ответа из записи, ускоренная в speed раз.'
+        )
+        time.sleep(0.1)
+        assert self.get(client).json() == {'n': 2}, (
+            'Через 10 c записи при speed=100 — следующий ответ.'
+        )
+        time.sleep(0.1)
+        with pytest.raises(requests.ConnectionError):
+            self.get(client)
+
+    def test_pseudonym_is_accepted_as_token(self):
+        client = transport.ReplayClient(self.make_events(), speed=1000)
+        pseudonym = transport.redact('tok')
+        assert self.get(client, pseudonym).status_code == 200
+        assert self.get(client, 'other').status_code == 404
+        assert client.stats() == dict(requests=2, misses=1)
+
+
+class TestWorker:
+    def test_record_then_replay_offline(self, monkeypatch, tmp_path):
+        config = tmp_path / 'tenants.json'
+        config.write_text(json.dumps([
+            {'name': 'a', 'practicum_token': 'token-a', 'chat_id': 1},
+            {'name': 'b', 'practicum_token': 'token-b', 'chat_id': 2},
+        ]))
+        recording = str(tmp_path / 'rec.jsonl')
+        model = stub_servers.HomeworkModel(homeworks_per_tenant=2)
+        model.started -= 2 * model.change_period
+        # Все домашки при любом from_date: иначе их число зависит от того,
+        # как давно по часам началась корзина кэша или создан подписчик.
+        homeworks = model.homeworks
+        monkeypatch.setattr(
+            model, 'homeworks',
+            lambda token, from_date, now: homeworks(token, 0, now),
+        )
+        stub = stub_servers.PracticumStub(model).start()
+        monkeypatch.setattr(homework, 'ENDPOINT', stub.endpoint)
+        monkeypatch.setattr(homework, 'TELEGRAM_TOKEN', '1:token')
+        monkeypatch.setattr(transport, 'RECORDERS', {})
+        live = MockBot()
+        monkeypatch.setattr(worker, 'LazyBot', lambda token: live)
+        try:
+            worker.main([
+                '--once', '--tenants', str(config), '--state', '',
+                '--cache-ttl', '0',
+                '--transport', 'record', '--recording', recording,
+            ])
+        finally:
+            stub.stop()
+        assert stub.requests == 2
+        text = (tmp_path / 'rec.jsonl').read_text()
+        # Заглушка кладёт токен в названия домашек; заголовка быть не должно.
+        assert 'OAuth' not in text
+        assert transport.redact('token-a') in text
+        assert len(live.sent) == 4
+
+        replayed = transport.ReplayBot()
+        monkeypatch.setattr(
+            transport, 'ReplayBot', lambda *args, **kwargs: replayed
+        )
+        # Без --tenants подписчики — псевдонимы токенов из записи.
+        worker.main([
+            '--once', '--state', '', '--cache-ttl', '0',
+            '--transport', 'replay',
+            '--recording', recording, '--replay-speed', '100',
+        ])
+        assert stub.requests == 2, 'Повтор не должен ходить в API.'
+        assert sorted(text for _, text in replayed.sent) == sorted(
+            text for _, text in live.sent
+        ), 'Повтор должен дать те же уведомления, что и запись.'
+
+    def test_recording_is_loaded_once(self, monkeypatch, tmp_path, caplog):
+        path = str(tmp_path / 'rec.jsonl')
+        transport.Recorder(path).write(
+            transport.API_EVENT, token=transport.redact('a'),
+            status=200, body='{}', seconds=0.01,
+        )
+        loads = []
+        load = transport.load
+        monkeypatch.setattr(
+            transport, 'load', lambda path: loads.append(path) or load(path)
+        )
+        options = worker.parse_args([
+            '--state', '', '--transport', 'replay', '--recording', path,
+        ])
+        caplog.set_level('INFO')
+        registry = worker.load_registry(options)
+        client = worker.make_client(options)
+        bot = worker.make_bot(options)
+        assert loads == [path], 'Запись должна читаться один раз.'
+        assert [tenant.name for tenant in registry] == [
+            transport.redact('a')
+        ]
+        assert isinstance(client, transport.ReplayClient)
+        assert isinstance(bot, transport.ReplayBot)
+        assert 'Повтор записи' in caplog.text
+
+    def test_replay_excludes_updates(self):
+        with pytest.raises(SystemExit):
+            worker.parse_args(['--transport', 'replay', '--commands'])
+
+    @pytest.mark.parametrize('speed', ['0', '-2'])
+    def test_replay_speed_must_be_positive(self, speed):
+        with pytest.raises(SystemExit):
+            worker.parse_args(['--replay-speed', speed])
+
+
+class TestReplayBenchmark:
+    def test_speed_must_be_positive(self):
+        with pytest.raises(SystemExit):
+            replay.parse_args(['rec.jsonl', '--speed', '0'])
+
+    @pytest.mark.timeout(10)
+    def test_replay_loop(self, tmp_path):
+        path = str(tmp_path / 'rec.jsonl')
+        recorder = transport.Recorder(path)
+        body = json.dumps({'homeworks': [
+            {'id': 1, 'homework_name': 'hw1', 'status': 'approved'},
+        ], 'current_date': 1})
+        for token in ('a', 'b'):
+            recorder.write(
+                transport.API_EVENT, token=transport.redact(token),
+                status=200, body=body, seconds=0.01,
+            )
+        recorder.write(
+            transport.SEND_EVENT, chat_id=1, text='x', seconds=0.01
+        )
+        report = replay.run_replay(path, speed=10, period=1, duration=0.5)
+        assert report['tenants'] == 2
+        assert report['api_misses'] == 0
+        assert report['api_requests'] >= 2
+        assert report['messages'] == 2, (
+            'Каждый подписчик из записи должен получить уведомление.'
+        )
@@ -0,0 +1,59 @@
+import time
+
+import pytest
+
+import homework
+import local_exceptions
+
+
+class TestValidateResponse:
+    def test_defects_are_collected(self):
+        response = {'homeworks': [
+            {'id': 4, 'homework_name': 'hw4', 'status': 'approved'},
+            {'id': 3, 'homework_name': 'hw3', 'status': 'unknown'},
+            {'id': 2, 'status': 'approved'},
+            'hw1',
+            {'homework_name': 'hw0', 'status': ['approved']},
+        ], 'current_date': 1}
+        valid, defects = homework.validate_response(response)
+        assert valid == response['homeworks'][:1], (
+            'Годные домашки должны вернуться, несмотря на плохие.'
+        )
+        assert [(defect.position, defect.key) for defect in defects] == [
+            (1, 3), (2, 2), (3, None), (4, 'hw0'),
+        ], 'Нужно собрать все дефекты ответа, а не только первый.'
+        assert defects[0].problem == (
+            homework.STATUS_NOT_IN_VERDICTS_RAISE.format(status='unknown')
+        )
+
+    def test_envelope_errors_still_raise(self):
+        with pytest.raises(TypeError):
+            homework.validate_response([])
+        with pytest.raises(KeyError):
+            homework.validate_response({'current_date': 1})
+
+    def test_error_lists_first_defects(self):
+        defects = [
+            homework.Defect(position, position, 'нет status')
+            for position in range(homework.MAX_DEFECT_LINES + 3)
+        ]
+        error = homework.defects_error(defects)
+        assert isinstance(error, local_exceptions.HomeworkDefectsError)
+        assert error.defects == defects
+        text = str(error)
+        assert len(text.splitlines()) == homework.MAX_DEFECT_LINES + 2, (
+            'В тексте ошибки — только первые дефекты и сколько ещё.'
+        )
+        assert text.endswith(homework.DEFECTS_MORE.format(count=3))
+
+    def test_validation_is_linear(self):
+        response = {'homeworks': [
+            {'id': number, 'homework_name': f'hw{number}',
+             'status': 'approved' if number % 100 else 'unknown'}
+            for number in range(50000)
+        ]}
+        started = time.monotonic()
+        valid, defects = homework.validate_response(response)
+        assert time.monotonic() - started < 0.5
+        assert len(valid) + len(defects) == 50000
+        assert len(defects) == 500
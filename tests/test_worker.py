@@ -0,0 +1,79 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import homework
+import storage
+import tenants
+import worker
+from benchmarks import stub_servers
+from test_poller import MockBot
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def config(tmp_path):
+    path = tmp_path / 'tenants.json'
+    path.write_text(json.dumps([
+        {'name': 'a', 'practicum_token': 'token-a', 'chat_id': 1},
+        {'name': 'b', 'practicum_token': 'token-b', 'chat_id': 2},
+    ]))
+    return str(path)
+
+
+def run_once(monkeypatch, config, state, error_rate=0):
+    model = stub_servers.HomeworkModel(homeworks_per_tenant=2)
+    # Статус каждой домашки уже хоть раз менялся.
+    model.started -= 2 * model.change_period
+    stub = stub_servers.PracticumStub(model, error_rate=error_rate).start()
+    monkeypatch.setattr(homework, 'ENDPOINT', stub.endpoint)
+    try:
+        worker.main(['--once', '--tenants', config, '--state', state])
+    finally:
+        stub.stop()
+    return stub
+
+
+class TestOnce:
+    def test_import_does_not_load_telegram(self):
+        result = subprocess.run(
+            [sys.executable, '-c',
+             'import sys, worker; print("telegram" in sys.modules)'],
+            cwd=ROOT, capture_output=True, text=True,
+        )
+        assert result.stdout.strip() == 'False', (
+            'worker не должен импортировать telegram при запуске.'
+        )
+
+    def test_once_polls_every_tenant_and_saves_state(
+            self, monkeypatch, config, tmp_path):
+        bot = MockBot()
+        monkeypatch.setattr(worker, 'LazyBot', lambda token: bot)
+        state = str(tmp_path / 'state.db')
+        store = storage.StateStore(state)
+        for tenant in tenants.load_tenants(config):
+            tenant.timestamp = 0
+            store.save_tenant(tenant)
+        store.close()
+        stub = run_once(monkeypatch, config, state)
+        assert stub.requests == 2
+        assert sorted(chat_id for chat_id, _ in bot.sent) == [1, 1, 2, 2]
+        run_once(monkeypatch, config, state)
+        assert len(bot.sent) == 4, (
+            'Статусы после --once должны сохраниться, а не прийти снова.'
+        )
+
+    def test_error_digest_survives_runs(self, monkeypatch, config, tmp_path):
+        bot = MockBot()
+        monkeypatch.setattr(worker, 'LazyBot', lambda token: bot)
+        state = str(tmp_path / 'state.db')
+        run_once(monkeypatch, config, state, error_rate=1)
+        run_once(monkeypatch, config, state, error_rate=1)
+        assert sorted(chat_id for chat_id, _ in bot.sent) == [1, 2], (
+            'Между запусками --once ошибка не должна отправляться повторно.'
+        )
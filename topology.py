@@ -0,0 +1,275 @@
+import functools
+import itertools
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import zlib
+
+from lifecycle import RELOAD_SIGNAL
+
+
+# Сколько сообщений может ждать отправителя; дальше опрос ждёт сам.
+QUEUE_SIZE = int(os.getenv('PROCESS_QUEUE_SIZE', 1000))
+PUT_TIMEOUT = 1
+# Как часто отправитель проверяет срок остановки, c.
+RELAY_TIMEOUT = 0.5
+# Как часто главный процесс проверяет, живы ли дочерние, c.
+MONITOR_INTERVAL = 1
+# Сколько ждать процесс после SIGKILL, c.
+KILL_TIMEOUT = 1
+# Соль хэша процесса опроса: без неё номер процесса совпал бы с фазой
+# подписчика (scheduler.phase), и процессы опрашивали бы по очереди.
+SHARD_SALT = b'shard:'
+# Text messages:
+QUEUE_FULL_LOGS = 'Очередь к отправителю полна, сообщение в %s ждёт'
+RELAY_DROPPED_LOGS = 'Отправитель не успел принять сообщений: %d'
+ACK_ERROR_LOGS = 'Ошибка подтверждения отправки в %s: %s'
+PROCESS_EXITED_LOGS = 'Процесс %s завершился с кодом %s, останавливаемся'
+PROCESS_KILLED_LOGS = 'Процесс %s не остановился за отведённое время'
+TOPOLOGY_LOGS_START = 'Процессов опроса: %d, подписчиков в них: %s'
+
+
+def shard(tenant, shards):
+    """Номер процесса опроса для подписчика: постоянный, по хэшу имени."""
+    return zlib.crc32(SHARD_SALT + tenant.name.encode('utf-8')) % shards
+
+
+def split(tenants, shards):
+    """Подписчики по процессам опроса: список из shards списков."""
+    parts = [[] for _ in range(shards)]
+    for tenant in tenants:
+        parts[shard(tenant, shards)].append(tenant)
+    return parts
+
+
+class QueueOutbox:
+    """Outbox процесса опроса: сообщения уходят отправителю через очередь.
+
+    Очередь ограничена: если отправитель не успевает, put() ждёт
+    timeout секунд и возвращает False, а Poller оставит домашку
+    неотправленной до следующего опроса. Исход отправки возвращается
+    из процесса-отправителя через acks — очередь этого процесса опроса
+    номер shard: done(delivered) вызывает поток, запущенный start().
+    Без acks done(True) вызывается, как только сообщение в очереди.
+    """
+
+    def __init__(self, messages, acks=None, shard=0):
+        """Сообщения — в messages, исходы — из acks."""
+        self.messages = messages
+        self.acks = acks
+        self.shard = shard
+        self.tickets = itertools.count()
+        self.callbacks = {}
+        self.settled = threading.Condition()
+        self.thread = threading.Thread(
+            target=self._listen, name='acks', daemon=True
+        )
+
+    def start(self):
+        """Запустить поток, который принимает подтверждения."""
+        if self.acks is not None:
+            self.thread.start()
+        return self
+
+    def put(self, chat_id, text, timeout=PUT_TIMEOUT, tenant=None,
+            done=None):
+        """Передать сообщение отправителю; False, если очередь полна."""
+        ticket = None
+        if done is not None and self.acks is not None:
+            ticket = self.shard, next(self.tickets)
+            with self.settled:
+                self.callbacks[ticket] = done
+        try:
+            self.messages.put(
+                (chat_id, text, tenant, ticket), timeout=timeout
+            )
+        except queue.Full:
+            logging.warning(QUEUE_FULL_LOGS, chat_id)
+            with self.settled:
+                self.callbacks.pop(ticket, None)
+            return False
+        if done is not None and ticket is None:
+            done(True)
+        return True
+
+    def pending(self):
+        """Сколько сообщений ждёт подтверждения отправителя."""
+        return len(self.callbacks)
+
+    def wait(self, timeout=None):
+        """Дождаться всех подтверждений не дольше timeout; True — все."""
+        with self.settled:
+            return self.settled.wait_for(
+                lambda: not self.callbacks, timeout
+            )
+
+    def stop(self):
+        """Остановить поток подтверждений."""
+        if self.thread.is_alive():
+            self.acks.put(None)
+            self.thread.join()
+
+    def _listen(self):
+        while True:
+            item = self.acks.get()
+            if item is None:
+                break
+            ticket, delivered = item
+            done = self.callbacks.get(ticket)
+            if done is not None:
+                try:
+                    done(delivered)
+                except Exception as error:
+                    logging.exception(ACK_ERROR_LOGS, ticket, error)
+            with self.settled:
+                # Убираем после done(): wait() дождётся и сохранения.
+                self.callbacks.pop(ticket, None)
+                self.settled.notify_all()
+
+
+def acknowledge(acks, ticket, delivered):
+    """Вернуть исход отправки ticket процессу опроса ticket[0]."""
+    acks[ticket[0]].put((ticket, delivered))
+
+
+def settlement(acks, ticket):
+    """Колбэк done для outbox.Outbox.put(); None, если исход не нужен."""
+    if ticket is None or acks is None:
+        return None
+    return functools.partial(acknowledge, acks, ticket)
+
+
+def relay(messages, outbox, lifecycle, acks=None):
+    """Перекладывать сообщения из очереди процессов в outbox.Outbox.
+
+    Заканчивается, когда из очереди придёт None (процессы опроса уже
+    вышли) или истечёт срок остановки lifecycle. Пока Outbox полон,
+    новые сообщения не забираются, и ждут уже процессы опроса. Исход
+    каждого сообщения уходит обратно в acks — очереди процессов опроса.
+    """
+    dropped = 0
+    while lifecycle.remaining() != 0:
+        try:
+            item = messages.get(timeout=RELAY_TIMEOUT)
+        except queue.Empty:
+            continue
+        if item is None:
+            break
+        chat_id, text, tenant, ticket = item
+        done = settlement(acks, ticket)
+        while not outbox.put(chat_id, text, tenant=tenant, done=done):
+            if lifecycle.remaining() == 0:
+                dropped += 1
+                if done is not None:
+                    done(False)
+                break
+    dropped += discard(messages, acks)
+    if dropped:
+        logging.error(RELAY_DROPPED_LOGS, dropped)
+
+
+def discard(messages, acks=None):
+    """Выбросить оставшиеся в очереди сообщения; сколько выброшено."""
+    count = 0
+    while True:
+        try:
+            item = messages.get_nowait()
+        except queue.Empty:
+            return count
+        if item is None:
+            continue
+        count += 1
+        done = settlement(acks, item[3])
+        if done is not None:
+            done(False)
+
+
+def setup_child_logging(logs):
+    """Логи дочернего процесса — через очередь в главный процесс.
+
+    Запись уходит с уже подставленными аргументами, а формат строки
+    применит главный процесс.
+    """
+    logging.basicConfig(
+        level=logging.DEBUG,
+        handlers=(logging.handlers.QueueHandler(logs),),
+        format='%(message)s',
+        force=True,
+    )
+
+
+class Topology:
+    """Процессы опроса и один процесс-отправитель под присмотром.
+
+    pollers и sender — multiprocessing.Process; сообщения идут через
+    очередь messages. При остановке сначала выходят процессы опроса,
+    потом отправитель получает None и досылает очередь; всё —
+    в пределах срока lifecycle. SIGHUP пересылается процессам опроса.
+    """
+
+    def __init__(self, pollers, sender, messages, lifecycle):
+        """Процессы ещё не запущены: их запустит run()."""
+        self.pollers = pollers
+        self.sender = sender
+        self.messages = messages
+        self.lifecycle = lifecycle
+        if RELOAD_SIGNAL is not None:
+            lifecycle.reload = self.reload
+
+    def reload(self):
+        """Попросить процессы опроса перечитать подписчиков."""
+        for process in self.pollers:
+            if process.is_alive():
+                os.kill(process.pid, RELOAD_SIGNAL)
+
+    def run(self):
+        """Запустить процессы и ждать остановки или смерти одного из них."""
+        for process in (*self.pollers, self.sender):
+            process.start()
+        try:
+            while self.lifecycle.wait(MONITOR_INTERVAL):
+                self.lifecycle.maybe_reload()
+                exited = self.exited()
+                if exited is not None:
+                    logging.error(
+                        PROCESS_EXITED_LOGS, exited.name, exited.exitcode
+                    )
+                    break
+        finally:
+            self.stop()
+
+    def exited(self):
+        """Первый вышедший процесс или None."""
+        for process in (*self.pollers, self.sender):
+            if not process.is_alive():
+                return process
+        return None
+
+    def stop(self):
+        """Остановить опрос, потом отправителя, не дольше срока."""
+        self.lifecycle.stop()
+        for process in self.pollers:
+            if process.is_alive():
+                process.terminate()
+        for process in self.pollers:
+            self.join(process)
+        # Сообщения процессов опроса уже в очереди, None придёт после них.
+        try:
+            self.messages.put(None, timeout=self.lifecycle.remaining())
+        except queue.Full:
+            pass
+        self.join(self.sender)
+        self.messages.close()
+        if self.sender.exitcode != 0:
+            # Некому дочитать очередь: не ждать её при выходе.
+            self.messages.cancel_join_thread()
+
+    def join(self, process):
+        """Дождаться процесс до срока, потом убить."""
+        process.join(self.lifecycle.remaining())
+        if process.is_alive():
+            logging.error(PROCESS_KILLED_LOGS, process.name)
+            process.kill()
+            process.join(KILL_TIMEOUT)
@@ -0,0 +1,326 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import statistics
+import threading
+import time
+from bisect import bisect_right
+from http import HTTPStatus
+
+import requests
+
+
+PASSTHROUGH = 'passthrough'
+RECORD = 'record'
+REPLAY = 'replay'
+MODES = (PASSTHROUGH, RECORD, REPLAY)
+RECORDING_PATH = os.getenv('RECORDING_PATH', 'recording.jsonl')
+REDACTED_PREFIX = 'redacted-'
+REDACTED_LENGTH = 12
+API_EVENT = 'api'
+SEND_EVENT = 'send'
+# Токен в тексте: ошибки API повторяют заголовок Authorization.
+TOKEN_PATTERN = re.compile(r'(OAuth\s+)([^\s\'"]+)')
+# Text messages:
+RECORDING_LOGS_START = 'Пишем запросы к API и Telegram в %s'
+REPLAY_LOGS_START = (
+    'Повтор записи %s: ответов API %d, токенов %d, скорость %sx'
+)
+REPLAY_MISS_LOGS = 'В записи нет ответов для токена %s'
+REPLAY_BAD_LINE_LOGS = 'Строка %d записи %s не разобрана: %s'
+
+
+def redact(token):
+    """Псевдоним токена: постоянный, но сам токен из него не узнать."""
+    digest = hashlib.sha256(str(token).encode()).hexdigest()
+    return REDACTED_PREFIX + digest[:REDACTED_LENGTH]
+
+
+def scrub(text):
+    """Текст, в котором токены после OAuth заменены на redact()."""
+    if not text:
+        return text
+    return TOKEN_PATTERN.sub(
+        lambda match: match[1] + redact(match[2]), str(text)
+    )
+
+
+def token_from(headers):
+    """Токен из заголовка Authorization: OAuth <token>."""
+    authorization = (headers or {}).get('Authorization', '')
+    return authorization.partition(' ')[2] or authorization
+
+
+class Recorder:
+    """Append-only JSON Lines: одно событие — одна строка.
+
+    Строка уходит одним write() в файл, открытый с O_APPEND, поэтому
+    потоки и процессы (--processes) могут писать в один файл, не
+    перемешивая строки.
+    """
+
+    def __init__(self, path):
+        """Открыть path на дозапись."""
+        self.path = path
+        self.fd = os.open(
+            path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600
+        )
+        self.lock = threading.Lock()
+        self.events = 0
+
+    def write(self, kind, **fields):
+        """Записать событие kind с полями fields и временем at."""
+        line = json.dumps(
+            dict(kind=kind, at=round(time.time(), 3), **fields),
+            ensure_ascii=False, separators=(',', ':'),
+        ) + '\n'
+        with self.lock:
+            os.write(self.fd, line.encode())
+            self.events += 1
+
+    def close(self):
+        """Закрыть файл."""
+        os.close(self.fd)
+
+
+RECORDERS = {}
+RECORDERS_LOCK = threading.Lock()
+
+
+def recorder(path=RECORDING_PATH):
+    """Общий Recorder для path: клиент API и бот пишут в один файл."""
+    with RECORDERS_LOCK:
+        if path not in RECORDERS:
+            logging.info(RECORDING_LOGS_START, path)
+            RECORDERS[path] = Recorder(path)
+        return RECORDERS[path]
+
+
+class RecordingClient:
+    """http_client.HttpClient, который записывает каждый ответ API.
+
+    Токен из заголовка Authorization заменяется псевдонимом redact():
+    по нему ReplayClient найдёт ответы, а сам токен в файл не попадёт.
+    """
+
+    def __init__(self, client, recorder):
+        """Обернуть client; ответы пишет recorder."""
+        self.client = client
+        self.recorder = recorder
+
+    def get(self, url, headers=None, params=None, **kwargs):
+        """GET через client с записью ответа."""
+        started = time.perf_counter()
+        fields = dict(
+            url=url, token=redact(token_from(headers)), params=params,
+        )
+        try:
+            response = self.client.get(
+                url, headers=headers, params=params, **kwargs
+            )
+        except requests.RequestException as error:
+            # Сбой сети тоже часть трафика: повтор выбросит его снова.
+            self.recorder.write(
+                API_EVENT, status=None, body=None, error=scrub(error),
+                seconds=round(time.perf_counter() - started, 4), **fields,
+            )
+            raise
+        self.recorder.write(
+            API_EVENT, status=response.status_code, body=response.text,
+            seconds=round(time.perf_counter() - started, 4), **fields,
+        )
+        return response
+
+    def stats(self):
+        """Счётчики client."""
+        return self.client.stats()
+
+    def log_stats(self):
+        """Счётчики client в лог."""
+        self.client.log_stats()
+
+    def close(self):
+        """Закрыть client."""
+        self.client.close()
+
+
+class RecordingBot:
+    """telegram.Bot, который записывает каждый send_message.
+
+    Остальные атрибуты — как у bot, поэтому его можно отдать и Updater.
+    Текст пишется через scrub(): уведомления об ошибках API содержат
+    заголовок Authorization с токеном.
+    """
+
+    def __init__(self, bot, recorder):
+        """Обернуть bot; вызовы пишет recorder."""
+        self.bot = bot
+        self.recorder = recorder
+
+    def __getattr__(self, name):
+        """Атрибут обёрнутого bot."""
+        return getattr(self.bot, name)
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        """Отправить через bot и записать вызов и его исход."""
+        started = time.perf_counter()
+        error = None
+        try:
+            return self.bot.send_message(
+                chat_id=chat_id, text=text, **kwargs
+            )
+        except Exception as exception:
+            error = type(exception).__name__
+            raise
+        finally:
+            self.recorder.write(
+                SEND_EVENT,
+                chat_id=chat_id,
+                text=scrub(text),
+                error=error,
+                seconds=round(time.perf_counter() - started, 4),
+            )
+
+
+def load(path):
+    """События записи по порядку; испорченные строки пропускаются."""
+    events = []
+    with open(path, encoding='utf-8') as file:
+        for number, line in enumerate(file, 1):
+            try:
+                events.append(json.loads(line))
+            except ValueError as error:
+                # Последняя строка могла не дописаться при остановке.
+                logging.warning(REPLAY_BAD_LINE_LOGS, number, path, error)
+    return events
+
+
+def tokens(events):
+    """Псевдонимы токенов, ответы для которых есть в записи."""
+    return sorted({
+        event['token'] for event in events if event['kind'] == API_EVENT
+    })
+
+
+class ReplayResponse:
+    """Записанный ответ API с интерфейсом requests.Response."""
+
+    __slots__ = ('status_code', 'text')
+
+    def __init__(self, status_code, text):
+        """Ответ с кодом status_code и телом text."""
+        self.status_code = status_code
+        self.text = text
+
+    def json(self):
+        """Тело ответа как JSON."""
+        return json.loads(self.text)
+
+
+class ReplayClient:
+    """Ответы API из записи вместо запросов к Практикуму.
+
+    Для каждого токена запись — это состояние API во времени: на запрос
+    приходит последний ответ, записанный не позже moment() — времени
+    записи, которое идёт от первого ответа в speed раз быстрее, — с
+    записанной задержкой, делённой на speed. speed=1 — исходная скорость, 10 —
+    в десять раз быстрее. Токен ищется как есть (псевдоним из записи)
+    и через redact() (настоящий токен из --tenants).
+    """
+
+    def __init__(self, events, speed=1.0):
+        """Ответы API из events по токенам; время пошло."""
+        self.speed = speed
+        self.timelines = {}
+        for event in events:
+            if event['kind'] == API_EVENT:
+                self.timelines.setdefault(event['token'], []).append(event)
+        for timeline in self.timelines.values():
+            timeline.sort(key=lambda event: event['at'])
+        self.times = {
+            token: [event['at'] for event in timeline]
+            for token, timeline in self.timelines.items()
+        }
+        self.origin = min(
+            (times[0] for times in self.times.values()), default=0
+        )
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+        self.requests = self.misses = 0
+
+    def moment(self):
+        """Который сейчас момент записи, unix time."""
+        return self.origin + (time.monotonic() - self.started) * self.speed
+
+    def event(self, token):
+        """Записанный ответ для token в текущий момент или None."""
+        key = token if token in self.timelines else redact(token)
+        timeline = self.timelines.get(key)
+        if timeline is None:
+            return None
+        index = bisect_right(self.times[key], self.moment())
+        return timeline[max(0, index - 1)]
+
+    def get(self, url, headers=None, params=None, **kwargs):
+        """Ответ из записи для токена из headers."""
+        token = token_from(headers)
+        event = self.event(token)
+        with self.lock:
+            self.requests += 1
+            if event is None:
+                self.misses += 1
+        if event is None:
+            logging.warning(REPLAY_MISS_LOGS, redact(token))
+            return ReplayResponse(HTTPStatus.NOT_FOUND, '{}')
+        time.sleep(event['seconds'] / self.speed)
+        if event['status'] is None:
+            raise requests.ConnectionError(event.get('error'))
+        return ReplayResponse(event['status'], event['body'])
+
+    def stats(self):
+        """Сколько запросов пришло и для скольких не нашлось записи."""
+        return dict(requests=self.requests, misses=self.misses)
+
+    def log_stats(self):
+        """Счётчики повтора в лог."""
+
+    def close(self):
+        """Соединений нет: закрывать нечего."""
+
+
+class ReplayBot:
+    """Бот без Telegram: запоминает сообщения, задержка — из записи.
+
+    Задержка — медиана записанных send_message, делённая на speed.
+    """
+
+    def __init__(self, events=(), speed=1.0):
+        """Задержка отправки по записанным events."""
+        durations = [
+            event['seconds'] for event in events
+            if event['kind'] == SEND_EVENT
+        ]
+        self.delay = (
+            statistics.median(durations) / speed if durations else 0
+        )
+        self.lock = threading.Lock()
+        self.sent = []
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        """Запомнить сообщение вместо отправки."""
+        time.sleep(self.delay)
+        with self.lock:
+            self.sent.append((chat_id, text))
+
+
+def replay(path, speed=1.0):
+    """Клиент и бот для повтора файла записи path (ReplayClient, ReplayBot)."""
+    events = load(path)
+    client = ReplayClient(events, speed=speed)
+    logging.info(
+        REPLAY_LOGS_START, path, sum(map(len, client.timelines.values())),
+        len(client.timelines), speed,
+    )
+    return client, ReplayBot(events, speed=speed)
@@ -0,0 +1,497 @@
+import argparse
+import functools
+import logging
+import logging.handlers
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import coalesce
+import commands
+import homework
+import http_client
+import jobs
+import lifecycle
+import metrics
+import poller
+import response_cache
+import scheduler
+import storage
+import tenants
+import topology
+import transport
+
+
+# Text messages:
+REPLAY_COMMANDS_ERROR = (
+    '--transport replay не сочетается с --commands и --job-queue: '
+    'Telegram в повторе не участвует'
+)
+REPLAY_SPEED_ERROR = '--replay-speed должна быть больше нуля, а не {speed}'
+PROCESSES_COMMANDS_ERROR = (
+    '--processes не сочетается с --commands и --job-queue: состояние '
+    'подписчиков живёт в процессах опроса'
+)
+ONCE_LOGS = (
+    'Старт и импорт: %.3f c CPU, опрос подписчиков (%d): %.3f c'
+)
+
+
+class LazyBot:
+    """telegram.Bot, который создаётся при первой отправке.
+
+    Импорт telegram — самая долгая часть запуска, а в режиме --once
+    отправлять чаще всего нечего.
+    """
+
+    def __init__(self, token):
+        """Бот для token ещё не создан."""
+        self.token = token
+        self.bot = None
+        self.lock = threading.Lock()
+
+    def send_message(self, **kwargs):
+        """Отправить сообщение, создав бота при первом вызове."""
+        with self.lock:
+            if self.bot is None:
+                import telegram
+                self.bot = telegram.Bot(token=self.token)
+        return self.bot.send_message(**kwargs)
+
+
+def parse_args(args=None):
+    """Аргументы командной строки."""
+    parser = argparse.ArgumentParser(
+        description='Бот-уведомитель о статусах домашек для многих чатов.'
+    )
+    parser.add_argument(
+        '--tenants',
+        help='JSON-файл со списком подписчиков; '
+             'по умолчанию один подписчик из переменных окружения',
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=poller.MAX_WORKERS,
+        help='сколько подписчиков опрашивать одновременно',
+    )
+    parser.add_argument(
+        '--pool-size',
+        type=int,
+        default=http_client.POOL_SIZE,
+        help='сколько keep-alive соединений держать к API Практикума',
+    )
+    parser.add_argument(
+        '--cache-ttl',
+        type=float,
+        default=response_cache.CACHE_TTL,
+        help='сколько секунд чаты с одним токеном делят ответ API; '
+             '0 — не кэшировать',
+    )
+    parser.add_argument(
+        '--schedule',
+        choices=('adaptive', 'fixed'),
+        default='fixed',
+        help='fixed — раз в RETRY_PERIOD; adaptive — чаще в начале '
+             'ревью и реже, когда статусы больше не изменятся',
+    )
+    parser.add_argument(
+        '--min-period',
+        type=int,
+        default=scheduler.MIN_PERIOD,
+        help='минимальный интервал опроса в режиме adaptive, c',
+    )
+    parser.add_argument(
+        '--max-period',
+        type=int,
+        default=scheduler.MAX_PERIOD,
+        help='максимальный интервал опроса в режиме adaptive, c',
+    )
+    parser.add_argument(
+        '--state',
+        default=storage.STATE_PATH,
+        help='SQLite-файл с состоянием подписчиков; '
+             'пустая строка — не сохранять состояние',
+    )
+    parser.add_argument(
+        '--metrics-port',
+        type=int,
+        default=metrics.METRICS_PORT,
+        help='порт HTTP-метрик в формате Prometheus; 0 — не запускать',
+    )
+    parser.add_argument(
+        '--once',
+        action='store_true',
+        help='опросить всех подписчиков один раз и выйти (для cron)',
+    )
+    parser.add_argument(
+        '--commands',
+        action='store_true',
+        help='отвечать на /status, /history, /pause и /resume в чатах '
+             '(long polling Telegram)',
+    )
+    parser.add_argument(
+        '--job-queue',
+        action='store_true',
+        help='опрашивать задачами JobQueue в потоках Updater: опрос '
+             'и команды делят --workers потоков и пул соединений бота '
+             '(включает --commands)',
+    )
+    parser.add_argument(
+        '--processes',
+        type=int,
+        default=1,
+        help='больше 1 — столько процессов опроса, подписчики делятся '
+             'между ними по хэшу имени, и отдельный процесс отправляет '
+             'сообщения в Telegram',
+    )
+    parser.add_argument(
+        '--coalesce-window',
+        type=float,
+        default=coalesce.COALESCE_WINDOW,
+        help='сколько секунд копить уведомления чата, чтобы отправить '
+             'их одним сообщением; 0 — отправлять каждое сразу',
+    )
+    parser.add_argument(
+        '--transport',
+        choices=transport.MODES,
+        default=transport.PASSTHROUGH,
+        help='record — писать ответы API и отправки в Telegram в '
+             '--recording (токены скрыты); replay — отвечать из записи '
+             'вместо API Практикума и не ходить в Telegram',
+    )
+    parser.add_argument(
+        '--recording',
+        default=transport.RECORDING_PATH,
+        help='файл записи для --transport record и replay',
+    )
+    parser.add_argument(
+        '--replay-speed',
+        type=float,
+        default=1,
+        help='во сколько раз быстрее записи идёт повтор',
+    )
+    parser.add_argument(
+        '--shutdown-timeout',
+        type=float,
+        default=lifecycle.SHUTDOWN_TIMEOUT,
+        help='сколько секунд после SIGTERM досылать сообщения '
+             'и сохранять состояние',
+    )
+    options = parser.parse_args(args)
+    updates = options.commands or options.job_queue
+    if options.processes > 1 and updates:
+        parser.error(PROCESSES_COMMANDS_ERROR)
+    if options.transport == transport.REPLAY and updates:
+        parser.error(REPLAY_COMMANDS_ERROR)
+    if options.replay_speed <= 0:
+        parser.error(REPLAY_SPEED_ERROR.format(speed=options.replay_speed))
+    return options
+
+
+def make_schedule(options):
+    """Расписание опроса по аргументам командной строки."""
+    if options.schedule == 'fixed':
+        return scheduler.FixedScheduler()
+    return scheduler.AdaptiveScheduler(
+        min_period=options.min_period,
+        max_period=options.max_period,
+    )
+
+
+def make_cache(options):
+    """Кэш ответов API по аргументам командной строки или None."""
+    if options.cache_ttl <= 0:
+        return None
+    return response_cache.ResponseCache(ttl=options.cache_ttl)
+
+
+def run_once(options, registry, client, store):
+    """Один цикл опроса всех подписчиков; Telegram — только если нужно."""
+    started = time.perf_counter()
+    engine = poller.Poller(
+        make_bot(options), registry,
+        max_workers=options.workers,
+        client=client,
+        cache=make_cache(options),
+        store=store,
+    )
+    if store is not None:
+        store.load_errors(engine.errors)
+    with ThreadPoolExecutor(max_workers=engine.max_workers) as executor:
+        engine.poll_once(executor)
+    if store is not None:
+        store.save_errors(engine.errors)
+    return time.perf_counter() - started
+
+
+@functools.lru_cache(maxsize=None)
+def load_replay(path, speed):
+    """Клиент и бот повтора записи path: файл читается раз на процесс."""
+    return transport.replay(path, speed=speed)
+
+
+def make_bot(options):
+    """Бот по --transport: как есть, с записью или ReplayBot."""
+    if options.transport == transport.REPLAY:
+        _, bot = load_replay(options.recording, options.replay_speed)
+        return bot
+    if options.once:
+        bot = LazyBot(homework.TELEGRAM_TOKEN)
+    else:
+        bot = make_telegram_bot(options)
+    if options.transport == transport.RECORD:
+        return transport.RecordingBot(
+            bot, transport.recorder(options.recording)
+        )
+    return bot
+
+
+def make_telegram_bot(options):
+    """telegram.Bot; с пулом соединений для Updater, если он нужен."""
+    if options.job_queue:
+        return commands.make_bot(
+            homework.TELEGRAM_TOKEN, workers=options.workers
+        )
+    if options.commands:
+        return commands.make_bot(homework.TELEGRAM_TOKEN)
+    import telegram
+    return telegram.Bot(token=homework.TELEGRAM_TOKEN)
+
+
+def make_updater(options, bot, engine):
+    """Updater для команд и JobQueue или None."""
+    if options.job_queue:
+        return commands.make_updater(bot, engine, workers=options.workers)
+    if options.commands:
+        return commands.make_updater(bot, engine)
+    return None
+
+
+def make_coalescer(options, sender):
+    """Склейка уведомлений перед sender (outbox.Outbox) или сам sender."""
+    if options.coalesce_window <= 0:
+        return sender
+    return coalesce.Coalescer(sender, window=options.coalesce_window).start()
+
+
+def stop_sender(deliver, sender, cycle):
+    """Передать склеенное в sender и дослать очередь до срока cycle."""
+    if deliver is not sender:
+        deliver.stop(timeout=cycle.remaining())
+    sender.stop(timeout=cycle.remaining())
+
+
+def make_engine(options, bot, registry, client, store, outbox, cycle):
+    """Poller для долгой работы по аргументам командной строки."""
+    return poller.Poller(
+        bot, registry,
+        max_workers=options.workers,
+        client=client,
+        cache=make_cache(options),
+        outbox=outbox,
+        schedule=make_schedule(options),
+        store=store,
+        lifecycle=cycle,
+    )
+
+
+def run_forever(options, registry, client, store):
+    """Опрашивать подписчиков по расписанию до SIGTERM."""
+    import outbox
+    bot = make_bot(options)
+    sender = outbox.Outbox(bot).start()
+    deliver = make_coalescer(options, sender)
+    cycle = lifecycle.Lifecycle(shutdown_timeout=options.shutdown_timeout)
+    engine = make_engine(
+        options, bot, registry, client, store, deliver, cycle
+    )
+    if store is not None:
+        store.load_errors(engine.errors)
+    if options.tenants:
+        cycle.reload = lambda: engine.update_tenants(
+            tenants.load_tenants(options.tenants)
+        )
+    cycle.install()
+    if options.metrics_port:
+        engine.register_metrics()
+        metrics.serve(options.metrics_port)
+    updater = make_updater(options, bot, engine)
+    try:
+        if options.job_queue:
+            jobs.run(updater, engine)
+        else:
+            if updater is not None:
+                commands.start(updater)
+            engine.run()
+    finally:
+        # Опрос уже дождался своих задач; остаток срока — на досылку.
+        stop_sender(deliver, sender, cycle)
+        if store is not None:
+            store.save_errors(engine.errors)
+        if updater is not None:
+            # Дожидается текущего getUpdates: уведомления важнее.
+            updater.stop()
+
+
+def make_client(options):
+    """Клиент API Практикума по --transport."""
+    if options.transport == transport.REPLAY:
+        client, _ = load_replay(options.recording, options.replay_speed)
+        return client
+    client = http_client.HttpClient(pool_size=options.pool_size)
+    if options.transport == transport.RECORD:
+        return transport.RecordingClient(
+            client, transport.recorder(options.recording)
+        )
+    return client
+
+
+def load_registry(options):
+    """Подписчики: из --tenants, из записи при повторе или из окружения."""
+    replay = options.transport == transport.REPLAY
+    if options.tenants:
+        if not replay:
+            homework.check_token_names(['TELEGRAM_TOKEN'])
+        return tenants.load_tenants(options.tenants)
+    if replay:
+        # Псевдоним токена из записи годится и как токен, и как чат.
+        client, _ = load_replay(options.recording, options.replay_speed)
+        return [
+            tenants.Tenant(token, token, token)
+            for token in sorted(client.timelines)
+        ]
+    return [tenants.tenant_from_env()]
+
+
+def open_store(options, registry):
+    """Хранилище состояния с восстановленными registry или None."""
+    if not options.state:
+        return None
+    store = storage.StateStore(options.state)
+    store.load(registry)
+    return store
+
+
+def run_shard(options, index, registry, messages, acks, logs):
+    """Процесс опроса: подписчики registry, сообщения — в messages.
+
+    Исходы отправки приходят в acks[index]: статус домашки сохраняется,
+    только когда отправитель подтвердил уведомление.
+    """
+    topology.setup_child_logging(logs)
+    store = open_store(options, registry)
+    client = make_client(options)
+    cycle = lifecycle.Lifecycle(shutdown_timeout=options.shutdown_timeout)
+    deliver = topology.QueueOutbox(messages, acks[index], index).start()
+    engine = make_engine(
+        options, None, registry, client, store, deliver, cycle,
+    )
+    if store is not None:
+        store.load_errors(engine.errors, names=engine.by_name)
+    if options.tenants:
+        cycle.reload = lambda: engine.update_tenants(topology.split(
+            tenants.load_tenants(options.tenants), options.processes
+        )[index])
+    cycle.install()
+    try:
+        engine.run()
+    finally:
+        client.close()
+        # Неподтверждённое к сроку не сохранится и уйдёт после запуска.
+        deliver.wait(cycle.remaining())
+        deliver.stop()
+        if store is not None:
+            # Окна сводок других процессов в базе не трогаем.
+            store.save_errors(engine.errors, names=engine.by_name)
+            store.close()
+
+
+def run_sender(options, messages, acks, logs):
+    """Процесс-отправитель: telegram.Bot и лимиты Outbox на всех."""
+    topology.setup_child_logging(logs)
+    import outbox
+    sender = outbox.Outbox(make_bot(options)).start()
+    deliver = make_coalescer(options, sender)
+    cycle = lifecycle.Lifecycle(
+        shutdown_timeout=options.shutdown_timeout
+    ).install()
+    try:
+        topology.relay(messages, deliver, cycle, acks)
+    finally:
+        stop_sender(deliver, sender, cycle)
+
+
+def run_processes(options, registry):
+    """Процессы опроса (--processes) и процесс-отправитель до SIGTERM."""
+    context = multiprocessing.get_context('spawn')
+    messages = context.Queue(maxsize=topology.QUEUE_SIZE)
+    logs = context.Queue()
+    parts = topology.split(registry, options.processes)
+    acks = [context.Queue() for _ in parts]
+    listener = logging.handlers.QueueListener(
+        logs, *logging.getLogger().handlers
+    )
+    logging.info(
+        topology.TOPOLOGY_LOGS_START, len(parts),
+        [len(part) for part in parts],
+    )
+    cycle = lifecycle.Lifecycle(shutdown_timeout=options.shutdown_timeout)
+    processes = topology.Topology(
+        [
+            context.Process(
+                target=run_shard,
+                args=(options, index, part, messages, acks, logs),
+                name=f'poller-{index}',
+            )
+            for index, part in enumerate(parts)
+        ],
+        context.Process(
+            target=run_sender, args=(options, messages, acks, logs),
+            name='sender',
+        ),
+        messages, cycle,
+    )
+    cycle.install()
+    listener.start()
+    try:
+        processes.run()
+    finally:
+        listener.stop()
+
+
+def main(args=None):
+    """Опрос всех подписчиков одним процессом или --processes."""
+    # Процессорное время до этой строки — старт интерпретатора и импорт.
+    startup = time.process_time()
+    options = parse_args(args)
+    logging.debug(homework.MAIN_LOGS_START)
+    registry = load_registry(options)
+    if options.processes > 1 and not options.once:
+        # Состояние процессы опроса загрузят сами.
+        run_processes(options, registry)
+        return
+    store = open_store(options, registry)
+    client = make_client(options)
+    try:
+        if options.once:
+            logging.info(
+                ONCE_LOGS, startup, len(registry),
+                run_once(options, registry, client, store),
+            )
+        else:
+            run_forever(options, registry, client, store)
+    finally:
+        client.close()
+        if store is not None:
+            store.close()
+
+
+if __name__ == '__main__':
+    listener = homework.setup_logging(queued=True)
+    try:
+        main()
+        logging.debug(homework.LOGS_END)
+    finally:
+        listener.stop()